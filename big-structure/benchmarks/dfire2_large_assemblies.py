@@ -0,0 +1,124 @@
+"""Benchmarks DFIRE2 on large assemblies made from copies of a single chain.
+
+The chain is replicated on a grid, with a gap between the copies so that they
+interact like the subunits of a capsid or fibril, until the assembly contains
+the requested number of atoms. Each assembly is scored with the in-process
+NumPy engine and, optionally, with the `calene` binary.
+
+    python benchmarks/dfire2_large_assemblies.py \
+        --dfire2-folder /dependencies_for_de-stress/DFIRE2-pair/ --calene
+"""
+import itertools
+import math
+import pathlib
+import string
+import subprocess
+import tempfile
+import time
+from typing import List, Optional
+
+import click
+
+from destress_big_structure import dfire2
+
+CHAIN_IDS = string.ascii_uppercase + string.ascii_lowercase + string.digits
+DEFAULT_SIZES = "5000,10000,25000,50000,100000,200000"
+
+
+def replicate_chain(atom_lines: List[str], number_of_atoms: int, gap: float) -> str:
+    """Builds a PDB string with `number_of_atoms` atoms from copies of a chain."""
+    coordinates = [
+        [float(line[30:38]), float(line[38:46]), float(line[46:54])]
+        for line in atom_lines
+    ]
+    spacing = (
+        max(
+            max(xyz[m] for xyz in coordinates) - min(xyz[m] for xyz in coordinates)
+            for m in range(3)
+        )
+        + gap
+    )
+    number_of_copies = math.ceil(number_of_atoms / len(atom_lines))
+    grid_size = math.ceil(number_of_copies ** (1 / 3))
+    grid_positions = itertools.product(range(grid_size), repeat=3)
+
+    pdb_lines = []
+    for copy_number, grid_position in zip(range(number_of_copies), grid_positions):
+        # A different chain label makes sure that neighbouring copies are
+        # never treated as the same residue
+        chain_id = CHAIN_IDS[copy_number % len(CHAIN_IDS)]
+        shift = [spacing * p for p in grid_position]
+        for line, xyz in zip(atom_lines, coordinates):
+            if len(pdb_lines) == number_of_atoms:
+                break
+            (x, y, z) = (c + s for (c, s) in zip(xyz, shift))
+            pdb_lines.append(
+                f"{line[:21]}{chain_id}{line[22:30]}{x:8.3f}{y:8.3f}{z:8.3f}"
+                f"{line[54:]}"
+            )
+    return "\n".join(pdb_lines) + "\n"
+
+
+def run_calene(pdb_string: str, dfire2_folder: str) -> Optional[float]:
+    """Runs the calene binary, returning None if it fails."""
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        pdb_path = pathlib.Path(scratch_dir) / "assembly.pdb"
+        pdb_path.write_text(pdb_string)
+        calene_output = subprocess.run(
+            [dfire2_folder + "calene", dfire2_folder + "dfire_pair.lib", pdb_path],
+            capture_output=True,
+        )
+    if calene_output.returncode != 0 or not calene_output.stdout:
+        return None
+    return float(calene_output.stdout.decode().split()[-1])
+
+
+@click.command()
+@click.option(
+    "--chain",
+    default="tests/testing_files/1ubq.pdb",
+    type=click.Path(exists=True),
+    help="PDB file containing the chain that is replicated.",
+)
+@click.option(
+    "--dfire2-folder",
+    required=True,
+    help="Folder containing dfire_pair.lib and the calene binary.",
+)
+@click.option(
+    "--sizes", default=DEFAULT_SIZES, help="Comma separated numbers of atoms."
+)
+@click.option("--gap", default=6.0, help="Gap between the copies in Angstroms.")
+@click.option("--calene", is_flag=True, help="Also time the calene binary.")
+def main(chain, dfire2_folder, sizes, gap, calene):
+    atom_lines = [
+        line
+        for line in pathlib.Path(chain).read_text().splitlines()
+        if line.startswith("ATOM")
+    ]
+    library_path = dfire2_folder + "dfire_pair.lib"
+    # The library is only loaded once per process, so it's not timed
+    dfire2.load_dfire2_library(library_path)
+
+    header = f"{'atoms':>8} {'numpy (s)':>10} {'total':>10}"
+    if calene:
+        header += f" {'calene (s)':>11} {'total':>10}"
+    print(header)
+    for number_of_atoms in (int(size) for size in sizes.split(",")):
+        pdb_string = replicate_chain(atom_lines, number_of_atoms, gap)
+
+        start_time = time.perf_counter()
+        numpy_total = dfire2.score_pdb_string(pdb_string, library_path)
+        numpy_time = time.perf_counter() - start_time
+
+        row = f"{number_of_atoms:>8} {numpy_time:>10.3f} {numpy_total:>10.1f}"
+        if calene:
+            start_time = time.perf_counter()
+            calene_total = run_calene(pdb_string, dfire2_folder)
+            calene_time = time.perf_counter() - start_time
+            row += f" {calene_time:>11.3f} {str(calene_total):>10}"
+        print(row, flush=True)
+
+
+if __name__ == "__main__":
+    main()
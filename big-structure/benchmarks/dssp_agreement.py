@@ -0,0 +1,78 @@
+"""Compares the in-process DSSP assignment to the one from mkdssp.
+
+`isambard.evaluation.tag_dssp_data` writes each design to a temporary file and
+runs `mkdssp` on it, while `assign_secondary_structure` calculates the
+assignment from the `AssemblyArrays` of the design. This reports how many of
+the residues are given the same code by both, for each design and for each of
+the DSSP states, along with the time taken by each method. mkdssp needs to be
+on the PATH.
+
+    python benchmarks/dssp_agreement.py tests/testing_files/*.pdb
+"""
+from collections import Counter
+import pathlib
+import time
+
+import ampal
+import click
+import isambard.evaluation as ev
+
+from destress_big_structure.analysis import load_design
+from destress_big_structure.structure_arrays import (
+    AssemblyArrays,
+    assign_secondary_structure,
+)
+
+# The DSSP states, a loop is written as "-" in the `ss_prop_*` columns
+DSSP_STATES = ("H", "B", "E", "G", "I", "T", "S", " ")
+
+
+@click.command()
+@click.argument("pdb_paths", nargs=-1, type=click.Path(exists=True))
+def main(pdb_paths):
+    state_totals: Counter = Counter()
+    state_matches: Counter = Counter()
+    print(
+        f"{'design':>12} {'residues':>9} {'agreement':>10} {'mkdssp (s)':>11} "
+        f"{'in process (s)':>15}"
+    )
+    for pdb_path in pdb_paths:
+        design = load_design(pathlib.Path(pdb_path).read_text())
+
+        start_time = time.perf_counter()
+        ev.tag_dssp_data(design)
+        mkdssp_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        design_arrays = AssemblyArrays.from_assembly(design)
+        secondary_structure = assign_secondary_structure(design_arrays)
+        in_process_time = time.perf_counter() - start_time
+
+        # Residues that mkdssp skipped are left out of the comparison
+        compared = [
+            (monomer.tags["dssp_data"]["ss_definition"], code)
+            for (monomer, code) in zip(design.get_monomers(), secondary_structure)
+            if isinstance(monomer, ampal.Residue) and "dssp_data" in monomer.tags
+        ]
+        matches = sum(expected == code for (expected, code) in compared)
+        state_totals.update(expected for (expected, _) in compared)
+        state_matches.update(
+            expected for (expected, code) in compared if expected == code
+        )
+        print(
+            f"{pathlib.Path(pdb_path).stem:>12} {len(compared):>9} "
+            f"{matches / max(len(compared), 1):>10.2%} {mkdssp_time:>11.3f} "
+            f"{in_process_time:>15.3f}",
+            flush=True,
+        )
+
+    print(f"\n{'state':>12} {'residues':>9} {'agreement':>10}")
+    for state in DSSP_STATES:
+        if state_totals[state]:
+            print(
+                f"{state.replace(' ', '-'):>12} {state_totals[state]:>9} "
+                f"{state_matches[state] / state_totals[state]:>10.2%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
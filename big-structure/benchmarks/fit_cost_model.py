@@ -0,0 +1,117 @@
+"""Records the time taken by each tool and fits the cost model to it.
+
+The web server predicts the run time of a metrics job from the number of atoms
+and residues in the design, using a linear model of the run time of each tool
+(see `destress_big_structure.cost_model`). This times each of the tools on a
+set of PDB files, appends the timings to a CSV file, and fits the model to all
+of the timings in that file. Run it on the server hardware with a range of
+design sizes, and set COST_MODEL_PATH to the JSON file that it writes.
+
+    python benchmarks/fit_cost_model.py --timings timings.csv \
+        --output cost_model.json /path/to/pdb/files/*.pdb
+"""
+import csv
+import os
+import pathlib
+import time
+
+import click
+
+from destress_big_structure.analysis import (
+    ALL_METRICS,
+    _analyse_design_in_process,
+    load_design,
+    run_aggrescan3d,
+    run_bude_ff,
+    run_dfire2,
+    run_evoef2,
+    run_rosetta,
+)
+from destress_big_structure.cost_model import (
+    ToolTiming,
+    design_size,
+    fit_cost_model,
+)
+from destress_big_structure.settings import (
+    AGGRESCAN3D_SCRIPT_PATH,
+    DFIRE2_FOLDER_PATH,
+    EVOEF2_BINARY_PATH,
+    ROSETTA_BINARY_PATH,
+)
+from destress_big_structure.structure_arrays import AssemblyArrays
+
+
+def time_tools(pdb_string: str):
+    start_time = time.perf_counter()
+    design = load_design(pdb_string)
+    design_arrays = AssemblyArrays.from_assembly(design)
+    _analyse_design_in_process(design, design_arrays, ALL_METRICS)
+    yield "in_process", time.perf_counter() - start_time
+
+    tool_calls = {
+        "budeFF_results": (run_bude_ff, (design,)),
+        "evoEF2_results": (run_evoef2, (pdb_string, EVOEF2_BINARY_PATH)),
+        "dfire2_results": (run_dfire2, (pdb_string, DFIRE2_FOLDER_PATH)),
+        "rosetta_results": (run_rosetta, (pdb_string, ROSETTA_BINARY_PATH)),
+        "aggrescan3d_results": (
+            run_aggrescan3d,
+            (pdb_string, AGGRESCAN3D_SCRIPT_PATH),
+        ),
+    }
+    for (name, (tool, args)) in tool_calls.items():
+        start_time = time.perf_counter()
+        tool(*args)
+        yield name, time.perf_counter() - start_time
+
+
+@click.command()
+@click.argument("pdb_paths", nargs=-1, type=click.Path(exists=True))
+@click.option(
+    "--timings",
+    default="cost_model_timings.csv",
+    help="CSV file that the timings are appended to.",
+)
+@click.option(
+    "--output", default="cost_model.json", help="File that the model is written to."
+)
+def main(pdb_paths, timings, output):
+    write_header = not os.path.exists(timings)
+    with open(timings, "a", newline="") as timings_file:
+        writer = csv.writer(timings_file)
+        if write_header:
+            writer.writerow(ToolTiming._fields)
+        for pdb_path in pdb_paths:
+            pdb_string = pathlib.Path(pdb_path).read_text()
+            (num_atoms, num_residues) = design_size(pdb_string)
+            for (tool, seconds) in time_tools(pdb_string):
+                writer.writerow([tool, num_atoms, num_residues, f"{seconds:.4f}"])
+            print(
+                f"{pathlib.Path(pdb_path).stem:>12} {num_atoms:>8} atoms "
+                f"{num_residues:>6} residues",
+                flush=True,
+            )
+
+    with open(timings, newline="") as timings_file:
+        recorded_timings = [
+            ToolTiming(
+                row["tool"],
+                int(row["num_atoms"]),
+                int(row["num_residues"]),
+                float(row["seconds"]),
+            )
+            for row in csv.DictReader(timings_file)
+        ]
+    cost_model = fit_cost_model(recorded_timings)
+    with open(output, "w") as outf:
+        outf.write(cost_model.to_json())
+
+    print(f"\n{'tool':>20} {'intercept':>10} {'per atom':>10} {'per residue':>12}")
+    for (tool, tool_cost) in cost_model.tool_costs.items():
+        print(
+            f"{tool:>20} {tool_cost.intercept:>10.3f} {tool_cost.per_atom:>10.2e} "
+            f"{tool_cost.per_residue:>12.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Measures the time saved by creating the PDB text of a design only once.
+
+`analyse_design` used to evaluate `design.pdb` for each of EvoEF2, DFIRE2,
+Rosetta and Aggrescan3D, and EvoEF2, Rosetta and Aggrescan3D each wrote their
+own scratch copy of it. Now the PDB text and scratch copy are created once and
+shared. This times both approaches for the input preparation of a single
+design, optionally replicating each structure to make a larger assembly.
+
+    python benchmarks/pdb_serialisation.py tests/testing_files/*.pdb
+"""
+import pathlib
+import statistics
+import tempfile
+import time
+
+import ampal
+import click
+
+from destress_big_structure.analysis import write_scratch_pdb
+from destress_big_structure.result_cache import normalise_pdb_string
+
+# Tools that were given `design.pdb`, and those that wrote it to a file
+PDB_TOOLS = ("evoef2", "dfire2", "rosetta", "aggrescan3d")
+FILE_TOOLS = ("evoef2", "rosetta", "aggrescan3d")
+
+
+def prepare_per_tool(design: ampal.Assembly) -> None:
+    normalise_pdb_string(design.pdb)
+    pdb_strings = [design.pdb for _ in PDB_TOOLS]
+    for _ in FILE_TOOLS:
+        with tempfile.TemporaryDirectory() as scratch_dir:
+            write_scratch_pdb(pdb_strings[0], scratch_dir)
+
+
+def prepare_once(design: ampal.Assembly) -> None:
+    pdb_string = design.pdb
+    normalise_pdb_string(pdb_string)
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        write_scratch_pdb(pdb_string, scratch_dir)
+
+
+def time_call(function, design: ampal.Assembly, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        function(design)
+        times.append(time.perf_counter() - start_time)
+    return statistics.median(times)
+
+
+@click.command()
+@click.argument("pdb_paths", nargs=-1, type=click.Path(exists=True))
+@click.option("--repeats", default=5, help="Number of times each design is timed.")
+@click.option(
+    "--copies",
+    default=1,
+    help="Number of copies of each structure in the assembly that is timed.",
+)
+def main(pdb_paths, repeats, copies):
+    print(
+        f"{'design':>12} {'atoms':>8} {'per tool (s)':>13} {'once (s)':>9} "
+        f"{'saved':>6}"
+    )
+    for pdb_path in pdb_paths:
+        structure = ampal.load_pdb(pdb_path)
+        if isinstance(structure, ampal.AmpalContainer):
+            structure = structure[0]
+        design = ampal.Assembly()
+        for _ in range(copies):
+            for polymer in structure:
+                design.append(polymer)
+        number_of_atoms = len(list(design.get_atoms()))
+
+        per_tool_time = time_call(prepare_per_tool, design, repeats)
+        once_time = time_call(prepare_once, design, repeats)
+        print(
+            f"{pathlib.Path(pdb_path).stem:>12} {number_of_atoms:>8} "
+            f"{per_tool_time:>13.3f} {once_time:>9.3f} "
+            f"{1 - once_time / per_tool_time:>6.0%}",
+            flush=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
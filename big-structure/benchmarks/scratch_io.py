@@ -0,0 +1,94 @@
+"""Compares the scratch file I/O time of a design between scratch folders.
+
+Each of EvoEF2, Rosetta and Aggrescan3D is run in its own scratch folder (see
+`scratch_directory`), which the design is written to and the tool writes its
+output files to, e.g. `score.sc` or the `output` tree of Aggrescan3D. This
+times a stand-in for that I/O, without running the tools, for each of the
+given scratch folders: the design is written to one shared scratch folder and
+each tool folder gets an output file the size of the design, which is then
+read back before the folders are removed. Point SCRATCH_DIR at the fastest.
+
+    python benchmarks/scratch_io.py --scratch-dir /tmp --scratch-dir /dev/shm \
+        tests/testing_files/*.pdb
+"""
+import os
+import pathlib
+import statistics
+import tempfile
+import time
+
+import click
+
+from destress_big_structure.analysis import write_scratch_pdb
+
+# Tools that are run in a scratch folder, and an output file that they write
+TOOL_OUTPUTS = {
+    "evoef2": "evoef2_output.txt",
+    "rosetta": "score.sc",
+    "aggrescan3d": os.path.join("output", "tmp", "folded_stats"),
+}
+
+
+def design_io(pdb_string: str, scratch_dir: str) -> None:
+    with tempfile.TemporaryDirectory(dir=scratch_dir) as design_dir:
+        write_scratch_pdb(pdb_string, design_dir)
+        for output_file in TOOL_OUTPUTS.values():
+            with tempfile.TemporaryDirectory(dir=scratch_dir) as tool_dir:
+                output_path = os.path.join(tool_dir, output_file)
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                with open(output_path, "w") as outf:
+                    outf.write(pdb_string)
+                with open(output_path) as inf:
+                    inf.read()
+
+
+def time_design_io(pdb_string: str, scratch_dir: str, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        design_io(pdb_string, scratch_dir)
+        times.append(time.perf_counter() - start_time)
+    return statistics.median(times)
+
+
+@click.command()
+@click.argument("pdb_paths", nargs=-1, type=click.Path(exists=True))
+@click.option(
+    "--scratch-dir",
+    "scratch_dirs",
+    multiple=True,
+    type=click.Path(exists=True, file_okay=False),
+    help="Scratch folder to time, can be given more than once. Defaults to the "
+    "system temporary folder and /dev/shm.",
+)
+@click.option("--repeats", default=20, help="Number of times each design is timed.")
+def main(pdb_paths, scratch_dirs, repeats):
+    if not scratch_dirs:
+        scratch_dirs = [tempfile.gettempdir()]
+        if os.path.isdir("/dev/shm"):
+            scratch_dirs.append("/dev/shm")
+    print(
+        f"{'design':>12} "
+        + " ".join(f"{scratch_dir + ' (ms)':>16}" for scratch_dir in scratch_dirs)
+    )
+    totals = {scratch_dir: 0.0 for scratch_dir in scratch_dirs}
+    for pdb_path in pdb_paths:
+        pdb_string = pathlib.Path(pdb_path).read_text()
+        design_times = []
+        for scratch_dir in scratch_dirs:
+            design_time = time_design_io(pdb_string, scratch_dir, repeats)
+            totals[scratch_dir] += design_time
+            design_times.append(design_time)
+        print(
+            f"{pathlib.Path(pdb_path).stem:>12} "
+            + " ".join(f"{design_time * 1000:>16.2f}" for design_time in design_times),
+            flush=True,
+        )
+    print(
+        f"{'total':>12} "
+        + " ".join(f"{total * 1000:>16.2f}" for total in totals.values())
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,5 @@
 cd /dependencies_for_de-stress/EvoEF2/ &&\ 
 g++ -O3 --fast-math -o EvoEF2 src/*.cpp
+cd /dependencies_for_de-stress/DFIRE2-pair/ &&\ 
+g++ -O3 -o calene calene.cc &&\ 
+g++ -O3 -o calene_part calene_part.cc
@@ -3,7 +3,7 @@ import json
 import typing as t
 import time
 
-from flask import Flask
+from flask import Flask, abort, jsonify
 from flask_cors import CORS
 from flask_graphql import GraphQLView
 from flask_sockets import Sockets
@@ -14,6 +14,15 @@ from rq.job import Job
 
 from .analysis import create_metrics_from_pdb, JpredSubmission
 from .big_structure_models import big_structure_db_session
+from .cost_model import (
+    LARGE_JOB_TIMEOUT,
+    LARGE_QUEUE,
+    SMALL_JOB_TIMEOUT,
+    SMALL_QUEUE,
+    design_size,
+    load_cost_model,
+    route_job,
+)
 from .design_models import designs_db_session
 from .elm_types import (
     ClientWebsocketIncoming,
@@ -25,6 +34,8 @@ from .elm_types import (
 )
 
 from .schema import schema
+from .settings import COST_MODEL_PATH
+from .tool_logs import fetch_full_logs
 
 # Flask Setup
 app = Flask(__name__)
@@ -32,13 +43,38 @@ sockets = Sockets(app)
 CORS(app)
 app.debug = True
 
-# Job queue setup, the worker runs in the `rq_worker` container
+# Job queue setup, the workers run in the `rq_worker` containers. Jobs are
+# routed to the small or large queue by their predicted run time.
 REDIS_CONNECTION = redis.Redis("redis", 6379)
-JOB_QUEUE = rq.Queue(connection=REDIS_CONNECTION, default_timeout=30)
+JOB_QUEUES = {
+    SMALL_QUEUE: rq.Queue(
+        SMALL_QUEUE, connection=REDIS_CONNECTION, default_timeout=SMALL_JOB_TIMEOUT
+    ),
+    LARGE_QUEUE: rq.Queue(
+        LARGE_QUEUE, connection=REDIS_CONNECTION, default_timeout=LARGE_JOB_TIMEOUT
+    ),
+}
+COST_MODEL = load_cost_model(COST_MODEL_PATH)
 
 # {{{ ServerJobManager
 
 
+def predicted_seconds_ahead(queue: rq.Queue, job_id: str) -> float:
+    """Sums the predicted run time of the jobs ahead of a job in its queue."""
+    job_ids = queue.job_ids
+    if job_id not in job_ids:
+        return 0.0
+    ids_ahead = job_ids[: job_ids.index(job_id)]
+    if not ids_ahead:
+        return 0.0
+    # Jobs that have been removed from Redis since are fetched as None
+    return sum(
+        job.meta.get("predicted_seconds", 0.0)
+        for job in Job.fetch_many(ids_ahead, connection=queue.connection)
+        if job is not None
+    )
+
+
 class ServerJobManager:
     """A wrapper that holds all information for a server job including shared state.
 
@@ -68,6 +104,7 @@ class ServerJobManager:
         self.out_msg_constructor = out_msg_constructor
         self._rq_job_handle: t.Optional[Job] = None
         self._rq_job_last_status: t.Optional[str] = None
+        self.predicted_seconds: t.Optional[float] = None
 
     @property
     def status(self):
@@ -112,6 +149,7 @@ class ServerJobManager:
         if current_status is None:
             return
         if self._rq_job_last_status != current_status:
+            self.server_job.eta = self.estimate_completion_time(current_status)
             if current_status == "queued":
                 self.status = ServerJobStatus.QUEUED()
             elif current_status == "deferred":
@@ -131,6 +169,23 @@ class ServerJobManager:
             self._rq_job_last_status = current_status
         return
 
+    def estimate_completion_time(self, current_status: str) -> t.Optional[float]:
+        """Estimates the UNIX time at which the queued job will be complete.
+
+        A queued job also has to wait for the jobs ahead of it in its queue,
+        which are assumed to take as long as they were predicted to.
+        """
+        if self.predicted_seconds is None:
+            return None
+        if current_status in ("queued", "deferred"):
+            waiting_seconds = predicted_seconds_ahead(
+                JOB_QUEUES[self._rq_job_handle.origin], self._rq_job_handle.id
+            )
+            return time.time() + waiting_seconds + self.predicted_seconds
+        elif current_status == "started":
+            return time.time() + self.predicted_seconds
+        return None
+
 
 # }}}
 
@@ -190,10 +245,18 @@ def process_client_message(
         )
         # This should always succeed as the job is always the submitted type
         input_pdb_string = server_job_manager.status.submitted().pdb_string
+        predicted_seconds = COST_MODEL.predict(*design_size(input_pdb_string))
+        job_route = route_job(predicted_seconds)
         rq_job = Job.create(
-            create_metrics_from_pdb, [input_pdb_string], connection=REDIS_CONNECTION,
+            create_metrics_from_pdb,
+            [input_pdb_string],
+            kwargs={"time_budget": job_route.time_budget},
+            connection=REDIS_CONNECTION,
+            timeout=job_route.timeout,
+            meta={"predicted_seconds": predicted_seconds},
         )
-        rq_job_handle = JOB_QUEUE.enqueue_job(rq_job)
+        server_job_manager.predicted_seconds = predicted_seconds
+        rq_job_handle = JOB_QUEUES[job_route.queue_name].enqueue_job(rq_job)
         server_job_manager.rq_job_handle = rq_job_handle
         return message_dict["tag"], server_job_manager
     else:
@@ -208,6 +271,15 @@ app.add_url_rule(
 )
 
 
+@app.route("/logs/<log_key>")
+def full_logs(log_key: str):
+    """Returns the full logs of a tool run that were shrunk by the log policy."""
+    logs = fetch_full_logs(log_key)
+    if logs is None:
+        abort(404)
+    return jsonify(logs)
+
+
 @app.teardown_appcontext
 def shutdown_session(exception=None):
     big_structure_db_session.remove()
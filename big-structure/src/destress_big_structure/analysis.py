@@ -1,10 +1,25 @@
 """Contains function for running the analytics sweet."""
 from collections import Counter
-from typing import Dict, List, Optional, Tuple, Set
+import concurrent.futures
+import dataclasses
+import functools
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Set,
+)
+import operator
 import os
-import pathlib
 import subprocess
 import tempfile
+import time
 import re
 import json
 import csv
@@ -12,12 +27,14 @@ import warnings
 
 from bs4 import BeautifulSoup
 import ampal
+from ampal.amino_acids import standard_amino_acids
 import budeff
 import budeff.force_field
 import isambard.evaluation as ev
 import numpy as np
 import requests
 
+from . import dfire2
 from .elm_types import (
     DesignMetrics,
     BudeFFOutput,
@@ -27,15 +44,61 @@ from .elm_types import (
     Aggrescan3DOutput,
     SequenceInfo,
 )
+from .coprocess import CoProcess, CoProcessError, get_coprocess_pool
+from .result_cache import (
+    ResultCache,
+    cache_key,
+    file_fingerprint,
+    get_result_cache,
+    normalise_pdb_string,
+)
+from .tool_logs import apply_log_policy
+from .structure_arrays import (
+    AssemblyArrays,
+    assign_secondary_structure,
+    calculate_hydrophobic_fitness,
+    calculate_packing_density,
+    calculate_torsion_angles,
+    chain_secondary_structure,
+    torsion_angle_dict,
+)
 from destress_big_structure.settings import (
     EVOEF2_BINARY_PATH,
     DFIRE2_FOLDER_PATH,
     ROSETTA_BINARY_PATH,
     AGGRESCAN3D_SCRIPT_PATH,
     MAX_RUN_TIME,
+    ANALYSIS_WORKERS,
+    EVOEF2_COPROCESS,
+    ROSETTA_BATCH_SIZE,
+    AGGRESCAN3D_COPROCESS,
+    DSSP_IN_PROCESS,
+    SCRATCH_DIR,
 )
 
 MAX_RUN_TIME = float(MAX_RUN_TIME)
+# Number of external tools that are allowed to run at the same time for a
+# single design, 1 runs them one after another
+ANALYSIS_WORKERS = int(ANALYSIS_WORKERS) if ANALYSIS_WORKERS else 1
+# Score designs with a long-lived EvoEF2 process rather than starting EvoEF2
+# for every design
+EVOEF2_COPROCESS = (EVOEF2_COPROCESS or "").lower() in ("1", "true", "yes")
+# Markers written by the EvoEF2 ComputeStabilityServer command
+EVOEF2_SERVER_READY = "EVOEF2_SERVER_READY"
+EVOEF2_RESULT_END = "EVOEF2_RESULT_END"
+# Analyse designs with a long-lived Aggrescan3D process rather than starting
+# Python 2 and Aggrescan3D for every design
+AGGRESCAN3D_COPROCESS = (AGGRESCAN3D_COPROCESS or "").lower() in ("1", "true", "yes")
+# Markers written by aggrescan3D_server.py
+AGGRESCAN3D_SERVER_READY = "AGGRESCAN3D_SERVER_READY"
+AGGRESCAN3D_RESULT_END = "AGGRESCAN3D_RESULT_END"
+# Assign the secondary structure in process rather than running mkdssp
+DSSP_IN_PROCESS = (DSSP_IN_PROCESS or "").lower() in ("1", "true", "yes")
+# Number of designs that are scored by a single Rosetta run in batch mode
+ROSETTA_BATCH_SIZE = int(ROSETTA_BATCH_SIZE) if ROSETTA_BATCH_SIZE else 100
+# Folder that the scratch folders of the tools are created in, e.g. a tmpfs
+# such as /dev/shm, defaults to the system temporary folder
+SCRATCH_DIR = SCRATCH_DIR or None
 
 
 # We're suppressing warnings about atoms not being parameterised in BUDE FF
@@ -230,9 +293,219 @@ class JpredSubmission:
 # }}}
 # {{{ Analyse Design
 
+# The metric groups that can be switched on or off in a metric plan. The
+# sequence based metrics (composition, charge, isoelectric point and mass) are
+# essentially free, so they are always calculated.
+METRIC_GROUPS: Tuple[str, ...] = (
+    "dssp",
+    "torsion_angles",
+    "hydrophobic_fitness",
+    "packing_density",
+    "budeff",
+    "evoef2",
+    "dfire2",
+    "rosetta",
+    "aggrescan3d",
+)
+ALL_METRICS: FrozenSet[str] = frozenset(METRIC_GROUPS)
+
+# The metric group that each tool output belongs to
+TOOL_METRIC_GROUPS = {
+    "budeFF_results": "budeff",
+    "evoEF2_results": "evoef2",
+    "dfire2_results": "dfire2",
+    "rosetta_results": "rosetta",
+    "aggrescan3d_results": "aggrescan3d",
+}
+# The tools in the order of the time that they usually take, cheapest first.
+# They are started in this order, so if a design runs out of time it is the
+# slowest tools that are lost.
+TOOL_COST_ORDER: Tuple[str, ...] = (
+    "dfire2_results",
+    "budeFF_results",
+    "evoEF2_results",
+    "rosetta_results",
+    "aggrescan3d_results",
+)
+# The tools that run as a subprocess, these can be given a timeout
+SUBPROCESS_TOOLS: FrozenSet[str] = frozenset(
+    {"evoEF2_results", "rosetta_results", "aggrescan3d_results"}
+)
+# Returned by the `ToolRunner` in place of the output of a tool that ran out of
+# time
+_TIMED_OUT = object()
+# The error information and return code of a tool that ran out of time, the
+# return code is the one given to a subprocess that is killed
+TIMED_OUT_ERROR_INFO = "Timed out, the time budget for the design ran out."
+TIMED_OUT_RETURN_CODE = -9
+
+
+def parse_metric_plan(metrics_string: str) -> FrozenSet[str]:
+    """Creates a metric plan from a comma separated list of metric groups.
+
+    Parameters
+    ----------
+    metrics_string: str
+        Comma separated metric groups, e.g. "budeff,dfire2". Use "all" for
+        every metric group.
+
+    Returns
+    -------
+    metric_plan: FrozenSet[str]
+        The metric groups that are enabled.
+    """
+    requested = {m.strip().lower() for m in metrics_string.split(",") if m.strip()}
+    if "all" in requested:
+        return ALL_METRICS
+    unknown = requested.difference(ALL_METRICS)
+    if unknown:
+        raise ValueError(
+            f"Unknown metric group(s) {', '.join(sorted(unknown))}, expected "
+            f"one or more of: all, {', '.join(METRIC_GROUPS)}."
+        )
+    return frozenset(requested)
+
+
+# The slow tools, which are only run for designs that pass the triage thresholds
+TRIAGED_TOOLS: Tuple[str, ...] = (
+    "evoEF2_results",
+    "rosetta_results",
+    "aggrescan3d_results",
+)
+TRIAGED_METRIC_GROUPS: FrozenSet[str] = frozenset(
+    TOOL_METRIC_GROUPS[name] for name in TRIAGED_TOOLS
+)
+TRIAGE_COMPARISONS: Dict[str, Callable[[float, float], bool]] = {
+    "<=": operator.le,
+    ">=": operator.ge,
+    "<": operator.lt,
+    ">": operator.gt,
+}
+
+
+def _composition(letter: str) -> Callable[[DesignMetrics], Optional[float]]:
+    return lambda design_metrics: design_metrics.composition.get(letter, 0.0)
+
+
+# The metrics that triage thresholds can be set on, named as in the headless
+# output, with the metric group that each one needs (None for the sequence
+# based metrics) and a function that reads it from the `DesignMetrics`
+TRIAGE_METRICS: Dict[
+    str, Tuple[Optional[str], Callable[[DesignMetrics], Optional[float]]]
+] = {
+    **{
+        f"composition_{code}": (None, _composition(letter))
+        for (letter, code) in {**standard_amino_acids, "X": "UNK"}.items()
+    },
+    "isoelectric_point": (None, lambda dm: dm.isoelectric_point),
+    "charge": (None, lambda dm: dm.charge),
+    "mass": (None, lambda dm: dm.mass),
+    "num_residues": (None, lambda dm: dm.num_of_residues),
+    "hydrophobic_fitness": ("hydrophobic_fitness", lambda dm: dm.hydrophobic_fitness),
+    "packing_density": ("packing_density", lambda dm: dm.packing_density),
+    "budeff_total": (
+        "budeff",
+        lambda dm: getattr(dm.budeFF_results, "total_energy", None),
+    ),
+    "budeff_steric": ("budeff", lambda dm: getattr(dm.budeFF_results, "steric", None)),
+    "budeff_desolvation": (
+        "budeff",
+        lambda dm: getattr(dm.budeFF_results, "desolvation", None),
+    ),
+    "budeff_charge": ("budeff", lambda dm: getattr(dm.budeFF_results, "charge", None)),
+    "dfire2_total": ("dfire2", lambda dm: getattr(dm.dfire2_results, "total", None)),
+}
+
+
+class TriageThreshold(NamedTuple):
+    """A limit on a cheap metric that a design must meet, e.g. `charge<=5`."""
+
+    metric: str
+    comparison: str
+    value: float
+
+    def __str__(self) -> str:
+        return f"{self.metric}{self.comparison}{self.value:g}"
+
+    def metric_group(self) -> Optional[str]:
+        return TRIAGE_METRICS[self.metric][0]
+
+    def is_met(self, design_metrics: DesignMetrics) -> bool:
+        """Whether the design meets the threshold.
+
+        Metrics that could not be calculated for the design are not used to
+        reject it.
+        """
+        metric_value = TRIAGE_METRICS[self.metric][1](design_metrics)
+        if metric_value is None:
+            return True
+        return TRIAGE_COMPARISONS[self.comparison](metric_value, self.value)
+
+
+def parse_triage_thresholds(thresholds_string: str) -> Tuple[TriageThreshold, ...]:
+    """Creates triage thresholds from a comma separated list.
+
+    Parameters
+    ----------
+    thresholds_string: str
+        Comma separated thresholds, each made from the name of a metric in
+        `TRIAGE_METRICS`, a comparison (`<`, `<=`, `>` or `>=`) and a value,
+        e.g. "charge<=5,packing_density>=55,dfire2_total<0".
+
+    Returns
+    -------
+    triage_thresholds: Tuple[TriageThreshold, ...]
+        The thresholds, which are all met by a design that passes triage.
+    """
+    triage_thresholds = []
+    for threshold_string in thresholds_string.split(","):
+        if not threshold_string.strip():
+            continue
+        threshold_match = re.fullmatch(
+            r"\s*(\w+)\s*(<=|>=|<|>)\s*(\S+)\s*", threshold_string
+        )
+        if threshold_match is None:
+            raise ValueError(
+                f"Cannot read the triage threshold `{threshold_string.strip()}`, "
+                "expected a metric, a comparison and a value, e.g. `charge<=5`."
+            )
+        (metric, comparison, value) = threshold_match.groups()
+        if metric not in TRIAGE_METRICS:
+            raise ValueError(
+                f"Unknown triage metric {metric}, expected one of: "
+                f"{', '.join(TRIAGE_METRICS)}."
+            )
+        try:
+            triage_thresholds.append(TriageThreshold(metric, comparison, float(value)))
+        except ValueError:
+            raise ValueError(f"The triage threshold value `{value}` is not a number.")
+    return tuple(triage_thresholds)
+
+
+def triage_metric_groups(
+    triage_thresholds: Sequence[TriageThreshold],
+) -> FrozenSet[str]:
+    """The metric groups that are needed to check a set of triage thresholds."""
+    return frozenset(
+        threshold.metric_group()
+        for threshold in triage_thresholds
+        if threshold.metric_group() is not None
+    )
+
 
-def create_metrics_from_pdb(pdb_string: str) -> DesignMetrics:
+def failed_triage_thresholds(
+    design_metrics: DesignMetrics, triage_thresholds: Sequence[TriageThreshold]
+) -> List[TriageThreshold]:
+    """The triage thresholds that a design does not meet."""
+    return [
+        threshold
+        for threshold in triage_thresholds
+        if not threshold.is_met(design_metrics)
+    ]
 
+
+def load_design(pdb_string: str) -> ampal.Assembly:
+    """Loads the first state of a PDB string, relabelled for analysis."""
     ampal_assembly = ampal.load_pdb(pdb_string, path=False)
     # relabel everything to remove annoying insertion codes!
     ampal_assembly.relabel_all()
@@ -240,43 +513,245 @@ def create_metrics_from_pdb(pdb_string: str) -> DesignMetrics:
         ampal_assembly = ampal_assembly[0]
     if not ampal_assembly._molecules:
         raise ValueError("No PDB format data found in file.")
-    design_metrics = analyse_design(ampal_assembly)
+    return ampal_assembly
+
+
+def create_metrics_from_pdb(
+    pdb_string: str,
+    metrics: FrozenSet[str] = ALL_METRICS,
+    precomputed_results: Optional[Dict[str, Any]] = None,
+    triage_thresholds: Sequence[TriageThreshold] = (),
+    time_budget: Optional[float] = None,
+) -> DesignMetrics:
+
+    # The time budget includes loading the design
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
+    ampal_assembly = load_design(pdb_string)
+    design_metrics = analyse_design(
+        ampal_assembly,
+        metrics=metrics,
+        precomputed_results=precomputed_results,
+        triage_thresholds=triage_thresholds,
+        deadline=deadline,
+    )
     return design_metrics
 
 
-def analyse_design(design: ampal.Assembly) -> DesignMetrics:
-    assert (
-        EVOEF2_BINARY_PATH
-    ), "EVOEF2_BINARY_PATH is not defined, check you `.env` file"
-    assert (
-        DFIRE2_FOLDER_PATH
-    ), "DFIRE2_FOLDER_PATH is not defined, check you `.env` file"
-    assert (
-        ROSETTA_BINARY_PATH
-    ), "ROSETTA_BINARY_PATH is not defined, check you `.env` file"
-    assert (
-        AGGRESCAN3D_SCRIPT_PATH
-    ), "AGGRESCAN3D_SCRIPT_PATH is not defined, check you `.env` file"
+def analyse_design(
+    design: ampal.Assembly,
+    max_workers: Optional[int] = None,
+    result_cache: Optional[ResultCache] = None,
+    metrics: FrozenSet[str] = ALL_METRICS,
+    precomputed_results: Optional[Dict[str, Any]] = None,
+    pdb_string: Optional[str] = None,
+    triage_thresholds: Sequence[TriageThreshold] = (),
+    deadline: Optional[float] = None,
+) -> DesignMetrics:
+    """Runs the full DE-STRESS metric suite on an assembly.
+
+    The external tools (EvoEF2, DFIRE2, Rosetta and Aggrescan3D) are
+    independent of each other, so when `max_workers` is greater than 1 they
+    are launched in a pool and run while the in-process metrics are being
+    calculated. This means the wall-clock time for a design is roughly that
+    of the slowest tool rather than the sum of all of them.
+
+    The design is converted to PDB text once, and a single scratch copy of it
+    is read by all of the tools that need a file, as serialising a large
+    assembly takes a significant amount of time. In the same way, the atoms
+    are copied into an `AssemblyArrays` once, which is shared by the
+    in-process metrics. If `DSSP_IN_PROCESS` is enabled, the DSSP assignment
+    is also calculated from these arrays rather than by running mkdssp.
+
+    The external tools are started cheapest first (see `TOOL_COST_ORDER`). A
+    tool that runs out of time doesn't fail the analysis, it is listed in
+    `timed_out_tools` and given an output from `timed_out_output`, so an RQ
+    job that has a time limit can still return the metrics that were finished.
 
-    try:
-        ev.tag_dssp_data(design)
-    except subprocess.CalledProcessError as e:
-        print(f"Cannot compute the DSSP assignment due to a CalledProcessError:\n {e}")
+    Parameters
+    ----------
+    design: ampal.Assembly
+        The design to be analysed.
+    max_workers: Optional[int]
+        Number of external tools to run at the same time. Defaults to the
+        `ANALYSIS_WORKERS` setting, a value of 1 runs the tools sequentially.
+    result_cache: Optional[ResultCache]
+        Cache used to skip tools that have already been run on this design.
+        Defaults to the cache defined by the `RESULT_CACHE_*` settings.
+    metrics: FrozenSet[str]
+        The metric plan, a set of the metric groups (see `METRIC_GROUPS`) to
+        calculate. Tools that are not in the plan are not run at all and their
+        fields in the `DesignMetrics` are set to None.
+    precomputed_results: Optional[Dict[str, Any]]
+        Outputs of tools that have already been run on this design, keyed by
+        the name of the output (e.g. "rosetta_results"). These tools are not
+        run again, which is used to score a batch of designs with a single
+        Rosetta run (see `run_rosetta_batch`).
+    pdb_string: Optional[str]
+        The design as PDB text, if this has already been created. Defaults to
+        `design.pdb`.
+    triage_thresholds: Sequence[TriageThreshold]
+        Thresholds on the cheap metrics, see `parse_triage_thresholds`. If any
+        are given, the slow tools (`TRIAGED_TOOLS`) are only run once the
+        in-process metrics, BUDE FF and DFIRE2 show that the design meets all
+        of them, otherwise their outputs are set to None.
+    deadline: Optional[float]
+        The `time.monotonic` time by which the analysis must be finished. Each
+        subprocess is given the time that is left, up to `MAX_RUN_TIME`, and
+        tools that would start after the deadline are not run. By default each
+        subprocess is given `MAX_RUN_TIME`.
+
+    Returns
+    -------
+    design_metrics: DesignMetrics
+        The metrics for the design.
+    """
+    if max_workers is None:
+        max_workers = ANALYSIS_WORKERS
+    if result_cache is None:
+        result_cache = get_result_cache()
+    if "evoef2" in metrics:
+        assert (
+            EVOEF2_BINARY_PATH
+        ), "EVOEF2_BINARY_PATH is not defined, check you `.env` file"
+    if "dfire2" in metrics:
+        assert (
+            DFIRE2_FOLDER_PATH
+        ), "DFIRE2_FOLDER_PATH is not defined, check you `.env` file"
+    if "rosetta" in metrics:
+        assert (
+            ROSETTA_BINARY_PATH
+        ), "ROSETTA_BINARY_PATH is not defined, check you `.env` file"
+    if "aggrescan3d" in metrics:
+        assert (
+            AGGRESCAN3D_SCRIPT_PATH
+        ), "AGGRESCAN3D_SCRIPT_PATH is not defined, check you `.env` file"
+
+    if pdb_string is None:
+        pdb_string = design.pdb
+    with scratch_directory() as scratch_dir:
+        # The tools that read a file share this copy of the design, but they
+        # still run in their own scratch folders
+        pdb_path = write_scratch_pdb(pdb_string, scratch_dir)
+        all_tool_calls: Dict[str, Tuple[Callable, Tuple[Any, ...]]] = {
+            "budeFF_results": (run_bude_ff, (design,)),
+            "evoEF2_results": (
+                run_evoef2,
+                (pdb_string, EVOEF2_BINARY_PATH, pdb_path),
+            ),
+            "dfire2_results": (run_dfire2, (pdb_string, DFIRE2_FOLDER_PATH)),
+            "rosetta_results": (
+                run_rosetta,
+                (pdb_string, ROSETTA_BINARY_PATH, pdb_path),
+            ),
+            "aggrescan3d_results": (
+                run_aggrescan3d,
+                (pdb_string, AGGRESCAN3D_SCRIPT_PATH, pdb_path),
+            ),
+        }
+        tool_calls = {
+            name: all_tool_calls[name]
+            for name in TOOL_COST_ORDER
+            if TOOL_METRIC_GROUPS[name] in metrics
+        }
+        precomputed_results = {
+            name: output
+            for (name, output) in (precomputed_results or {}).items()
+            if name in tool_calls
+        }
+        tool_calls = {
+            name: tool_call
+            for (name, tool_call) in tool_calls.items()
+            if name not in precomputed_results
+        }
+        if result_cache is not None:
+            (tool_results, tool_calls) = use_result_cache(
+                result_cache, normalise_pdb_string(pdb_string), tool_calls
+            )
+        else:
+            tool_results = {}
+        tool_results.update(precomputed_results)
+        triaged_calls = {
+            name: tool_call
+            for (name, tool_call) in tool_calls.items()
+            if triage_thresholds and name in TRIAGED_TOOLS
+        }
+        with ToolRunner(max_workers, deadline=deadline) as tool_runner:
+            # The external tools are started first so that they can run while
+            # the in-process metrics below are calculated, apart from the slow
+            # tools that have to wait for the design to pass triage
+            tool_runner.submit_all(
+                {
+                    name: tool_call
+                    for (name, tool_call) in tool_calls.items()
+                    if name not in triaged_calls
+                }
+            )
+            design_arrays = AssemblyArrays.from_assembly(design)
+            design_metrics = _analyse_design_in_process(
+                design, design_arrays, metrics
+            )
+            tool_results.update(tool_runner.results())
+            if triaged_calls:
+                cheap_metrics = DesignMetrics(
+                    **design_metrics,
+                    **{name: tool_results.get(name) for name in all_tool_calls},
+                )
+                if not failed_triage_thresholds(cheap_metrics, triage_thresholds):
+                    tool_runner.submit_all(triaged_calls)
+                    tool_results.update(tool_runner.results())
+    timed_out_tools = [
+        name for name in TOOL_COST_ORDER if name in tool_runner.timed_out_tools
+    ]
+    tool_results.update({name: timed_out_output(name) for name in timed_out_tools})
+    disabled_tools = {
+        name: None for name in all_tool_calls if name not in tool_results
+    }
+    design_metrics = DesignMetrics(
+        **design_metrics,
+        **tool_results,
+        **disabled_tools,
+        timed_out_tools=timed_out_tools,
+    )
+    return design_metrics
+
+
+def _analyse_design_in_process(
+    design: ampal.Assembly, design_arrays: AssemblyArrays, metrics: FrozenSet[str]
+) -> Dict[str, Any]:
+    """Calculates the metrics that do not depend on an external tool."""
+    chain_dssp_assignments = None
+    if "dssp" in metrics and DSSP_IN_PROCESS:
+        chain_dssp_assignments = design_dssp_assignments(design_arrays)
+    elif "dssp" in metrics:
+        try:
+            ev.tag_dssp_data(design)
+        except subprocess.CalledProcessError as e:
+            print(
+                f"Cannot compute the DSSP assignment due to a CalledProcessError:\n {e}"
+            )
 
     sequence_info = {
         chain.id: SequenceInfo(
             sequence="".join(m.mol_letter for m in chain),
-            dssp_assignment="".join(
-                m.tags["dssp_data"]["ss_definition"] for m in chain
+            dssp_assignment=(
+                (
+                    chain_dssp_assignments[chain.id]
+                    if chain_dssp_assignments is not None
+                    else "".join(m.tags["dssp_data"]["ss_definition"] for m in chain)
+                )
+                if "dssp" in metrics
+                else None
             ),
         )
         for chain in design
         if isinstance(chain, ampal.Polypeptide)
     }
     full_sequence = "".join(si.sequence for si in sequence_info.values())
-    dssp_assignment = "".join(
-        si.dssp_assignment for si in sequence_info.values()
-    ).replace(" ", "-")
+    dssp_assignment = (
+        "".join(si.dssp_assignment for si in sequence_info.values()).replace(" ", "-")
+        if "dssp" in metrics
+        else None
+    )
     num_of_residues = len(full_sequence)
     isoelectric_point = ampal.analyse_protein.sequence_isoelectric_point(
         full_sequence.replace("X", "")
@@ -285,60 +760,351 @@ def analyse_design(design: ampal.Assembly) -> DesignMetrics:
     mass = ampal.analyse_protein.sequence_molecular_weight(
         full_sequence.replace("X", "")
     )
-    design_metrics = DesignMetrics(
+    design_metrics = dict(
         sequence_info=sequence_info,
         full_sequence=full_sequence,
         dssp_assignment=dssp_assignment,
         composition={
             k: v / num_of_residues for (k, v) in Counter(full_sequence).items()
         },
-        torsion_angles=design_torsion_angles(design),
-        hydrophobic_fitness=design_hydrophobic_fitness(design),
+        torsion_angles=(
+            design_torsion_angles(design_arrays)
+            if "torsion_angles" in metrics
+            else None
+        ),
+        hydrophobic_fitness=(
+            design_hydrophobic_fitness(design_arrays)
+            if "hydrophobic_fitness" in metrics
+            else None
+        ),
         isoelectric_point=isoelectric_point,
         charge=charge,
         num_of_residues=num_of_residues,
         mass=mass,
-        packing_density=design_mean_packing_density(design),
-        budeFF_results=run_bude_ff(design),
-        evoEF2_results=run_evoef2(design.pdb, EVOEF2_BINARY_PATH),
-        dfire2_results=run_dfire2(design.pdb, DFIRE2_FOLDER_PATH),
-        rosetta_results=run_rosetta(design.pdb, ROSETTA_BINARY_PATH),
-        aggrescan3d_results=run_aggrescan3d(design.pdb, AGGRESCAN3D_SCRIPT_PATH),
+        packing_density=(
+            design_mean_packing_density(design_arrays)
+            if "packing_density" in metrics
+            else None
+        ),
     )
     return design_metrics
 
 
+def timed_out_output(name: str) -> Any:
+    """Creates the output of a tool that ran out of time.
+
+    All of the metrics are None and the error information records the timeout,
+    the output has the same type as that of a finished run so that it can still
+    be decoded by the front end.
+
+    Parameters
+    ----------
+    name: str
+        The name of the tool output, e.g. "rosetta_results".
+
+    Returns
+    -------
+    tool_output: Any
+        The output, an instance of `TOOL_OUTPUT_TYPES[name]`.
+    """
+    output_type = TOOL_OUTPUT_TYPES[name]
+    timed_out_values = {
+        "log_info": "",
+        "error_info": TIMED_OUT_ERROR_INFO,
+        "return_code": TIMED_OUT_RETURN_CODE,
+    }
+    return output_type(
+        **{
+            output_field.name: timed_out_values.get(output_field.name)
+            for output_field in dataclasses.fields(output_type)
+            if output_field.init
+        }
+    )
+
+
+class ToolRunner:
+    """Runs the external analysis tools for a design, optionally concurrently.
+
+    Tools are submitted with `submit_all` and their outputs are collected with
+    `results`. When `max_workers` is 1 the tools are run lazily, one after
+    another, when the results are requested so that the behaviour is the same
+    as calling them directly.
+
+    Notes
+    -----
+    The tool wrappers do not touch any process-global state and spend their
+    time waiting on subprocesses, so a thread pool is used. This also means
+    that it is safe to use from inside the daemonic workers of a
+    `multiprocessing.Pool`, such as those used by headless DE-STRESS.
+
+    Parameters
+    ----------
+    max_workers: int
+        The number of tools that are allowed to run at the same time.
+    deadline: Optional[float]
+        The `time.monotonic` time by which the tools must have finished. Tools
+        that start after it are not run, and the subprocess tools
+        (`SUBPROCESS_TOOLS`) are given the time that is left as their timeout.
+        Only a tool that is stopped by the deadline is reported as timed out,
+        running over `MAX_RUN_TIME` raises `subprocess.TimeoutExpired` as usual.
+
+    Attributes
+    ----------
+    timed_out_tools: List[str]
+        The tools that were skipped or stopped because they ran out of time,
+        they are left out of the `results`.
+    """
+
+    def __init__(self, max_workers: int, deadline: Optional[float] = None):
+        self.max_workers = max_workers
+        self.deadline = deadline
+        self.timed_out_tools: List[str] = []
+        self._executor: Optional[concurrent.futures.Executor] = None
+        self._calls: Dict[str, Tuple[Callable, Tuple[Any, ...]]] = {}
+        self._futures: Dict[str, concurrent.futures.Future] = {}
+
+    def __enter__(self) -> "ToolRunner":
+        if self.max_workers > 1:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers
+            )
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def submit_all(self, tool_calls: Dict[str, Tuple[Callable, Tuple[Any, ...]]]):
+        """Submits a set of tool calls, keyed by the name of their output."""
+        for name, (tool, args) in tool_calls.items():
+            if self._executor is None:
+                self._calls[name] = (tool, args)
+            else:
+                self._futures[name] = self._executor.submit(
+                    self._run_tool, name, tool, args
+                )
+
+    def results(self) -> Dict[str, Any]:
+        """Waits for all of the submitted tools and returns their outputs."""
+        tool_results = {
+            name: self._run_tool(name, tool, args)
+            for (name, (tool, args)) in self._calls.items()
+        }
+        tool_results.update(
+            {name: future.result() for (name, future) in self._futures.items()}
+        )
+        self._calls = {}
+        self._futures = {}
+        self.timed_out_tools.extend(
+            name for (name, output) in tool_results.items() if output is _TIMED_OUT
+        )
+        return {
+            name: output
+            for (name, output) in tool_results.items()
+            if output is not _TIMED_OUT
+        }
+
+    def _run_tool(self, name: str, tool: Callable, args: Tuple[Any, ...]) -> Any:
+        kwargs = {}
+        # Whether the tool is stopped by the deadline, rather than `MAX_RUN_TIME`
+        is_budget_limited = False
+        if self.deadline is not None:
+            remaining_time = self.deadline - time.monotonic()
+            if remaining_time <= 0:
+                return _TIMED_OUT
+            if name in SUBPROCESS_TOOLS:
+                kwargs["timeout"] = min(MAX_RUN_TIME, remaining_time)
+                is_budget_limited = remaining_time < MAX_RUN_TIME
+        try:
+            return tool(*args, **kwargs)
+        except subprocess.TimeoutExpired:
+            # Running over `MAX_RUN_TIME` is a failure of the tool itself, not
+            # of the time budget, so it isn't reported as a budget timeout
+            if not is_budget_limited:
+                raise
+            return _TIMED_OUT
+
+
 # }}}
-# {{{ DesignMetrics
-def design_hydrophobic_fitness(design: ampal.Assembly) -> Optional[float]:
+# {{{ Result Cache
+
+TOOL_OUTPUT_TYPES = {
+    "budeFF_results": BudeFFOutput,
+    "evoEF2_results": EvoEF2Output,
+    "dfire2_results": DFIRE2Output,
+    "rosetta_results": RosettaOutput,
+    "aggrescan3d_results": Aggrescan3DOutput,
+}
+
+
+# The versions of the parts of the tools that aren't files, i.e. the BUDE FF
+# package and the DE-STRESS implementation of DFIRE2
+TOOL_VERSION_LABELS: Dict[str, str] = {
+    "budeFF_results": f"budeff:{getattr(budeff, '__version__', '')}",
+    "dfire2_results": "dfire2-numpy",
+}
+
+
+def _tool_relative_path(tool_path: Optional[str], *path_parts: str) -> Optional[str]:
+    """A path relative to the folder of a tool file, None if it isn't set."""
+    if not tool_path:
+        return None
+    return os.path.normpath(os.path.join(os.path.dirname(tool_path), *path_parts))
+
+
+@functools.lru_cache(maxsize=None)
+def aggrescan3d_package_path() -> Optional[str]:
+    """Finds the folder of the `aggrescan` package, None if it isn't installed.
+
+    Aggrescan3D is installed for Python 2, so it's found by asking `python2`.
+    """
     try:
-        hydrophobic_fitness = ev.calculate_hydrophobic_fitness(design)
-    except ZeroDivisionError:
-        hydrophobic_fitness = None
-    return hydrophobic_fitness
+        python2_output = subprocess.run(
+            [
+                "python2",
+                "-c",
+                "import os, aggrescan; print(os.path.dirname(aggrescan.__file__))",
+            ],
+            capture_output=True,
+            timeout=MAX_RUN_TIME,
+            check=True,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return python2_output.stdout.decode().strip() or None
 
 
-def design_mean_packing_density(design: ampal.Assembly) -> float:
-    ev.tag_packing_density(design)
-    mean_packing_density = np.mean(
-        [a.tags["packing density"] for a in design.get_atoms() if a.element != "H"]
-    )
+def tool_files() -> Dict[str, List[Optional[str]]]:
+    """The files and folders that make up each tool, keyed by its output.
+
+    As well as the binary or script that is run, this includes the data that
+    the tool loads, as changing it can change the results. Paths are None if
+    the tool isn't set up.
+    """
+    return {
+        "budeFF_results": [],
+        "evoEF2_results": [
+            EVOEF2_BINARY_PATH,
+            _tool_relative_path(EVOEF2_BINARY_PATH, "library"),
+            _tool_relative_path(EVOEF2_BINARY_PATH, "wread"),
+        ],
+        "dfire2_results": [
+            os.path.join(DFIRE2_FOLDER_PATH, "dfire_pair.lib")
+            if DFIRE2_FOLDER_PATH
+            else None
+        ],
+        # The binaries are in `source/bin`, which Rosetta finds its database from
+        "rosetta_results": [
+            ROSETTA_BINARY_PATH,
+            _tool_relative_path(ROSETTA_BINARY_PATH, os.pardir, os.pardir, "database"),
+        ],
+        # The folder of the script also contains the co-process server
+        "aggrescan3d_results": [
+            _tool_relative_path(AGGRESCAN3D_SCRIPT_PATH),
+            aggrescan3d_package_path(),
+        ],
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def tool_fingerprints() -> Dict[str, str]:
+    """Fingerprints for each tool, used to invalidate cached results.
+
+    Walking the tool folders, e.g. the Rosetta database, takes a while, so this
+    is only done once per process. The tools only change when the image is
+    rebuilt, which restarts the workers.
+    """
+    return {
+        name: ";".join(
+            fingerprint_part
+            for fingerprint_part in (
+                TOOL_VERSION_LABELS.get(name, ""),
+                file_fingerprint(paths) if paths else "",
+            )
+            if fingerprint_part
+        )
+        for (name, paths) in tool_files().items()
+    }
+
+
+def use_result_cache(
+    result_cache: ResultCache,
+    normalised_pdb: str,
+    tool_calls: Dict[str, Tuple[Callable, Tuple[Any, ...]]],
+) -> Tuple[Dict[str, Any], Dict[str, Tuple[Callable, Tuple[Any, ...]]]]:
+    """Looks up the output of each tool in the cache.
+
+    Parameters
+    ----------
+    result_cache: ResultCache
+        The cache to use.
+    normalised_pdb: str
+        The ATOM records of the relabelled design, which identify the design.
+    tool_calls: Dict[str, Tuple[Callable, Tuple[Any, ...]]]
+        The tool calls keyed by the name of their output.
+
+    Returns
+    -------
+    cached_results: Dict[str, Any]
+        The outputs of the tools that were found in the cache.
+    remaining_calls: Dict[str, Tuple[Callable, Tuple[Any, ...]]]
+        The tool calls that still need to be made, wrapped so that their output
+        is stored in the cache once they have run.
+    """
+    fingerprints = tool_fingerprints()
+    cached_results: Dict[str, Any] = {}
+    remaining_calls: Dict[str, Tuple[Callable, Tuple[Any, ...]]] = {}
+    for name, (tool, args) in tool_calls.items():
+        key = cache_key(normalised_pdb, name, fingerprints[name])
+        cached_value = result_cache.get(name, key)
+        if cached_value is not None:
+            cached_results[name] = TOOL_OUTPUT_TYPES[name].from_json(cached_value)
+        else:
+            remaining_calls[name] = (
+                _run_and_cache_tool,
+                (result_cache, key, tool, args),
+            )
+    return cached_results, remaining_calls
+
+
+def _run_and_cache_tool(
+    result_cache: ResultCache,
+    key: str,
+    tool: Callable,
+    args: Tuple[Any, ...],
+    **kwargs: Any,
+) -> Any:
+    output = tool(*args, **kwargs)
+    # Failed runs are not cached, as they might only have failed this time, e.g.
+    # if a co-process crashed. BUDE FF runs in process and has no return code.
+    if getattr(output, "return_code", 0) == 0:
+        result_cache.set(key, output.to_json())
+    return output
+
+
+# }}}
+# {{{ DesignMetrics
+def design_hydrophobic_fitness(design_arrays: AssemblyArrays) -> Optional[float]:
+    return calculate_hydrophobic_fitness(design_arrays)
+
+
+def design_mean_packing_density(design_arrays: AssemblyArrays) -> float:
+    packing_density = calculate_packing_density(design_arrays)
+    mean_packing_density = np.mean(packing_density[~np.isnan(packing_density)])
     return mean_packing_density
 
 
+def design_dssp_assignments(design_arrays: AssemblyArrays) -> Dict[str, str]:
+    secondary_structure = assign_secondary_structure(design_arrays)
+    return chain_secondary_structure(design_arrays, secondary_structure)
+
+
 def design_torsion_angles(
-    design: ampal.Assembly,
+    design_arrays: AssemblyArrays,
 ) -> Dict[str, Tuple[float, float, float]]:
-    design.tag_torsion_angles()
-    torsion_angles = {}
-    for residue in list(design.get_monomers()):
-        if "tas" in residue.tags:
-            tas = residue.tags["tas"]
-            if all(tas):
-                (ch, (ic, rn, _)) = residue.unique_id
-                id_string = f"{ch}{rn}{ic}".strip()
-                torsion_angles[id_string] = tas
-    return torsion_angles
+    torsion_angles = calculate_torsion_angles(design_arrays)
+    return torsion_angle_dict(design_arrays, torsion_angles)
 
 
 def analyse_chain(chain: ampal.Polymer) -> Dict:
@@ -380,12 +1146,42 @@ def run_bude_ff(ampal_assembly: ampal.Assembly) -> BudeFFOutput:
 # {{{ EvoEF2Output
 
 
-def run_evoef2(pdb_string: str, evoef2_binary_path: str) -> EvoEF2Output:
+def scratch_directory() -> tempfile.TemporaryDirectory:
+    """Creates a private scratch folder for a tool in `SCRATCH_DIR`.
+
+    All of the tool wrappers write their input and output files to a folder
+    created by this, so pointing `SCRATCH_DIR` at a tmpfs keeps this I/O off
+    the disk.
+    """
+    return tempfile.TemporaryDirectory(dir=SCRATCH_DIR)
+
+
+def write_scratch_pdb(pdb_string: str, scratch_dir: str) -> str:
+    """Writes a PDB string into a scratch folder and returns its absolute path.
+
+    The tool wrappers never change the working directory of the process, they
+    write their input into a private scratch folder and run the tool with that
+    folder as its `cwd`. This keeps them safe to use from threads or greenlets.
+    """
+    pdb_path = os.path.join(os.path.abspath(scratch_dir), "design.pdb")
+    with open(pdb_path, "w") as outf:
+        outf.write(pdb_string)
+    return pdb_path
+
+
+def run_evoef2(
+    pdb_string: str,
+    evoef2_binary_path: str,
+    pdb_path: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> EvoEF2Output:
     """Defining a function to run EvoEF2 on an input PDB file.
     EvoEF2 is an energy function that was optimised by sequence recapitulation
     and can be used to estimate protein stability. First this function runs
     EvoEF2 on the input PDB file and then the output is parsed into a
-    dictionary and then converted into and EvoEF2Output object.
+    dictionary and then converted into and EvoEF2Output object. If
+    `EVOEF2_COPROCESS` is enabled, the PDB file is sent to a long-lived EvoEF2
+    process, so the parameter files are only read once per worker.
     Notes
     -----
     Reference: Xiaoqiang Huang, Robin Pearce, Yang Zhang. EvoEF2: accurate and
@@ -393,10 +1189,15 @@ def run_evoef2(pdb_string: str, evoef2_binary_path: str) -> EvoEF2Output:
     (2020) 36:1135-1142
     Parameters
     ----------
-    pdb_file_path: str
-        File path for the PDB file.
-    evoef2_path: str
+    pdb_string: str
+        The PDB file as a string.
+    evoef2_binary_path: str
         File path for the EvoEF2.
+    pdb_path: Optional[str]
+        Path of a file that already contains `pdb_string`, otherwise it's
+        written to the scratch folder.
+    timeout: Optional[float]
+        Seconds that EvoEF2 is allowed to run for, defaults to `MAX_RUN_TIME`.
     Returns
     -------
     evoef2_output: EvoEF2Output
@@ -404,43 +1205,120 @@ def run_evoef2(pdb_string: str, evoef2_binary_path: str) -> EvoEF2Output:
         EvoEF2 run, the energy function output and the time it took for
         EvoEF2 to run.
     """
-
-    starting_directory = pathlib.Path.cwd()
-    try:
-        with tempfile.NamedTemporaryFile(mode="w") as tmp:
-            # changing working dir so that EvoEF doesn't create files in the users cwd
-            temp_folder = pathlib.Path(tmp.name).parent
-            os.chdir(temp_folder)
-
-            # writing the pdb string to a temp file as input for EvoEF
-            tmp.write(pdb_string)
-
+    if timeout is None:
+        timeout = MAX_RUN_TIME
+
+    with scratch_directory() as scratch_dir:
+        # Each run gets a private scratch folder, which is used as the working
+        # directory of EvoEF2 so that it doesn't create files in the users cwd
+        if pdb_path is None:
+            pdb_path = write_scratch_pdb(pdb_string, scratch_dir)
+
+        if EVOEF2_COPROCESS:
+            (stdout, stderr, return_code) = run_evoef2_coprocess(
+                pdb_path, evoef2_binary_path, timeout
+            )
+        else:
             # Creating bash command
             cmd = [
                 evoef2_binary_path,
                 "--command=ComputeStability",
-                "--pdb=" + tmp.name,
+                "--pdb=" + pdb_path,
             ]
 
             # Using subprocess to run this command and capturing the output
             evoef2_stdout = subprocess.run(
-                cmd, capture_output=True, timeout=MAX_RUN_TIME
+                cmd, capture_output=True, timeout=timeout, cwd=scratch_dir
             )
+            stdout = evoef2_stdout.stdout.decode()
+            stderr = evoef2_stdout.stderr.decode()
+            return_code = evoef2_stdout.returncode
+
+    return parse_evoef2_output(stdout, stderr, return_code)
+
 
-    finally:
-        # Change back to starting directory before checking return code
-        os.chdir(starting_directory)
+def run_evoef2_coprocess(
+    pdb_path: str, evoef2_binary_path: str, timeout: Optional[float] = None
+) -> Tuple[str, str, int]:
+    """Scores a PDB file with a long-lived EvoEF2 process.
+
+    The co-process is started with the `ComputeStabilityServer` command, which
+    reads the EvoEF2 parameter files once and then scores each PDB file whose
+    path is written to its stdin. A new co-process is started if it crashes or
+    takes longer than `timeout`.
+
+    Parameters
+    ----------
+    pdb_path: str
+        Absolute path of the PDB file.
+    evoef2_binary_path: str
+        File path for the EvoEF2.
+    timeout: Optional[float]
+        Seconds that the co-process has to score the PDB file, defaults to
+        `MAX_RUN_TIME`.
 
+    Returns
+    -------
+    stdout: str
+        The EvoEF2 output for this PDB file.
+    stderr: str
+        The error output for this PDB file.
+    return_code: int
+        0 unless the co-process exited while scoring the PDB file.
+    """
+    coprocess_pool = get_coprocess_pool(
+        ("evoef2", evoef2_binary_path),
+        functools.partial(
+            CoProcess,
+            [evoef2_binary_path, "--command=ComputeStabilityServer"],
+            end_marker=EVOEF2_RESULT_END,
+            ready_marker=EVOEF2_SERVER_READY,
+            cwd=SCRATCH_DIR or tempfile.gettempdir(),
+            startup_timeout=MAX_RUN_TIME,
+        ),
+    )
     try:
-        evoef2_stdout.check_returncode()
+        with coprocess_pool.acquire() as coprocess:
+            (stdout, stderr) = coprocess.request(
+                pdb_path, timeout=MAX_RUN_TIME if timeout is None else timeout
+            )
+        return_code = 0
+    except CoProcessError as error:
+        # The co-process exited while starting or scoring this PDB file
+        stdout = error.output
+        stderr = error.error_output + str(error)
+        return_code = error.return_code or 1
+    return stdout, stderr, return_code
+
+
+def parse_evoef2_output(stdout: str, stderr: str, return_code: int) -> EvoEF2Output:
+    """Converts the output of the EvoEF2 ComputeStability command into an
+    EvoEF2Output object. All of the energy values are set to None if EvoEF2
+    failed.
+
+    Parameters
+    ----------
+    stdout: str
+        The output of EvoEF2.
+    stderr: str
+        The error output of EvoEF2.
+    return_code: int
+        The return code of EvoEF2.
+
+    Returns
+    -------
+    evoef2_output: EvoEF2Output
+        EvoEF2Output object.
+    """
+
+    if return_code == 0:
 
         # Splitting the result string at a substring with 92 #'s
         # then splitting the string at "Structure energy details:\n"
         # which can separate the EvoEF2 log information from the actual structure
         # energy details
         log_info, _, result_string = (
-            evoef2_stdout.stdout.decode()
-            .partition("#" * 92)[2]
+            stdout.partition("#" * 92)[2]
             .partition("Structure energy details:\n")
         )
 
@@ -455,9 +1333,9 @@ def run_evoef2(pdb_string: str, evoef2_binary_path: str) -> EvoEF2Output:
         energy_values["total"] = energy_values.pop("Total")
         energy_values["time_spent"] = energy_values.pop("Time spent")
 
-    except subprocess.CalledProcessError:
+    else:
 
-        log_info = evoef2_stdout.stdout.decode()
+        log_info = stdout
 
         # Creating a list of the energy value fields
         energy_field_list = [
@@ -529,22 +1407,18 @@ def run_evoef2(pdb_string: str, evoef2_binary_path: str) -> EvoEF2Output:
         # Setting all the energy values to None
         energy_values = dict(zip(energy_field_list, [None] * len(energy_field_list)))
 
-    # Extracting error information and the return code
-    error_info = evoef2_stdout.stderr.decode()
-    return_code = evoef2_stdout.returncode
-
     # There should be 63 energy components
     assert len(energy_values) == 63
 
     # Creating an EvoEF2 object by unpacking the output dictionary
     evoef2_output = EvoEF2Output(
         log_info=log_info,
-        error_info=error_info,
+        error_info=stderr,
         return_code=return_code,
         **energy_values,
     )
 
-    return evoef2_output
+    return apply_log_policy(evoef2_output)
 
 
 # }}}
@@ -552,7 +1426,62 @@ def run_evoef2(pdb_string: str, evoef2_binary_path: str) -> EvoEF2Output:
 
 
 def run_dfire2(pdb_string: str, dfire2_folder_path: str) -> DFIRE2Output:
-    """Defining a function to run DFIRE2 on an input PDB file.
+    """Defining a function to calculate the DFIRE2 energy of an input PDB file.
+    DFIRE2 is an energy function that was optimised by sequence recapitulation
+    and can be used to estimate protein stability. The energy is calculated in
+    process by `destress_big_structure.dfire2`, which gives the same totals as
+    the `calene` binary without starting a subprocess, and is then converted
+    into a DFIRE2Output object. `run_dfire2_calene` runs the binary itself.
+    Notes
+    -----
+    References:
+    1. Specific interactions for ab initio folding of protein terminal regions with secondary structures.
+    Proteins 72, 793-803 (2008)
+    2. Ab initio folding of terminal segments with secondary structures reveals the fine difference between
+    two closely-related all-atom statistical energy functions. Protein Science 17 1212-1219, (2008)
+    Parameters
+    ----------
+    pdb_string: str
+        The PDB file as a string.
+    dfire2_folder_path: str
+        Folder path for dfire2, which contains `dfire_pair.lib`.
+    Returns
+    -------
+    dfire2_output: DFIRE2Output
+        DFIRE2Output object
+    """
+
+    try:
+        dfire2_total_energy = dfire2.score_pdb_string(
+            pdb_string, dfire2_folder_path + "dfire_pair.lib"
+        )
+        # Matching the output of calene
+        log_info = f"design.pdb {dfire2_total_energy:.1f}\n"
+        error_info = ""
+        return_code = 0
+
+    except (OSError, ValueError, IndexError) as error:
+
+        # Setting total energy to None if there has been an error
+        dfire2_total_energy = None
+        log_info = ""
+        error_info = f"{type(error).__name__}: {error}\n"
+        return_code = 1
+
+    # Creating the DFIRE2Output object
+    dfire2_output = DFIRE2Output(
+        log_info=log_info,
+        error_info=error_info,
+        return_code=return_code,
+        total=dfire2_total_energy,
+    )
+
+    return apply_log_policy(dfire2_output)
+
+
+def run_dfire2_calene(pdb_string: str, dfire2_folder_path: str) -> DFIRE2Output:
+    """Defining a function to run the DFIRE2 binary (calene) on an input PDB file.
+    `run_dfire2` is used by DE-STRESS, this is kept to validate its results.
     DFIRE2 is an energy function that was optimised by sequence recapitulation
     and can be used to estimate protein stability. First this function runs
     DFIRE2 on the input PDB file and then the output is parsed into a
@@ -566,8 +1495,8 @@ def run_dfire2(pdb_string: str, dfire2_folder_path: str) -> DFIRE2Output:
     two closely-related all-atom statistical energy functions. Protein Science 17 1212-1219, (2008)
     Parameters
     ----------
-    pdb_file_path: str
-        File path for the PDB file.
+    pdb_string: str
+        The PDB file as a string.
     dfire2_folder_path: str
         Folder path for dfire2.
     Returns
@@ -576,30 +1505,22 @@ def run_dfire2(pdb_string: str, dfire2_folder_path: str) -> DFIRE2Output:
         DFIRE2Output object
     """
 
-    starting_directory = pathlib.Path.cwd()
-    try:
-        with tempfile.NamedTemporaryFile(mode="w") as tmp:
-            # Changing working dir so that dfire2 doesn't create files in the users cwd
-            temp_folder = pathlib.Path(tmp.name).parent
-            os.chdir(temp_folder)
-
-            # Writing the pdb string to a temp file as input for dfire2
-            tmp.write(pdb_string)
+    with scratch_directory() as scratch_dir:
+        # Each run gets a private scratch folder, which is used as the working
+        # directory of dfire2 so that it doesn't create files in the users cwd
+        pdb_path = write_scratch_pdb(pdb_string, scratch_dir)
 
-            # Creating bash command
-            cmd = [
-                dfire2_folder_path + "calene",
-                dfire2_folder_path + "dfire_pair.lib",
-                tmp.name,
-            ]
+        # Creating bash command
+        cmd = [
+            dfire2_folder_path + "calene",
+            dfire2_folder_path + "dfire_pair.lib",
+            pdb_path,
+        ]
 
-            # Using subprocess to run this command and capturing the output
-            dfire2_stdout = subprocess.run(
-                cmd, capture_output=True, timeout=MAX_RUN_TIME
-            )
-    finally:
-        # Change back to starting directory before checking return code
-        os.chdir(starting_directory)
+        # Using subprocess to run this command and capturing the output
+        dfire2_stdout = subprocess.run(
+            cmd, capture_output=True, timeout=MAX_RUN_TIME, cwd=scratch_dir
+        )
 
     # Setting the stdout as the log info
     log_info = dfire2_stdout.stdout.decode()
@@ -629,14 +1550,19 @@ def run_dfire2(pdb_string: str, dfire2_folder_path: str) -> DFIRE2Output:
         total=dfire2_total_energy,
     )
 
-    return dfire2_output
+    return apply_log_policy(dfire2_output)
 
 
 # }}}
 # {{{ RosettaOutput
 
 
-def run_rosetta(pdb_string: str, rosetta_binary_path: str) -> RosettaOutput:
+def run_rosetta(
+    pdb_string: str,
+    rosetta_binary_path: str,
+    pdb_path: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> RosettaOutput:
     """Defining a function to run the Rosetta energy function on an input PDB file,
        parse the output file and return a RosettaOutput object.
 
@@ -654,6 +1580,11 @@ def run_rosetta(pdb_string: str, rosetta_binary_path: str) -> RosettaOutput:
         File path for the PDB file.
     rosetta_binary_path: str
         File path for the Rosetta energy function.
+    pdb_path: Optional[str]
+        Path of a file that already contains `pdb_string`, otherwise it's
+        written to the scratch folder.
+    timeout: Optional[float]
+        Seconds that Rosetta is allowed to run for, defaults to `MAX_RUN_TIME`.
 
     Returns
     -------
@@ -661,81 +1592,73 @@ def run_rosetta(pdb_string: str, rosetta_binary_path: str) -> RosettaOutput:
         RosettaOutput object which contains the log and error information from the
         Rosetta run and the energy function output.
     """
+    if timeout is None:
+        timeout = MAX_RUN_TIME
+
+    with scratch_directory() as scratch_dir:
+        # Each run gets a private scratch folder, which is used as the working
+        # directory of Rosetta so that it doesn't create files in the users cwd
+        if pdb_path is None:
+            pdb_path = write_scratch_pdb(pdb_string, scratch_dir)
+
+        # Creating bash command
+        cmd = [
+            rosetta_binary_path,
+            "-in:file:s",
+            pdb_path,
+            "-ignore_unrecognized_res",
+            "-scorefile_format json",
+        ]
 
-    starting_directory = pathlib.Path.cwd()
-    try:
-        with tempfile.TemporaryDirectory() as tmp:
-
-            # Changing working directory to the temporary folder so that Rosetta
-            # doesn't create files in the users working directory
-            os.chdir(tmp)
-
-            with tempfile.NamedTemporaryFile(mode="w") as pdb:
-
-                # Writing the pdb string to a temp file as input for Rosetta
-                pdb.write(pdb_string)
-
-                # Creating bash command
-                cmd = [
-                    rosetta_binary_path,
-                    "-in:file:s",
-                    pdb.name,
-                    "-ignore_unrecognized_res",
-                    "-scorefile_format json",
-                ]
-
-                # Using subprocess to run this command and capturing the output
-                rosetta_stdout = subprocess.run(
-                    cmd, capture_output=True, timeout=MAX_RUN_TIME
-                )
+        # Using subprocess to run this command and capturing the output
+        rosetta_stdout = subprocess.run(
+            cmd, capture_output=True, timeout=timeout, cwd=scratch_dir
+        )
 
-            try:
-                rosetta_stdout.check_returncode()
-
-                # Opening the json file score.sc to get the energy values
-                with open("score.sc") as json_file:
-                    energy_values = json.load(json_file)
-
-                    # Removing decoy key that is not needed
-                    energy_values.pop("decoy", None)
-
-            except subprocess.CalledProcessError:
-
-                # Creating a list of the energy value fields
-                energy_field_list = [
-                    "dslf_fa13",
-                    "fa_atr",
-                    "fa_dun",
-                    "fa_elec",
-                    "fa_intra_rep",
-                    "fa_intra_sol_xover4",
-                    "fa_rep",
-                    "fa_sol",
-                    "hbond_bb_sc",
-                    "hbond_lr_bb",
-                    "hbond_sc",
-                    "hbond_sr_bb",
-                    "linear_chainbreak",
-                    "lk_ball_wtd",
-                    "omega",
-                    "overlap_chainbreak",
-                    "p_aa_pp",
-                    "pro_close",
-                    "rama_prepro",
-                    "ref",
-                    "score",
-                    "time",
-                    "total_score",
-                    "yhh_planarity",
-                ]
+        try:
+            rosetta_stdout.check_returncode()
+
+            # Opening the json file score.sc to get the energy values
+            with open(os.path.join(scratch_dir, "score.sc")) as json_file:
+                energy_values = json.load(json_file)
+
+                # Removing decoy key that is not needed
+                energy_values.pop("decoy", None)
+
+        except subprocess.CalledProcessError:
+
+            # Creating a list of the energy value fields
+            energy_field_list = [
+                "dslf_fa13",
+                "fa_atr",
+                "fa_dun",
+                "fa_elec",
+                "fa_intra_rep",
+                "fa_intra_sol_xover4",
+                "fa_rep",
+                "fa_sol",
+                "hbond_bb_sc",
+                "hbond_lr_bb",
+                "hbond_sc",
+                "hbond_sr_bb",
+                "linear_chainbreak",
+                "lk_ball_wtd",
+                "omega",
+                "overlap_chainbreak",
+                "p_aa_pp",
+                "pro_close",
+                "rama_prepro",
+                "ref",
+                "score",
+                "time",
+                "total_score",
+                "yhh_planarity",
+            ]
 
-                # Setting all the energy values to None
-                energy_values = dict(
-                    zip(energy_field_list, [None] * len(energy_field_list))
-                )
-    finally:
-        # Change back to starting directory
-        os.chdir(starting_directory)
+            # Setting all the energy values to None
+            energy_values = dict(
+                zip(energy_field_list, [None] * len(energy_field_list))
+            )
 
     # Extracting the log information
     log_info = rosetta_stdout.stdout.decode()
@@ -756,14 +1679,146 @@ def run_rosetta(pdb_string: str, rosetta_binary_path: str) -> RosettaOutput:
     )
 
     # Returning the output
-    return rosetta_output
+    return apply_log_policy(rosetta_output)
+
+
+def run_rosetta_batch(
+    pdb_strings: List[str],
+    rosetta_binary_path: str,
+    chunk_size: Optional[int] = None,
+) -> List[RosettaOutput]:
+    """Scores a list of PDB files with one Rosetta run per chunk of designs.
+
+    Rosetta spends several seconds initialising its database before it scores
+    anything, so scoring a chunk of designs in a single `score_jd2` run
+    amortises this start up. The designs are passed to Rosetta as a list
+    (`-in:file:l`) and the JSON line for each decoy in `score.sc` is mapped
+    back to the design it came from. Any design that is not in `score.sc`,
+    e.g. because it could not be read or the run crashed or timed out, is
+    scored again on its own with `run_rosetta` so that it gets its own log
+    and return code.
+
+    Parameters
+    ----------
+    pdb_strings: List[str]
+        The PDB files as strings.
+    rosetta_binary_path: str
+        File path for the Rosetta energy function.
+    chunk_size: Optional[int]
+        Maximum number of designs scored by a single Rosetta run. Defaults to
+        the `ROSETTA_BATCH_SIZE` setting.
+
+    Returns
+    -------
+    rosetta_outputs: List[RosettaOutput]
+        RosettaOutput object for each PDB file, in the same order as
+        `pdb_strings`.
+    """
+    if chunk_size is None:
+        chunk_size = ROSETTA_BATCH_SIZE
+    rosetta_outputs: List[RosettaOutput] = []
+    for start in range(0, len(pdb_strings), chunk_size):
+        rosetta_outputs.extend(
+            _run_rosetta_chunk(
+                pdb_strings[start : start + chunk_size], rosetta_binary_path
+            )
+        )
+    return rosetta_outputs
+
+
+def _run_rosetta_chunk(
+    pdb_strings: List[str], rosetta_binary_path: str
+) -> List[RosettaOutput]:
+    if len(pdb_strings) == 1:
+        return [run_rosetta(pdb_strings[0], rosetta_binary_path)]
+
+    energy_values: Dict[int, Dict[str, Any]] = {}
+    with scratch_directory() as scratch_dir:
+        # Each design gets its own file name, which Rosetta uses as the start
+        # of the decoy name in the score file, e.g. design_3.pdb -> design_3_0001
+        input_paths = []
+        for (i, pdb_string) in enumerate(pdb_strings):
+            input_path = os.path.join(scratch_dir, f"design_{i}.pdb")
+            with open(input_path, "w") as outf:
+                outf.write(pdb_string)
+            input_paths.append(input_path)
+        list_path = os.path.join(scratch_dir, "designs.txt")
+        with open(list_path, "w") as outf:
+            outf.write("\n".join(input_paths) + "\n")
+
+        cmd = [
+            rosetta_binary_path,
+            "-in:file:l",
+            list_path,
+            "-ignore_unrecognized_res",
+            "-scorefile_format json",
+        ]
+        try:
+            rosetta_stdout = subprocess.run(
+                cmd,
+                capture_output=True,
+                timeout=MAX_RUN_TIME * len(pdb_strings),
+                cwd=scratch_dir,
+            )
+            log_info = rosetta_stdout.stdout.decode()
+            error_info = rosetta_stdout.stderr.decode()
+        except subprocess.TimeoutExpired as e:
+            # The decoys that were scored before the timeout are still used
+            log_info = (e.stdout or b"").decode()
+            error_info = (e.stderr or b"").decode()
+
+        # The score file has a JSON object on each line, one for each decoy
+        score_path = os.path.join(scratch_dir, "score.sc")
+        if os.path.exists(score_path):
+            with open(score_path) as json_file:
+                for line in json_file:
+                    if not line.strip():
+                        continue
+                    decoy_values = json.loads(line)
+                    decoy_match = re.fullmatch(
+                        r"design_(\d+)_\d+", str(decoy_values.pop("decoy", ""))
+                    )
+                    if decoy_match and len(decoy_values) == 24:
+                        energy_values[int(decoy_match.group(1))] = decoy_values
+
+    rosetta_outputs = []
+    for (i, pdb_string) in enumerate(pdb_strings):
+        if i not in energy_values:
+            rosetta_outputs.append(run_rosetta(pdb_string, rosetta_binary_path))
+            continue
+        # Only the lines of the log that refer to this design are kept
+        design_pattern = re.compile(rf"\bdesign_{i}(\.pdb|_\d+)\b")
+        rosetta_outputs.append(
+            apply_log_policy(
+                RosettaOutput(
+                    log_info="".join(
+                        line
+                        for line in log_info.splitlines(keepends=True)
+                        if design_pattern.search(line)
+                    ),
+                    error_info="".join(
+                        line
+                        for line in error_info.splitlines(keepends=True)
+                        if design_pattern.search(line)
+                    ),
+                    return_code=0,
+                    **energy_values[i],
+                )
+            )
+        )
+    return rosetta_outputs
 
 
 # }}}
 # # {{{ Aggrescan3DOutput
 
 
-def run_aggrescan3d(pdb_string: str, aggrescan3d_script_path: str) -> Aggrescan3DOutput:
+def run_aggrescan3d(
+    pdb_string: str,
+    aggrescan3d_script_path: str,
+    pdb_path: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> Aggrescan3DOutput:
     """Defining a function to run the aggrescan3D function on an input PDB file,
        parse the output file and return a Aggrescan3DOutput object.
 
@@ -780,6 +1835,11 @@ def run_aggrescan3d(pdb_string: str, aggrescan3d_script_path: str) -> Aggrescan3
         File path for the PDB file.
     aggrescan3d_script_path: str
         Folder path for the Aggrescan3D function.
+    pdb_path: Optional[str]
+        Path of a file that already contains `pdb_string`, otherwise it's
+        written to the scratch folder.
+    timeout: Optional[float]
+        Seconds that Aggrescan3D is allowed to run for, defaults to `MAX_RUN_TIME`.
 
     Returns
     -------
@@ -787,6 +1847,8 @@ def run_aggrescan3d(pdb_string: str, aggrescan3d_script_path: str) -> Aggrescan3
         Aggrescan3DOutput object which contains the log and error information from the
         Aggrescan3D run and the function output.
     """
+    if timeout is None:
+        timeout = MAX_RUN_TIME
 
     # Creating a list of the energy value fields
     aggrescan3d_field_list = [
@@ -808,120 +1870,77 @@ def run_aggrescan3d(pdb_string: str, aggrescan3d_script_path: str) -> Aggrescan3
         zip(aggrescan3d_field_list, [None] * len(aggrescan3d_field_list))
     )
 
-    starting_directory = pathlib.Path.cwd()
-    try:
-        with tempfile.TemporaryDirectory() as tmp:
-
-            # Changing the working directory to the temporary folder so that Aggrescan3D
-            # does not create files in the users working directory
-            os.chdir(tmp)
-
-            with tempfile.NamedTemporaryFile(mode="w") as pdb:
-
-                # Writing the pdb string to a temp file as the input for Aggrescan3D
-                pdb.write(pdb_string)
-
-                # Creating bash command
-                cmd = [
-                    "python2",
-                    aggrescan3d_script_path,
-                    pdb.name,
-                ]
-
-                # Using subprocess to run this command and capturing the output
-                aggrescan3D_stdout = subprocess.run(
-                    cmd, capture_output=True, timeout=MAX_RUN_TIME
-                )
-
-            try:
-                aggrescan3D_stdout.check_returncode()
-
-                try:
-                    assert os.path.exists("output/tmp/folded_stats") and os.path.exists(
-                        "output/A3D.csv"
-                    )
+    with scratch_directory() as scratch_dir:
+        # Each run gets a private scratch folder, which is used as the working
+        # directory of Aggrescan3D so that its `output` folder is not created in
+        # the users cwd
+        if pdb_path is None:
+            pdb_path = write_scratch_pdb(pdb_string, scratch_dir)
+
+        if AGGRESCAN3D_COPROCESS:
+            (
+                log_info,
+                error_info,
+                return_code,
+                aggrescan3d_summary,
+                a3d_rows,
+            ) = run_aggrescan3d_coprocess(
+                pdb_path, scratch_dir, aggrescan3d_script_path, timeout
+            )
+        else:
+            folded_stats_path = os.path.join(
+                scratch_dir, "output", "tmp", "folded_stats"
+            )
+            a3d_csv_path = os.path.join(scratch_dir, "output", "A3D.csv")
 
-                    # Firstly getting the summary aggrescan3d score values
-                    # from a json file
-                    with open("output/tmp/folded_stats") as json_file:
-                        aggrescan3d_summary = json.load(json_file)["All"]
-
-                    # Now getting the residue level aggrescan3d score values
-                    # from a csv file
-                    with open("output/A3D.csv") as csv_file:
-
-                        # Reading csv file
-                        csv_reader = csv.reader(csv_file, delimiter=",")
-
-                        # Initialising lists to capture the output
-                        protein_list = []
-                        chain_list = []
-                        residue_number_list = []
-                        residue_name_list = []
-                        residue_score_list = []
-
-                        # Looping through each row in the csv file and appending to
-                        # the lists that were initialised above
-                        line_count = 0
-                        for row in csv_reader:
-                            if line_count > 0:
-                                protein_list.append(row[0])
-                                chain_list.append(row[1])
-                                residue_number_list.append(row[2])
-                                residue_name_list.append(row[3])
-                                residue_score_list.append(row[4])
-                            line_count += 1
-
-                        # Converting to floats and then back to strings.
-                        # This is to ensure the values are floats but they
-                        # need to be strings to be inserted into the sql table
-                        residue_score_list = list(
-                            map(convert_string_to_float, residue_score_list)
-                        )
-                        residue_score_list = list(map(str, residue_score_list))
-
-                        # Converting these lists into strings so that they can be inputted into
-                        # the sql database
-                        protein_list = ";".join(protein_list)
-                        chain_list = ";".join(chain_list)
-                        residue_number_list = ";".join(residue_number_list)
-                        residue_name_list = ";".join(residue_name_list)
-                        residue_score_list = ";".join(residue_score_list)
-
-                        # Creating a dictionary of these lists
-                        aggrescan3d_residue = {
-                            "protein_list": protein_list,
-                            "chain_list": chain_list,
-                            "residue_number_list": residue_number_list,
-                            "residue_name_list": residue_name_list,
-                            "residue_score_list": residue_score_list,
-                        }
-
-                        # Combining the two dictionaries
-                        aggrescan3d_results = {
-                            **aggrescan3d_summary,
-                            **aggrescan3d_residue,
-                        }
-
-                except AssertionError:
-
-                    # Setting all the aggrescan3d_results to None
-                    aggrescan3d_results = aggrescan3d_none_dict
-
-            except subprocess.CalledProcessError:
-
-                # Setting all the aggrescan3d_results to None
-                aggrescan3d_results = aggrescan3d_none_dict
-    finally:
-        # Change back to starting directory
-        os.chdir(starting_directory)
+            # Creating bash command
+            cmd = [
+                "python2",
+                aggrescan3d_script_path,
+                pdb_path,
+            ]
 
-    # Extracting the log information
-    log_info = aggrescan3D_stdout.stdout.decode()
+            # Using subprocess to run this command and capturing the output
+            aggrescan3D_stdout = subprocess.run(
+                cmd, capture_output=True, timeout=timeout, cwd=scratch_dir
+            )
 
-    # Extracting error information and the return code
-    error_info = aggrescan3D_stdout.stderr.decode()
-    return_code = aggrescan3D_stdout.returncode
+            # Extracting the log information
+            log_info = aggrescan3D_stdout.stdout.decode()
+
+            # Extracting error information and the return code
+            error_info = aggrescan3D_stdout.stderr.decode()
+            return_code = aggrescan3D_stdout.returncode
+
+            aggrescan3d_summary = None
+            a3d_rows = None
+            if (
+                return_code == 0
+                and os.path.exists(folded_stats_path)
+                and os.path.exists(a3d_csv_path)
+            ):
+                # Firstly getting the summary aggrescan3d score values
+                # from a json file
+                with open(folded_stats_path) as json_file:
+                    aggrescan3d_summary = json.load(json_file)["All"]
+
+                # Now getting the residue level aggrescan3d score values
+                # from a csv file
+                with open(a3d_csv_path) as csv_file:
+                    a3d_rows = list(csv.reader(csv_file, delimiter=","))
+
+    if aggrescan3d_summary is None or a3d_rows is None:
+
+        # Setting all the aggrescan3d_results to None
+        aggrescan3d_results = aggrescan3d_none_dict
+
+    else:
+
+        # Combining the summary and residue level results
+        aggrescan3d_results = {
+            **aggrescan3d_summary,
+            **parse_a3d_rows(a3d_rows),
+        }
 
     # There should be 9 aggrescan3d_results fields
     assert len(aggrescan3d_results) == 9
@@ -935,7 +1954,145 @@ def run_aggrescan3d(pdb_string: str, aggrescan3d_script_path: str) -> Aggrescan3
     )
 
     # Returning the output
-    return aggrescan3d_output
+    return apply_log_policy(aggrescan3d_output)
+
+
+def parse_a3d_rows(a3d_rows: List[List[str]]) -> Dict[str, str]:
+    """Converts the rows of the Aggrescan3D `A3D.csv` file into the residue level
+    fields of the Aggrescan3DOutput.
+
+    Parameters
+    ----------
+    a3d_rows: List[List[str]]
+        The rows of `A3D.csv`, including the header.
+
+    Returns
+    -------
+    aggrescan3d_residue: Dict[str, str]
+        The protein, chain, residue number, residue name and score of each
+        residue, as ";" separated strings so that they can be inserted into
+        the sql table.
+    """
+    # Initialising lists to capture the output
+    protein_list = []
+    chain_list = []
+    residue_number_list = []
+    residue_name_list = []
+    residue_score_list = []
+
+    # Looping through each row in the csv file, apart from the header, and
+    # appending to the lists that were initialised above
+    for row in a3d_rows[1:]:
+        protein_list.append(row[0])
+        chain_list.append(row[1])
+        residue_number_list.append(row[2])
+        residue_name_list.append(row[3])
+        residue_score_list.append(row[4])
+
+    # Converting to floats and then back to strings.
+    # This is to ensure the values are floats but they
+    # need to be strings to be inserted into the sql table
+    residue_score_list = list(map(convert_string_to_float, residue_score_list))
+    residue_score_list = list(map(str, residue_score_list))
+
+    # Creating a dictionary of these lists, converted into strings so that
+    # they can be inputted into the sql database
+    aggrescan3d_residue = {
+        "protein_list": ";".join(protein_list),
+        "chain_list": ";".join(chain_list),
+        "residue_number_list": ";".join(residue_number_list),
+        "residue_name_list": ";".join(residue_name_list),
+        "residue_score_list": ";".join(residue_score_list),
+    }
+    return aggrescan3d_residue
+
+
+def run_aggrescan3d_coprocess(
+    pdb_path: str,
+    work_dir: str,
+    aggrescan3d_script_path: str,
+    timeout: Optional[float] = None,
+) -> Tuple[str, str, int, Optional[Dict[str, float]], Optional[List[List[str]]]]:
+    """Analyses a PDB file with a long-lived Aggrescan3D process.
+
+    The co-process runs `aggrescan3D_server.py`, which sits next to the
+    Aggrescan3D script and imports Aggrescan3D once. For each PDB file it
+    replies with the summary statistics and the rows of `A3D.csv` as a JSON
+    line, so neither Python 2 nor Aggrescan3D are started for every design. A
+    new co-process is started if it crashes or takes longer than `timeout`.
+
+    Parameters
+    ----------
+    pdb_path: str
+        Absolute path of the PDB file.
+    work_dir: str
+        Folder that Aggrescan3D is run in.
+    aggrescan3d_script_path: str
+        File path for the Aggrescan3D script.
+    timeout: Optional[float]
+        Seconds that the co-process has to analyse the PDB file, defaults to
+        `MAX_RUN_TIME`.
+
+    Returns
+    -------
+    stdout: str
+        Output of the co-process for this PDB file that isn't part of the
+        reply.
+    stderr: str
+        The Aggrescan3D log for this PDB file.
+    return_code: int
+        0 unless Aggrescan3D failed or the co-process exited.
+    aggrescan3d_summary: Optional[Dict[str, float]]
+        The summary statistics for all of the chains, None if Aggrescan3D
+        failed.
+    a3d_rows: Optional[List[List[str]]]
+        The rows of `A3D.csv`, None if Aggrescan3D failed.
+    """
+    server_path = os.path.join(
+        os.path.dirname(aggrescan3d_script_path), "aggrescan3D_server.py"
+    )
+    coprocess_pool = get_coprocess_pool(
+        ("aggrescan3d", server_path),
+        functools.partial(
+            CoProcess,
+            ["python2", server_path],
+            end_marker=AGGRESCAN3D_RESULT_END,
+            ready_marker=AGGRESCAN3D_SERVER_READY,
+            cwd=SCRATCH_DIR or tempfile.gettempdir(),
+            startup_timeout=MAX_RUN_TIME,
+        ),
+    )
+    try:
+        with coprocess_pool.acquire() as coprocess:
+            (stdout, stderr) = coprocess.request(
+                json.dumps({"pdb_path": pdb_path, "work_dir": work_dir}),
+                timeout=MAX_RUN_TIME if timeout is None else timeout,
+            )
+    except CoProcessError as error:
+        # The co-process exited while starting or analysing this PDB file
+        return (
+            error.output,
+            error.error_output + str(error),
+            error.return_code or 1,
+            None,
+            None,
+        )
+
+    # The reply is the last line of the output
+    (stdout, _, reply_line) = stdout.rstrip("\n").rpartition("\n")
+    try:
+        reply = json.loads(reply_line)
+        return stdout, stderr, reply["return_code"], reply["summary"], reply["rows"]
+    except (ValueError, KeyError, TypeError) as error:
+        # The co-process only wrote part of its output, or something else wrote
+        # to its stdout
+        return (
+            stdout,
+            stderr + f"Invalid reply from the Aggrescan3D co-process: {error!r}\n",
+            1,
+            None,
+            None,
+        )
 
 
 # }}}
@@ -31,6 +31,9 @@ class PdbModel(BigStructureBase):  # type: ignore
     pdb_code = Column(String, nullable=False)
     deposition_date = Column(Date, nullable=False)
     method = Column(String, nullable=False)
+    resolution = Column(Float, nullable=True)
+    r_work = Column(Float, nullable=True)
+    organism = Column(String, nullable=True)
 
     # Children
     biol_units = relationship("BiolUnitModel")
@@ -39,6 +42,21 @@ class PdbModel(BigStructureBase):  # type: ignore
         return f"<PdBModel pdb={self.pdb_code}>"
 
 
+class PdbManifestModel(BigStructureBase):  # type: ignore
+    """The source files and tool versions that a PDB entry was created from."""
+
+    __tablename__ = "pdb_manifest"
+    id = Column(Integer, primary_key=True)
+    pdb_code = Column(String, nullable=False, unique=True)
+    # The size and modification time of each source file
+    source_stamps = Column(String, nullable=False)
+    source_hash = Column(String, nullable=False)
+    tool_versions = Column(String, nullable=False)
+
+    def __repr__(self):
+        return f"<PdbManifestModel pdb={self.pdb_code}>"
+
+
 class BiolUnitModel(BigStructureBase):  # type: ignore
     __tablename__ = "biol_unit"
     id = Column(Integer, primary_key=True)
@@ -0,0 +1,335 @@
+"""Bulk loading of PDB entries into the big structure database.
+
+`dbs_db_from_scratch` creates tens of millions of rows across the pdb,
+biol_unit, state, chain and results tables. Adding the ORM models to a session
+inserts them one row at a time, so instead each batch of entries is converted to
+the rows of each table, which are written with the PostgreSQL `COPY` command.
+The primary keys of the rows are taken from the sequences of their tables
+before they are written, so that the foreign keys between them can be filled
+in. Other databases, e.g. SQLite for testing, are written with one multi-row
+insert per table instead.
+"""
+import io
+import math
+import typing as tp
+
+from sqlalchemy import Table, func, inspect, select, text  # type: ignore
+from sqlalchemy.engine import Connection  # type: ignore
+from sqlalchemy.orm import Session  # type: ignore
+from sqlalchemy.orm.interfaces import ONETOMANY  # type: ignore
+
+from destress_big_structure.big_structure_models import BigStructureBase, PdbModel
+
+# The rows of each table, keyed by the table name, with their values in the
+# order of the table columns. Until `assign_ids` is used, the rows of each table
+# are numbered from 1 in their `id` column and in the foreign keys to them.
+TableRows = tp.Dict[str, tp.List[tp.Tuple[tp.Any, ...]]]
+
+# The rows of a single PDB entry, as they are sent from the worker processes of
+# `dbs_db_from_scratch`, with the version of the record layout. Plain tuples
+# are much smaller to pickle than the ORM models that they are created from.
+PdbRecord = tp.Tuple[int, TableRows]
+# Increase this when the layout of the records changes
+RECORD_VERSION = 2
+
+# Escapes for the text format of `COPY`
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+COPY_NULL = "\\N"
+
+
+def model_rows(models: tp.Iterable[BigStructureBase]) -> TableRows:
+    """Converts ORM models, and all of their children, to the rows of each table.
+
+    Parameters
+    ----------
+    models: Iterable[BigStructureBase]
+        The models that are converted, e.g. `PdbModel`s with their biological
+        units, states, chains and results attached.
+
+    Returns
+    -------
+    table_rows: TableRows
+        The rows of each table, numbered from 1 for each table.
+    """
+    table_rows: TableRows = {}
+    # The models that are left to convert, with the foreign keys to their parent
+    to_convert: tp.List[tp.Tuple[BigStructureBase, tp.Dict[str, int]]] = [
+        (model, {}) for model in models
+    ]
+    while to_convert:
+        (model, foreign_keys) = to_convert.pop()
+        table = model.__table__
+        rows = table_rows.setdefault(table.name, [])
+        row_id = len(rows) + 1
+        rows.append(
+            tuple(
+                row_id
+                if column.primary_key
+                else foreign_keys.get(column.name, getattr(model, column.name))
+                for column in table.columns
+            )
+        )
+        for relationship in inspect(model).mapper.relationships:
+            if relationship.direction is not ONETOMANY:
+                continue
+            children = getattr(model, relationship.key)
+            if not relationship.uselist:
+                children = [] if children is None else [children]
+            child_foreign_keys = {
+                remote_column.name: row_id
+                for (_, remote_column) in relationship.local_remote_pairs
+            }
+            to_convert.extend((child, child_foreign_keys) for child in children)
+    return table_rows
+
+
+def assign_ids(
+    table_rows: TableRows, table_ids: tp.Dict[str, tp.Sequence[int]]
+) -> TableRows:
+    """Replaces the row numbers of each table with ids from the database.
+
+    Parameters
+    ----------
+    table_rows: TableRows
+        The rows of each table, numbered from 1 for each table.
+    table_ids: Dict[str, Sequence[int]]
+        The ids for the rows of each table, in the order of the rows.
+
+    Returns
+    -------
+    table_rows: TableRows
+        The rows of each table, with their ids and foreign keys filled in.
+    """
+    assigned_rows: TableRows = {}
+    for (table_name, rows) in table_rows.items():
+        table = BigStructureBase.metadata.tables[table_name]
+        # The ids that each column takes its values from, if it's a key
+        column_ids = [
+            table_ids[table_name]
+            if column.primary_key
+            else next(
+                (
+                    table_ids.get(foreign_key.column.table.name, [])
+                    for foreign_key in column.foreign_keys
+                ),
+                None,
+            )
+            for column in table.columns
+        ]
+        assigned_rows[table_name] = [
+            tuple(
+                value if ids is None or value is None else ids[value - 1]
+                for (value, ids) in zip(row, column_ids)
+            )
+            for row in rows
+        ]
+    return assigned_rows
+
+
+def pdb_record(pdb_model: PdbModel) -> PdbRecord:
+    """Converts a PDB entry, with all of its children, to a record."""
+    return (RECORD_VERSION, model_rows([pdb_model]))
+
+
+def merge_records(records: tp.Iterable[PdbRecord]) -> TableRows:
+    """Combines the rows of records, renumbering the rows of each table.
+
+    Parameters
+    ----------
+    records: Iterable[PdbRecord]
+        The records of PDB entries.
+
+    Returns
+    -------
+    table_rows: TableRows
+        The rows of each table, numbered from 1 for each table.
+
+    Raises
+    ------
+    ValueError
+        If a record was created with a different version of the layout.
+    """
+    merged_rows: TableRows = {}
+    for (record_version, table_rows) in records:
+        if record_version != RECORD_VERSION:
+            raise ValueError(
+                f"Expected records with version {RECORD_VERSION}, but I got a "
+                f"record with version {record_version}."
+            )
+        # The rows of this record are numbered after those already merged
+        table_ids = {
+            table_name: range(
+                len(merged_rows.get(table_name, [])) + 1,
+                len(merged_rows.get(table_name, [])) + len(rows) + 1,
+            )
+            for (table_name, rows) in table_rows.items()
+        }
+        for (table_name, rows) in assign_ids(table_rows, table_ids).items():
+            merged_rows.setdefault(table_name, []).extend(rows)
+    return merged_rows
+
+
+def reserve_ids(connection: Connection, table: Table, count: int) -> tp.List[int]:
+    """Takes `count` ids for the rows of a table, so that they can be inserted.
+
+    On PostgreSQL the ids are taken from the sequence of the table, so they are
+    never given to any other insert. Other databases use the ids after the
+    current maximum id, which assumes nothing else is inserting into the table.
+    """
+    if connection.dialect.name == "postgresql":
+        return [
+            row_id
+            for (row_id,) in connection.execute(
+                text(
+                    "SELECT nextval(pg_get_serial_sequence(:table_name, 'id')) "
+                    "FROM generate_series(1, :count)"
+                ),
+                {"table_name": table.name, "count": count},
+            )
+        ]
+    max_id = connection.execute(select([func.max(table.c.id)])).scalar() or 0
+    return list(range(max_id + 1, max_id + count + 1))
+
+
+def copy_value(value: tp.Any) -> str:
+    """Formats a value for the text format of the PostgreSQL `COPY` command."""
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "Infinity" if value > 0 else "-Infinity"
+        return repr(value)
+    return str(value).translate(COPY_ESCAPES)
+
+
+def copy_rows(
+    connection: Connection, table: Table, rows: tp.List[tp.Tuple[tp.Any, ...]]
+) -> None:
+    """Writes the rows of a table with the PostgreSQL `COPY` command."""
+    copy_buffer = io.StringIO()
+    for row in rows:
+        copy_buffer.write("\t".join(copy_value(value) for value in row) + "\n")
+    copy_buffer.seek(0)
+    columns = ", ".join(f'"{column.name}"' for column in table.columns)
+    with connection.connection.cursor() as cursor:
+        cursor.copy_expert(f'COPY "{table.name}" ({columns}) FROM STDIN', copy_buffer)
+
+
+def insert_rows(
+    connection: Connection, table: Table, rows: tp.List[tp.Tuple[tp.Any, ...]]
+) -> None:
+    """Writes the rows of a table with a multi-row insert."""
+    column_names = [column.name for column in table.columns]
+    connection.execute(table.insert(), [dict(zip(column_names, row)) for row in rows])
+
+
+def load_table_rows(session: Session, table_rows: TableRows) -> None:
+    """Writes rows to the database, in the transaction of the session.
+
+    The session is not committed, so that the caller can decide when to do so.
+
+    Parameters
+    ----------
+    session: Session
+        The session whose connection is used.
+    table_rows: TableRows
+        The rows of each table, numbered from 1 for each table.
+    """
+    connection = session.connection()
+    tables = [
+        table
+        for table in BigStructureBase.metadata.sorted_tables
+        if table_rows.get(table.name)
+    ]
+    table_ids = {
+        table.name: reserve_ids(connection, table, len(table_rows[table.name]))
+        for table in tables
+    }
+    assigned_rows = assign_ids(table_rows, table_ids)
+    write_rows = copy_rows if connection.dialect.name == "postgresql" else insert_rows
+    # Parent tables are written before their children
+    for table in tables:
+        write_rows(connection, table, assigned_rows[table.name])
+
+
+def delete_pdb_entries(session: Session, pdb_codes: tp.Iterable[str]) -> None:
+    """Deletes PDB entries, with all of their children, in the session transaction.
+
+    Parameters
+    ----------
+    session: Session
+        The session whose connection is used.
+    pdb_codes: Iterable[str]
+        The codes of the entries that are deleted.
+    """
+    pdb_codes = list(pdb_codes)
+    if not pdb_codes:
+        return
+    pdb_table = PdbModel.__table__
+    # The ids of the rows that are deleted from each table, as subqueries
+    deleted_ids = {
+        pdb_table.name: select([pdb_table.c.id]).where(
+            pdb_table.c.pdb_code.in_(pdb_codes)
+        )
+    }
+    tables = BigStructureBase.metadata.sorted_tables
+    for table in tables:
+        for foreign_key in table.foreign_keys:
+            parent_ids = deleted_ids.get(foreign_key.column.table.name)
+            if parent_ids is not None and table.name not in deleted_ids:
+                deleted_ids[table.name] = select([table.c.id]).where(
+                    foreign_key.parent.in_(parent_ids)
+                )
+    # Children are deleted before their parents
+    for table in reversed(tables):
+        if table.name in deleted_ids:
+            session.execute(
+                table.delete().where(table.c.id.in_(deleted_ids[table.name]))
+            )
+
+
+def add_missing_columns(connection: Connection) -> tp.List[str]:
+    """Adds the nullable columns of the models that are missing from the tables.
+
+    `create_all` only creates missing tables, so this is used to update a
+    database that was created before a column was added to a model.
+
+    Returns
+    -------
+    added_columns: List[str]
+        The columns that were added, as `table.column`.
+    """
+    added_columns = []
+    database_inspector = inspect(connection)
+    existing_tables = set(database_inspector.get_table_names())
+    for table in BigStructureBase.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {
+            column["name"] for column in database_inspector.get_columns(table.name)
+        }
+        for column in table.columns:
+            if column.name in existing_columns or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(
+                text(
+                    f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" '
+                    f"{column_type}"
+                )
+            )
+            added_columns.append(f"{table.name}.{column.name}")
+    return added_columns
+
+
+def load_pdb_models(session: Session, pdb_models: tp.Iterable[PdbModel]) -> None:
+    """Writes PDB entries, with all of their children, to the database.
+
+    This is equivalent to `session.add_all(pdb_models)`, but the models are
+    not added to the session.
+    """
+    load_table_rows(session, model_rows(pdb_models))
@@ -1,9 +1,9 @@
 from dataclasses import dataclass
 from datetime import datetime
-import gzip as gz
 import os
 import time
 import multiprocessing as mp
+import multiprocessing.pool
 from pathlib import Path
 import random
 import re
@@ -11,7 +11,6 @@ import typing as tp
 import csv
 import math
 import click
-import bs4
 import ampal
 import logging
 
@@ -29,15 +28,28 @@ from destress_big_structure.elm_types import (
 )
 from destress_big_structure import analysis
 import destress_big_structure.create_entry as create_entry
-from .elm_types import DesignMetricsOutputRow
+from destress_big_structure.bulk_load import (
+    PdbRecord,
+    add_missing_columns,
+    delete_pdb_entries,
+    load_table_rows,
+    merge_records,
+    pdb_record,
+)
+from destress_big_structure import manifest
+from destress_big_structure.pdbml import get_pdb_information
+from .elm_types import DesignMetricsOutputRow, RosettaOutput
 
-ProcPdbResult = tp.Union[tp.Tuple[str, PdbModel], tp.Tuple[str, str]]
+# The rows of an entry, None if its files are unchanged, and its manifest entry
+ProcessedPdb = tp.Tuple[tp.Optional[PdbRecord], manifest.ManifestEntry]
+ProcPdbResult = tp.Union[tp.Tuple[str, ProcessedPdb], tp.Tuple[str, str]]
 
 BATCH_SIZE = 1000  # files will be processed in batches of 1000
 
 from destress_big_structure.settings import (
     HEADLESS_DESTRESS_WORKERS,
     HEADLESS_DESTRESS_BATCH_SIZE,
+    ROSETTA_BINARY_PATH,
 )
 
 
@@ -76,6 +88,15 @@ def dev_run():
         "This list will be used to filter files defined in `path_to_data`."
     ),
 )
+@click.option(
+    "--incremental/--from-scratch",
+    default=False,
+    help=(
+        "Only processes the entries that are new or changed since the last run, "
+        "and removes the entries that are no longer in `path_to_data`. This can "
+        "also be used to resume a run that was interrupted."
+    ),
+)
 def dbs_db_from_scratch(
     path_to_data: str,
     take: int,
@@ -83,6 +104,7 @@ def dbs_db_from_scratch(
     processes: int,
     first_bio_unit_only: bool,
     pdb_list: tp.Optional[str],
+    incremental: bool,
 ):
     """Creates the full database for the DeStrES Big Structure application."""
 
@@ -112,6 +134,50 @@ def dbs_db_from_scratch(
 
     # Create the database tables
     BigStructureBase.metadata.create_all(bind=big_structure_engine)
+    with big_structure_engine.begin() as connection:
+        for added_column in add_missing_columns(connection):
+            print(f"Added the `{added_column}` column to the database.")
+
+    tool_versions = manifest.tool_versions()
+    manifest_entries: tp.Dict[str, manifest.ManifestEntry] = {}
+    existing_pdb_codes: tp.Set[str] = set()
+    if incremental:
+        manifest_entries = manifest.load_manifest(big_structure_db_session)
+        existing_pdb_codes = {
+            pdb_code
+            for (pdb_code,) in big_structure_db_session.query(PdbModel.pdb_code)
+        }
+        # Entries are only removed if every entry is being updated
+        if not pdb_list:
+            obsolete_pdb_codes = (
+                existing_pdb_codes | set(manifest_entries)
+            ) - {path.name[3:7] for path in all_pdb_paths}
+            delete_pdb_entries(big_structure_db_session, obsolete_pdb_codes)
+            manifest.delete_manifest_entries(
+                big_structure_db_session, obsolete_pdb_codes
+            )
+            big_structure_db_session.commit()
+            print(f"Removed {len(obsolete_pdb_codes)} obsolete entries.")
+        up_to_date_paths = {
+            pdb_path
+            for pdb_path in pdb_paths
+            if manifest.is_up_to_date(
+                manifest_entries.get(pdb_path.name[3:7]),
+                manifest.source_stamps(
+                    find_source_paths(
+                        pdb_path, biounit_data, xml_data, first_bio_unit_only
+                    )
+                ),
+                tool_versions,
+            )
+        }
+        pdb_paths = [
+            pdb_path for pdb_path in pdb_paths if pdb_path not in up_to_date_paths
+        ]
+        print(
+            f"Skipping {len(up_to_date_paths)} entries that are up to date, "
+            f"{len(pdb_paths)} entries are new or changed."
+        )
 
     taken = 0
     failed: tp.Dict[str, str] = {}
@@ -124,19 +190,43 @@ def dbs_db_from_scratch(
             batch_results = process_pool.map(
                 process_pdb,
                 [
-                    (pdb_path, biounit_data, xml_data, first_bio_unit_only)
+                    (
+                        pdb_path,
+                        biounit_data,
+                        xml_data,
+                        first_bio_unit_only,
+                        manifest_entries.get(pdb_path.name[3:7]),
+                        tool_versions,
+                    )
                     for pdb_path in path_batch
                 ],
             )
-            pdb_models = []
+            pdb_records = []
+            replaced_pdb_codes = []
+            batch_manifest_entries = []
             for result in batch_results:
-                if isinstance(result[1], PdbModel):
-                    pdb_models.append(result)
-                else:
+                if isinstance(result[1], str):
                     failed[result[0]] = result[1]
-            big_structure_db_session.add_all(pdb_model[1] for pdb_model in pdb_models)
+                    continue
+                (record, manifest_entry) = result[1]
+                if record is not None:
+                    pdb_records.append((result[0], record))
+                    if manifest_entry.pdb_code in existing_pdb_codes:
+                        replaced_pdb_codes.append(manifest_entry.pdb_code)
+                batch_manifest_entries.append(manifest_entry)
+            # Changed entries are replaced, in the same transaction as the new
+            # rows and manifest entries, so an interrupted batch is redone
+            delete_pdb_entries(big_structure_db_session, replaced_pdb_codes)
+            # The rows of the whole batch are written with one `COPY` per table
+            load_table_rows(
+                big_structure_db_session,
+                merge_records(record for (_, record) in pdb_records),
+            )
+            manifest.save_manifest_entries(
+                big_structure_db_session, batch_manifest_entries
+            )
             big_structure_db_session.commit()
-            for added_path, _ in pdb_models:
+            for added_path, _ in pdb_records:
                 taken += 1
                 print(f"Added {added_path}.")
             if taken == take:
@@ -149,23 +239,58 @@ def dbs_db_from_scratch(
     print("Exiting.")
 
 
-def process_pdb(input_arguments: tp.Tuple[Path, Path, Path, bool]) -> ProcPdbResult:
-    pdb_path, biounit_data, xml_data, first_bio_unit_only = input_arguments
+def find_source_paths(
+    pdb_path: Path, biounit_data: Path, xml_data: Path, first_bio_unit_only: bool
+) -> tp.List[Path]:
+    """Finds the PDB, biological unit and PDBML files of a PDB entry."""
+    pdb_code = pdb_path.name[3:7]
+    if first_bio_unit_only:
+        biounit_paths = sorted(
+            list((biounit_data / pdb_code[1:3]).glob(f"{pdb_code}.pdb*.gz"))
+        )[:1]
+    else:
+        biounit_paths = list((biounit_data / pdb_code[1:3]).glob(f"{pdb_code}.pdb*.gz"))
+    xml_path = xml_data / pdb_code[1:3] / f"{pdb_code}-noatom.xml.gz"
+    return [pdb_path] + biounit_paths + [xml_path]
+
+
+def process_pdb(
+    input_arguments: tp.Tuple[
+        Path, Path, Path, bool, tp.Optional[manifest.ManifestEntry], str
+    ]
+) -> ProcPdbResult:
+    (
+        pdb_path,
+        biounit_data,
+        xml_data,
+        first_bio_unit_only,
+        manifest_entry,
+        tool_versions,
+    ) = input_arguments
     try:
         print(f"\tProcessing {pdb_path}...")
         pdb_code = pdb_path.name[3:7]
-        if first_bio_unit_only:
-            biounit_paths = sorted(
-                list((biounit_data / pdb_code[1:3]).glob(f"{pdb_code}.pdb*.gz"))
-            )[:1]
-        else:
-            biounit_paths = list(
-                (biounit_data / pdb_code[1:3]).glob(f"{pdb_code}.pdb*.gz")
-            )
-
-        xml_path = xml_data / pdb_code[1:3] / f"{pdb_code}-noatom.xml.gz"
+        source_paths = find_source_paths(
+            pdb_path, biounit_data, xml_data, first_bio_unit_only
+        )
+        biounit_paths = source_paths[1:-1]
+        xml_path = source_paths[-1]
         assert biounit_paths, f"No biological units found for {pdb_code}."
         assert xml_path.exists(), f"No PDBML file found for {pdb_code}."
+        new_manifest_entry = manifest.ManifestEntry(
+            pdb_code=pdb_code,
+            source_stamps=manifest.source_stamps(source_paths),
+            source_hash=manifest.source_hash(source_paths),
+            tool_versions=tool_versions,
+        )
+        # Files that were touched but not changed don't need to be processed
+        if (
+            manifest_entry is not None
+            and manifest_entry.source_hash == new_manifest_entry.source_hash
+            and manifest_entry.tool_versions == tool_versions
+        ):
+            print(f"\tSkipped {pdb_path}, its files are unchanged")
+            return (str(pdb_path), (None, new_manifest_entry))
         pdb_information = get_pdb_information(xml_path)
         pdb_model = PdbModel(
             pdb_code=pdb_code,
@@ -173,35 +298,31 @@ def process_pdb(input_arguments: tp.Tuple[Path, Path, Path, bool]) -> ProcPdbRes
                 pdb_information["deposition_date"], "%Y-%m-%d"
             ).date(),
             method=pdb_information["method"],
+            resolution=optional_float(pdb_information["resolution"]),
+            r_work=optional_float(pdb_information["r_work"]),
+            organism=pdb_information["organism"],
         )
         _ = process_biounits(pdb_path, biounit_paths, pdb_model)
         print(f"\tFinished processing {pdb_path}")
-        return (str(pdb_path), pdb_model)
+        # The models are sent back to the main process as plain rows
+        return (str(pdb_path), (pdb_record(pdb_model), new_manifest_entry))
     except Exception as e:
         return (str(pdb_path), str(e))
 
 
-def get_pdb_information(xml_path: Path) -> tp.Dict[str, str]:
-    with gz.open(str(xml_path)) as inf:
-        parsed_xml = bs4.BeautifulSoup(inf.read(), "xml")
-    pdb_information = {
-        "deposition_date": parsed_xml.find_all(
-            "PDBx:recvd_initial_deposition_date", limit=1
-        )[0].get_text(),
-        "method": parsed_xml.find_all("PDBx:exptl")[0]["method"],
-    }
-    return pdb_information
+def optional_float(value: tp.Optional[str]) -> tp.Optional[float]:
+    """Converts a field of a PDBML file to a float, None if it's missing or invalid."""
+    try:
+        return None if value is None else float(value)
+    except ValueError:
+        return None
 
 
 def process_biounits(
     pdb_path: Path, biounit_paths: tp.List[Path], pdb_model: PdbModel
 ) -> tp.List[BiolUnitModel]:
-    deposition_structure = create_entry.create_biounit_entry(
-        pdb_path, 0, pdb_model, is_deposited_pdb=True, preferred_biol_unit=None
-    )
-    biounits = [deposition_structure]
+    biounit_numbers = [0]
     for path in biounit_paths:
-        print(f"\t\tProcessing {path}...")
         biounit_number_search = re.search(r"pdb(\d+)\.gz$", str(path))
         if biounit_number_search:
             biounit_number = int(biounit_number_search.group(1))
@@ -209,21 +330,46 @@ def process_biounits(
                 f"Biological unit number is expected to be a positive "
                 f"integer but I got `{biounit_number}` for `{path}`."
             )
-            print(f"\t\tFinished processing {path}")
         else:
             raise ValueError(
                 f"Expected biological unit path to have the form "
                 f"[pdb_code].pdb[biounit_number].gz, but I got `{path}`"
             )
+        biounit_numbers.append(biounit_number)
+
+    # Every state of the entry is scored by Rosetta up front, so that Rosetta
+    # is started once per chunk of states rather than once per state
+    all_paths = [pdb_path] + biounit_paths
+    all_states = [create_entry.load_biounit_states(path) for path in all_paths]
+    # Each state is only converted to PDB text once
+    all_state_pdbs = [[state.pdb for state in states] for states in all_states]
+    rosetta_results = iter(
+        create_entry.run_rosetta_for_states(
+            [state_pdb for state_pdbs in all_state_pdbs for state_pdb in state_pdbs]
+        )
+    )
+
+    biounits = []
+    for path, biounit_number, states, state_pdbs in zip(
+        all_paths, biounit_numbers, all_states, all_state_pdbs
+    ):
+        is_deposited_pdb = biounit_number == 0
+        if not is_deposited_pdb:
+            print(f"\t\tProcessing {path}...")
         biounits.append(
             create_entry.create_biounit_entry(
                 path,
                 biounit_number,
                 pdb_model,
-                is_deposited_pdb=False,
-                preferred_biol_unit=1,
+                is_deposited_pdb=is_deposited_pdb,
+                preferred_biol_unit=None if is_deposited_pdb else 1,
+                states=states,
+                rosetta_results=[next(rosetta_results) for _ in states],
+                state_pdbs=state_pdbs,
             )
         )
+        if not is_deposited_pdb:
+            print(f"\t\tFinished processing {path}")
     return biounits
 
 
@@ -284,7 +430,161 @@ def unpacking_comp_metrics(design_metrics: DesignMetrics) -> Dict:
     return comp_metrics
 
 
-def headless_destress(pdb_file: str) -> DesignMetricsOutputRow:
+class DisabledMetrics:
+    """Stands in for the output of a tool that was not part of the metric plan.
+
+    Every field of the output is None, so the corresponding columns of the
+    headless output are left empty.
+    """
+
+    def __getattr__(self, name):
+        return None
+
+
+def load_atom_records(pdb_file: str) -> tp.Tuple[tp.Optional[str], int]:
+    """Loads a PDB file and keeps only its ATOM records.
+
+    Some of the other records can cause issues for the DE-STRESS metrics.
+
+    Returns
+    -------
+    pdb_string: Optional[str]
+        The ATOM records of the PDB file, or None if it could not be loaded.
+    num_atom_records_removed: int
+        The number of records that were removed.
+    """
+    try:
+        ampal_assembly = ampal.load_pdb(str(pdb_file), path=True)
+    except ValueError as e:
+        logging.debug(f"PDB file could not be loaded due to a ValueError:\n {e}")
+        return None, 0
+    pdb_lines = ampal_assembly.pdb.splitlines()
+    pdb_lines_filtered = [line for line in pdb_lines if line.startswith("ATOM")]
+    return "\n".join(pdb_lines_filtered), len(pdb_lines) - len(pdb_lines_filtered)
+
+
+def headless_design_pdb(pdb_file: str) -> tp.Optional[str]:
+    """The PDB string of a design exactly as it is passed to the external tools,
+    or None if the PDB file cannot be loaded."""
+    (pdb_string, _) = load_atom_records(pdb_file)
+    if pdb_string is None:
+        return None
+    try:
+        return analysis.load_design(pdb_string).pdb
+    except Exception:
+        return None
+
+
+def headless_rosetta_chunk(
+    pdb_strings: tp.List[str],
+) -> tp.List[tp.Optional[RosettaOutput]]:
+    """Scores a chunk of designs with a single Rosetta run.
+
+    If the chunk fails, None is returned for each design so that they are
+    scored one by one in `headless_destress` instead.
+    """
+    try:
+        return analysis.run_rosetta_batch(pdb_strings, ROSETTA_BINARY_PATH)
+    except Exception as e:
+        logging.debug(f"Rosetta could not score a chunk of designs:\n {e}")
+        return [None] * len(pdb_strings)
+
+
+def headless_rosetta_batch(
+    process_pool: mp.pool.Pool, pdb_files: tp.List[Path], num_workers: int
+) -> tp.List[tp.Optional[RosettaOutput]]:
+    """Scores a batch of PDB files with Rosetta, using one run per chunk.
+
+    Rosetta takes several seconds to start, so rather than starting it for every
+    PDB file, the files are split into at most `ROSETTA_BATCH_SIZE` sized chunks
+    that are shared out between the workers.
+
+    Returns
+    -------
+    rosetta_results: List[Optional[RosettaOutput]]
+        The Rosetta output for each PDB file, None if it was not scored.
+    """
+    design_pdbs = process_pool.map(headless_design_pdb, pdb_files)
+    scored_indices = [i for (i, pdb) in enumerate(design_pdbs) if pdb is not None]
+    chunk_size = min(
+        analysis.ROSETTA_BATCH_SIZE,
+        max(1, math.ceil(len(scored_indices) / num_workers)),
+    )
+    index_chunks = [
+        scored_indices[x : x + chunk_size]
+        for x in range(0, len(scored_indices), chunk_size)
+    ]
+    chunk_results = process_pool.map(
+        headless_rosetta_chunk,
+        [[design_pdbs[i] for i in index_chunk] for index_chunk in index_chunks],
+    )
+    rosetta_results: tp.List[tp.Optional[RosettaOutput]] = [None] * len(pdb_files)
+    for index_chunk, results in zip(index_chunks, chunk_results):
+        for i, rosetta_output in zip(index_chunk, results):
+            rosetta_results[i] = rosetta_output
+    return rosetta_results
+
+
+def headless_triage(
+    pdb_file: str,
+    metrics: tp.FrozenSet[str],
+    triage_thresholds: tp.Sequence[analysis.TriageThreshold],
+) -> tp.Tuple[bool, tp.Dict[str, tp.Any]]:
+    """Checks whether a PDB file passes triage before its batch is scored.
+
+    Only the metric groups that the triage thresholds need are calculated, so
+    that Rosetta can be run in batches on just the designs that pass.
+
+    Returns
+    -------
+    passed: bool
+        Whether the design meets all of the triage thresholds.
+    tool_results: Dict[str, Any]
+        The outputs of the tools that were run, which are passed on to
+        `headless_destress` so that they are not run again.
+    """
+    (pdb_string, _) = load_atom_records(pdb_file)
+    if pdb_string is None:
+        return (False, {})
+    try:
+        design_metrics = analysis.create_metrics_from_pdb(
+            pdb_string,
+            metrics=metrics & analysis.triage_metric_groups(triage_thresholds),
+        )
+    except Exception as e:
+        logging.debug(f"Could not triage the PDB file {pdb_file}:\n {e}")
+        return (False, {})
+    tool_results = {
+        name: getattr(design_metrics, name)
+        for name in analysis.TOOL_METRIC_GROUPS
+        if getattr(design_metrics, name) is not None
+    }
+    passed = not analysis.failed_triage_thresholds(design_metrics, triage_thresholds)
+    return (passed, tool_results)
+
+
+def triage_decision(
+    design_metrics: DesignMetrics,
+    triage_thresholds: tp.Sequence[analysis.TriageThreshold],
+) -> tp.Optional[str]:
+    """Describes whether a design passed triage, for the headless output."""
+    if not triage_thresholds:
+        return None
+    failed_thresholds = analysis.failed_triage_thresholds(
+        design_metrics, triage_thresholds
+    )
+    if failed_thresholds:
+        return "failed: " + "; ".join(str(t) for t in failed_thresholds)
+    return "passed"
+
+
+def headless_destress(
+    pdb_file: str,
+    metrics: tp.FrozenSet[str] = analysis.ALL_METRICS,
+    rosetta_results: tp.Optional[RosettaOutput] = None,
+    triage_thresholds: tp.Sequence[analysis.TriageThreshold] = (),
+    tool_results: tp.Optional[tp.Dict[str, tp.Any]] = None,
+) -> DesignMetricsOutputRow:
 
     """Running DE-STRESS in headless mode (using CLI rather than
     DE-STRESS user interface) for a single pdb file.
@@ -300,6 +600,18 @@ def headless_destress(pdb_file: str) -> DesignMetricsOutputRow:
     ----------
     pdb_file: str
         This is the input pdb file.
+    metrics: FrozenSet[str]
+        The metric plan, only the metric groups in this set are calculated
+        and the columns for the other metrics are set to None.
+    rosetta_results: Optional[RosettaOutput]
+        The Rosetta output for the PDB file if it has already been scored with
+        `headless_rosetta_batch`, otherwise Rosetta is run for this file.
+    triage_thresholds: Sequence[TriageThreshold]
+        The slow tools are only run if the design meets all of these, and the
+        decision is recorded in the `triage_decision` column.
+    tool_results: Optional[Dict[str, Any]]
+        Outputs of other tools that have already been run on the PDB file,
+        e.g. by `headless_triage`.
 
     Returns
     -------
@@ -387,15 +699,12 @@ def headless_destress(pdb_file: str) -> DesignMetricsOutputRow:
         "aggrescan3d_max_value",
     ]
 
-    # Loading in the PDB file and converting it to an ampal assembly
-    try:
-        ampal_assembly = ampal.load_pdb(str(pdb_file), path=True)
-
-    except ValueError as e:
-        logging.debug(f"PDB file could not be loaded due to a ValueError:\n {e}")
-        ampal_assembly = None
+    # Loading in the PDB file and only selecting ATOM residues and removing
+    # the other residues. This is because some of these other residues can
+    # cause issues for the DE-STRESS metric calculations.
+    (pdb_string_filtered, num_atom_records_removed) = load_atom_records(pdb_file)
 
-    if ampal_assembly is None:
+    if pdb_string_filtered is None:
 
         # Setting all the design metrics to None
         design_metrics_output = dict(
@@ -410,14 +719,6 @@ def headless_destress(pdb_file: str) -> DesignMetricsOutputRow:
         )
     else:
 
-        # Only selecting ATOM residues and removing the other residues.
-        # This is because some of these other residues can cause issues
-        # for the DE-STRESS metric calculations.
-        pdb_lines = ampal_assembly.pdb.splitlines()
-        pdb_lines_filtered = [line for line in pdb_lines if line.startswith("ATOM")]
-        pdb_string_filtered = "\n".join(pdb_lines_filtered)
-        num_atom_records_removed = len(pdb_lines) - len(pdb_lines_filtered)
-
         logging.warning(
             f"{num_atom_records_removed} non ATOM records removed from the PDB file {file_name}."
         )
@@ -425,37 +726,45 @@ def headless_destress(pdb_file: str) -> DesignMetricsOutputRow:
         try:
 
             # Running the DE-STRESS metrics for the pdb file
-            design_metrics = analysis.create_metrics_from_pdb(pdb_string_filtered)
+            precomputed_results = dict(tool_results or {})
+            if rosetta_results is not None:
+                precomputed_results["rosetta_results"] = rosetta_results
+            design_metrics = analysis.create_metrics_from_pdb(
+                pdb_string_filtered,
+                metrics=metrics,
+                precomputed_results=precomputed_results,
+                triage_thresholds=triage_thresholds,
+            )
+            if design_metrics.timed_out_tools:
+                logging.warning(
+                    f"{', '.join(design_metrics.timed_out_tools)} timed out for the "
+                    f"PDB file {file_name}, these metrics will be None."
+                )
+
+            # Tools that were not part of the metric plan have no output
+            budeff_results = design_metrics.budeFF_results or DisabledMetrics()
+            evoef2_results = design_metrics.evoEF2_results or DisabledMetrics()
+            dfire2_results = design_metrics.dfire2_results or DisabledMetrics()
+            rosetta_results = design_metrics.rosetta_results or DisabledMetrics()
+            aggrescan3d_results = (
+                design_metrics.aggrescan3d_results or DisabledMetrics()
+            )
 
             # Unpacking the compisition metrics
             comp_metrics = unpacking_comp_metrics(design_metrics)
 
-            # Calculating secondary structure proportions
+            # Calculating secondary structure proportions, if DSSP was not part
+            # of the metric plan then these will all be None
+            dssp_assignment = design_metrics.dssp_assignment or ""
             try:
-                ss_prop_alpha_helix = design_metrics.dssp_assignment.count("H") / len(
-                    design_metrics.dssp_assignment
-                )
-                ss_prop_beta_bridge = design_metrics.dssp_assignment.count("B") / len(
-                    design_metrics.dssp_assignment
-                )
-                ss_prop_beta_strand = design_metrics.dssp_assignment.count("E") / len(
-                    design_metrics.dssp_assignment
-                )
-                ss_prop_3_10_helix = design_metrics.dssp_assignment.count("G") / len(
-                    design_metrics.dssp_assignment
-                )
-                ss_prop_pi_helix = design_metrics.dssp_assignment.count("I") / len(
-                    design_metrics.dssp_assignment
-                )
-                ss_prop_hbonded_turn = design_metrics.dssp_assignment.count("T") / len(
-                    design_metrics.dssp_assignment
-                )
-                ss_prop_bend = design_metrics.dssp_assignment.count("S") / len(
-                    design_metrics.dssp_assignment
-                )
-                ss_prop_loop = design_metrics.dssp_assignment.count("-") / len(
-                    design_metrics.dssp_assignment
-                )
+                ss_prop_alpha_helix = dssp_assignment.count("H") / len(dssp_assignment)
+                ss_prop_beta_bridge = dssp_assignment.count("B") / len(dssp_assignment)
+                ss_prop_beta_strand = dssp_assignment.count("E") / len(dssp_assignment)
+                ss_prop_3_10_helix = dssp_assignment.count("G") / len(dssp_assignment)
+                ss_prop_pi_helix = dssp_assignment.count("I") / len(dssp_assignment)
+                ss_prop_hbonded_turn = dssp_assignment.count("T") / len(dssp_assignment)
+                ss_prop_bend = dssp_assignment.count("S") / len(dssp_assignment)
+                ss_prop_loop = dssp_assignment.count("-") / len(dssp_assignment)
             except ZeroDivisionError as e:
 
                 logging.debug(
@@ -513,39 +822,39 @@ def headless_destress(pdb_file: str) -> DesignMetricsOutputRow:
                         design_metrics.mass,
                         design_metrics.num_of_residues,
                         design_metrics.packing_density,
-                        design_metrics.budeFF_results.total_energy,
-                        design_metrics.budeFF_results.steric,
-                        design_metrics.budeFF_results.desolvation,
-                        design_metrics.budeFF_results.charge,
-                        design_metrics.evoEF2_results.total,
-                        design_metrics.evoEF2_results.ref_total,
-                        design_metrics.evoEF2_results.intraR_total,
-                        design_metrics.evoEF2_results.interS_total,
-                        design_metrics.evoEF2_results.interD_total,
-                        design_metrics.dfire2_results.total,
-                        design_metrics.rosetta_results.total_score,
-                        design_metrics.rosetta_results.fa_atr,
-                        design_metrics.rosetta_results.fa_rep,
-                        design_metrics.rosetta_results.fa_intra_rep,
-                        design_metrics.rosetta_results.fa_elec,
-                        design_metrics.rosetta_results.fa_sol,
-                        design_metrics.rosetta_results.lk_ball_wtd,
-                        design_metrics.rosetta_results.fa_intra_sol_xover4,
-                        design_metrics.rosetta_results.hbond_lr_bb,
-                        design_metrics.rosetta_results.hbond_sr_bb,
-                        design_metrics.rosetta_results.hbond_bb_sc,
-                        design_metrics.rosetta_results.hbond_sc,
-                        design_metrics.rosetta_results.dslf_fa13,
-                        design_metrics.rosetta_results.rama_prepro,
-                        design_metrics.rosetta_results.p_aa_pp,
-                        design_metrics.rosetta_results.fa_dun,
-                        design_metrics.rosetta_results.omega,
-                        design_metrics.rosetta_results.pro_close,
-                        design_metrics.rosetta_results.yhh_planarity,
-                        design_metrics.aggrescan3d_results.total_value,
-                        design_metrics.aggrescan3d_results.avg_value,
-                        design_metrics.aggrescan3d_results.min_value,
-                        design_metrics.aggrescan3d_results.max_value,
+                        budeff_results.total_energy,
+                        budeff_results.steric,
+                        budeff_results.desolvation,
+                        budeff_results.charge,
+                        evoef2_results.total,
+                        evoef2_results.ref_total,
+                        evoef2_results.intraR_total,
+                        evoef2_results.interS_total,
+                        evoef2_results.interD_total,
+                        dfire2_results.total,
+                        rosetta_results.total_score,
+                        rosetta_results.fa_atr,
+                        rosetta_results.fa_rep,
+                        rosetta_results.fa_intra_rep,
+                        rosetta_results.fa_elec,
+                        rosetta_results.fa_sol,
+                        rosetta_results.lk_ball_wtd,
+                        rosetta_results.fa_intra_sol_xover4,
+                        rosetta_results.hbond_lr_bb,
+                        rosetta_results.hbond_sr_bb,
+                        rosetta_results.hbond_bb_sc,
+                        rosetta_results.hbond_sc,
+                        rosetta_results.dslf_fa13,
+                        rosetta_results.rama_prepro,
+                        rosetta_results.p_aa_pp,
+                        rosetta_results.fa_dun,
+                        rosetta_results.omega,
+                        rosetta_results.pro_close,
+                        rosetta_results.yhh_planarity,
+                        aggrescan3d_results.total_value,
+                        aggrescan3d_results.avg_value,
+                        aggrescan3d_results.min_value,
+                        aggrescan3d_results.max_value,
                     ],
                 )
             )
@@ -555,6 +864,7 @@ def headless_destress(pdb_file: str) -> DesignMetricsOutputRow:
                 design_name=design_name,
                 file_name=file_name,
                 **design_metrics_output,
+                triage_decision=triage_decision(design_metrics, triage_thresholds),
             )
 
         except Exception as e:
@@ -579,7 +889,29 @@ def headless_destress(pdb_file: str) -> DesignMetricsOutputRow:
 
 @click.command()
 @click.argument("input_path", type=click.Path(exists=True))
-def headless_destress_batch(input_path: str) -> None:
+@click.option(
+    "--metrics",
+    default="all",
+    help=(
+        "Comma separated list of the metric groups to calculate, e.g. "
+        "`budeff,dfire2`. Metrics that are not selected are left empty in the "
+        f"output. Options: all, {', '.join(analysis.METRIC_GROUPS)}."
+    ),
+)
+@click.option(
+    "--triage-thresholds",
+    default="",
+    help=(
+        "Comma separated list of thresholds on the cheap metrics, e.g. "
+        "`charge<=5,packing_density>=55,dfire2_total<-100`. EvoEF2, Rosetta "
+        "and Aggrescan3D are only run for designs that meet all of them, and "
+        "the decision is written to the triage_decision column. Metrics: "
+        f"{', '.join(analysis.TRIAGE_METRICS)}."
+    ),
+)
+def headless_destress_batch(
+    input_path: str, metrics: str, triage_thresholds: str
+) -> None:
     """Running DE-STRESS in headless mode (using CLI rather than
     DE-STRESS user interface) for a set of pdb files.
 
@@ -602,6 +934,11 @@ def headless_destress_batch(input_path: str) -> None:
     input_path: str
         This is the input path to a set of pdb files to be ran through
         headless DE-STRESS.
+    metrics: str
+        Comma separated list of the metric groups to calculate.
+    triage_thresholds: str
+        Comma separated list of the thresholds that a design has to meet
+        before the slow tools are run on it.
 
     Returns
     -------
@@ -611,6 +948,23 @@ def headless_destress_batch(input_path: str) -> None:
     # Start time
     tic = time.time()
 
+    # Checking the metric plan before anything is run
+    try:
+        metric_plan = analysis.parse_metric_plan(metrics)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--metrics")
+    try:
+        triage_plan = analysis.parse_triage_thresholds(triage_thresholds)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--triage-thresholds")
+    missing_metric_groups = analysis.triage_metric_groups(triage_plan) - metric_plan
+    if missing_metric_groups:
+        raise click.BadParameter(
+            "The triage thresholds need the metric group(s) "
+            f"{', '.join(sorted(missing_metric_groups))}, add them to --metrics.",
+            param_hint="--triage-thresholds",
+        )
+
     # Resolving the input path that has been provided
     input_path = Path(input_path).resolve()
 
@@ -654,6 +1008,12 @@ def headless_destress_batch(input_path: str) -> None:
         + " batch/batches."
     )
 
+    logging.info(f"Metric groups: {', '.join(sorted(metric_plan))}.")
+    if triage_plan:
+        logging.info(
+            f"Triage thresholds: {', '.join(str(t) for t in triage_plan)}."
+        )
+
     logging.info(
         "DE-STRESS will run on "
         + str(num_pdb_files)
@@ -695,15 +1055,68 @@ def headless_destress_batch(input_path: str) -> None:
 
             logging.info(f"Processing batch {batch_number+1}/{len(batches)}...")
 
+            # Triaging the batch first, so that only the PDB files that pass
+            # are scored with Rosetta
+            if triage_plan and "rosetta" in metric_plan:
+                triage_results = process_pool.starmap(
+                    headless_triage,
+                    [
+                        (pdb_file, metric_plan, triage_plan)
+                        for pdb_file in batch_file_list
+                    ],
+                )
+            else:
+                triage_results = [(True, {})] * len(batch_file_list)
+
+            # Scoring the batch with one Rosetta run per chunk of PDB files
+            # rather than starting Rosetta for every PDB file
+            rosetta_results: tp.List[tp.Optional[RosettaOutput]] = [None] * len(
+                batch_file_list
+            )
+            if "rosetta" in metric_plan:
+                rosetta_indices = [
+                    i for (i, (passed, _)) in enumerate(triage_results) if passed
+                ]
+                for i, rosetta_output in zip(
+                    rosetta_indices,
+                    headless_rosetta_batch(
+                        process_pool,
+                        [batch_file_list[i] for i in rosetta_indices],
+                        NUM_HEADLESS_DESTRESS_WORKERS,
+                    ),
+                ):
+                    rosetta_results[i] = rosetta_output
+
             # Applying process pool to the batch of PDB files
-            batch_results = process_pool.map(headless_destress, batch_file_list)
+            batch_results = process_pool.starmap(
+                headless_destress,
+                [
+                    (pdb_file, metric_plan, pdb_rosetta_results, triage_plan, tools)
+                    for pdb_file, pdb_rosetta_results, (_, tools) in zip(
+                        batch_file_list, rosetta_results, triage_results
+                    )
+                ],
+            )
+            if triage_plan:
+                logging.info(
+                    f"{sum(r.triage_decision == 'passed' for r in batch_results)}"
+                    f"/{len(batch_results)} PDB files passed triage."
+                )
+
+            # The triage decision is only written when triage is used, so that
+            # the columns are unchanged otherwise
+            output_fields = [
+                field
+                for field in batch_results[0].__dict__.keys()
+                if triage_plan or field != "triage_decision"
+            ]
 
             # If this is the first batch then it creates the csv file
             # but for all other batches it inserts into the csv file
             if batch_number == 0:
 
                 # Extracting the dictionary keys as headers for the CSV file
-                headers = batch_results[0].__dict__.keys()
+                headers = output_fields
 
                 # Opening in "write" mode
                 with open("design_data.csv", "w", encoding="UTF8") as f:
@@ -715,7 +1128,9 @@ def headless_destress_batch(input_path: str) -> None:
                     # Looping through the data rows and
                     # writing them into the data set
                     for i in range(0, len(batch_results)):
-                        writer.writerow(batch_results[i].__dict__.values())
+                        writer.writerow(
+                            [getattr(batch_results[i], f) for f in output_fields]
+                        )
 
             else:
 
@@ -726,7 +1141,9 @@ def headless_destress_batch(input_path: str) -> None:
                     # Looping through the data rows and
                     # writing them into the data set
                     for i in range(0, len(batch_results)):
-                        writer.writerow(batch_results[i].__dict__.values())
+                        writer.writerow(
+                            [getattr(batch_results[i], f) for f in output_fields]
+                        )
 
     # End time
     toc = time.time()
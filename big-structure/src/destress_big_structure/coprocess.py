@@ -0,0 +1,267 @@
+"""Long-lived helper processes that handle a stream of requests.
+
+Some of the external tools spend more time loading their parameters than
+scoring a design. Rather than starting these tools for every design, a
+co-process is started once and is then sent one request per line on its stdin.
+It replies with its output followed by an end marker line. If a co-process
+dies or takes too long it is killed, and a new one is started for the next
+request.
+"""
+import atexit
+import contextlib
+import os
+import queue
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+
+class CoProcessError(Exception):
+    """Raised when a co-process exits before it has finished a request.
+
+    Parameters
+    ----------
+    message: str
+        Description of the error.
+    output: str
+        The stdout of the co-process for the failed request.
+    error_output: str
+        The stderr of the co-process for the failed request.
+    return_code: Optional[int]
+        The exit code of the co-process.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        output: str = "",
+        error_output: str = "",
+        return_code: Optional[int] = None,
+    ):
+        super().__init__(message)
+        self.output = output
+        self.error_output = error_output
+        self.return_code = return_code
+
+
+class CoProcess:
+    """A tool that is started once and then sent one request per line.
+
+    Parameters
+    ----------
+    cmd: List[str]
+        The command that starts the co-process.
+    end_marker: str
+        Line written by the co-process after the output of each request.
+    ready_marker: Optional[str]
+        Line written by the co-process once it has started, if this is not
+        given the co-process is assumed to be ready straight away.
+    cwd: Optional[str]
+        Working directory of the co-process.
+    startup_timeout: Optional[float]
+        Maximum number of seconds to wait for the ready marker.
+    """
+
+    def __init__(
+        self,
+        cmd: List[str],
+        end_marker: str,
+        ready_marker: Optional[str] = None,
+        cwd: Optional[str] = None,
+        startup_timeout: Optional[float] = None,
+    ):
+        self.cmd = cmd
+        self.end_marker = end_marker
+        self._process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=cwd,
+            universal_newlines=True,
+            bufsize=1,
+        )
+        # The pipes are read by threads so that a timeout can be applied, and
+        # so the co-process never blocks on a full stderr pipe
+        self._stdout_lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._stderr_lines: List[str] = []
+        self._stderr_lock = threading.Lock()
+        threading.Thread(target=self._read_stdout, daemon=True).start()
+        threading.Thread(target=self._read_stderr, daemon=True).start()
+        if ready_marker is not None:
+            self._read_until(ready_marker, startup_timeout)
+            self._take_stderr()
+
+    def _read_stdout(self) -> None:
+        for line in self._process.stdout:
+            self._stdout_lines.put(line)
+        self._stdout_lines.put(None)
+
+    def _read_stderr(self) -> None:
+        for line in self._process.stderr:
+            with self._stderr_lock:
+                self._stderr_lines.append(line)
+
+    def _take_stderr(self) -> str:
+        with self._stderr_lock:
+            error_output = "".join(self._stderr_lines)
+            self._stderr_lines = []
+        return error_output
+
+    def _read_until(self, marker: str, timeout: Optional[float]) -> str:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        output_lines: List[str] = []
+        while True:
+            remaining = (
+                None if deadline is None else max(deadline - time.monotonic(), 0)
+            )
+            try:
+                line = self._stdout_lines.get(timeout=remaining)
+            except queue.Empty:
+                self.kill()
+                raise subprocess.TimeoutExpired(
+                    self.cmd, timeout, output="".join(output_lines)
+                )
+            if line is None:
+                return_code = self._process.wait()
+                raise CoProcessError(
+                    f"{self.cmd[0]} exited with return code {return_code}.",
+                    output="".join(output_lines),
+                    error_output=self._take_stderr(),
+                    return_code=return_code,
+                )
+            if line.rstrip("\r\n") == marker:
+                return "".join(output_lines)
+            output_lines.append(line)
+
+    @property
+    def alive(self) -> bool:
+        return self._process.poll() is None
+
+    def request(self, line: str, timeout: Optional[float] = None) -> Tuple[str, str]:
+        """Sends a request to the co-process and waits for the reply.
+
+        Parameters
+        ----------
+        line: str
+            The request, which must not contain a new line.
+        timeout: Optional[float]
+            Maximum number of seconds to wait for the reply. The co-process is
+            killed and `subprocess.TimeoutExpired` is raised if it's exceeded.
+
+        Returns
+        -------
+        output: str
+            The stdout of the co-process for this request, without the end
+            marker.
+        error_output: str
+            Anything written to stderr while the request was running.
+        """
+        self._take_stderr()
+        try:
+            self._process.stdin.write(line + "\n")
+            self._process.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            raise CoProcessError(
+                f"{self.cmd[0]} is not running.",
+                error_output=self._take_stderr(),
+                return_code=self._process.poll(),
+            )
+        output = self._read_until(self.end_marker, timeout)
+        return output, self._take_stderr()
+
+    def kill(self) -> None:
+        if self.alive:
+            self._process.kill()
+        self._process.wait()
+
+    def close(self) -> None:
+        """Closes stdin so the co-process can exit, killing it if it doesn't."""
+        if self.alive:
+            try:
+                self._process.stdin.close()
+                self._process.wait(timeout=5)
+            except (BrokenPipeError, subprocess.TimeoutExpired):
+                pass
+        self.kill()
+
+
+class CoProcessPool:
+    """Shares co-processes between the threads of a process.
+
+    A co-process is only used by one thread at a time, so the pool grows to
+    the number of threads that use it at once. For a single threaded worker
+    this means that one co-process is used for every design that it analyses.
+
+    Parameters
+    ----------
+    factory: Callable[[], CoProcess]
+        Starts a new co-process.
+    """
+
+    def __init__(self, factory: Callable[[], CoProcess]):
+        self._factory = factory
+        self._idle: List[CoProcess] = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def acquire(self) -> Iterator[CoProcess]:
+        """Takes an idle co-process from the pool, starting one if needed.
+
+        Dead co-processes are not returned to the pool, so a new one is started
+        after a crash or timeout.
+        """
+        with self._lock:
+            coprocess = self._idle.pop() if self._idle else None
+        if coprocess is None:
+            coprocess = self._factory()
+        try:
+            yield coprocess
+        finally:
+            if coprocess.alive:
+                with self._lock:
+                    self._idle.append(coprocess)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for coprocess in idle:
+            coprocess.close()
+
+
+_POOLS: Dict[Tuple[str, ...], CoProcessPool] = {}
+_POOLS_LOCK = threading.Lock()
+_POOLS_PID = os.getpid()
+
+
+def get_coprocess_pool(
+    key: Tuple[str, ...], factory: Callable[[], CoProcess]
+) -> CoProcessPool:
+    """Gets the pool of co-processes for a tool, creating it if needed.
+
+    Parameters
+    ----------
+    key: Tuple[str, ...]
+        Identifies the tool, e.g. the path of its binary.
+    factory: Callable[[], CoProcess]
+        Starts a new co-process for the tool.
+    """
+    global _POOLS, _POOLS_PID
+    with _POOLS_LOCK:
+        if _POOLS_PID != os.getpid():
+            # A forked worker must not share the pipes of its parent
+            _POOLS = {}
+            _POOLS_PID = os.getpid()
+        if key not in _POOLS:
+            _POOLS[key] = CoProcessPool(factory)
+        return _POOLS[key]
+
+
+@atexit.register
+def close_coprocess_pools() -> None:
+    """Stops all of the co-processes that were started by this process."""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values()) if _POOLS_PID == os.getpid() else []
+    for pool in pools:
+        pool.close()
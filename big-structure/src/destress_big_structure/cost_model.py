@@ -0,0 +1,238 @@
+"""Predicts how long a metrics job will take from the size of the design.
+
+The run time of the tools, Rosetta, EvoEF2 and Aggrescan3D in particular,
+grows with the size of a design. Each tool has a linear model of its run time
+from the number of atoms and residues, which is fitted to timings recorded with
+`benchmarks/fit_cost_model.py`. The web server uses the prediction to choose a
+queue and a time limit for each job, and to give the client an ETA.
+"""
+from dataclasses import asdict, dataclass
+import itertools
+import json
+import math
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# The queues that metrics jobs are routed to, the workers for the small queue
+# are kept free for the designs that can be analysed quickly
+SMALL_QUEUE = "small"
+LARGE_QUEUE = "large"
+# Time limits of the jobs on each queue in seconds, the time limit of a large
+# job is set from its prediction up to `LARGE_JOB_TIMEOUT`
+SMALL_JOB_TIMEOUT = 30
+LARGE_JOB_TIMEOUT = 600
+# Part of the time limit of a job that is kept back from the analysis, so
+# that there is time to return the metrics that were finished
+JOB_TIMEOUT_MARGIN = 5
+# The time limit is this multiple of the prediction, as the run time of a tool
+# also depends on the structure of a design and on the load of the server
+JOB_TIMEOUT_FACTOR = 2.0
+# The longest prediction that is routed to the small queue, 12.5 s, as the time
+# limit of a job has to fit in `SMALL_JOB_TIMEOUT`
+SMALL_JOB_MAX_PREDICTED_SECONDS = (
+    SMALL_JOB_TIMEOUT - JOB_TIMEOUT_MARGIN
+) / JOB_TIMEOUT_FACTOR
+
+
+@dataclass
+class ToolCost:
+    """A linear model of the run time of a tool in seconds."""
+
+    intercept: float
+    per_atom: float
+    per_residue: float
+
+    def predict(self, num_atoms: int, num_residues: int) -> float:
+        return (
+            self.intercept
+            + self.per_atom * num_atoms
+            + self.per_residue * num_residues
+        )
+
+
+class ToolTiming(NamedTuple):
+    """The time taken by a tool to analyse a design."""
+
+    tool: str
+    num_atoms: int
+    num_residues: int
+    seconds: float
+
+
+class JobRoute(NamedTuple):
+    """The queue of a metrics job, its time limit and its analysis time budget."""
+
+    queue_name: str
+    timeout: int
+    time_budget: float
+
+
+# Rough costs that are used until a model has been fitted on the server, these
+# overestimate rather than underestimate. "in_process" covers loading the
+# design and the metrics that do not depend on an external tool.
+DEFAULT_TOOL_COSTS: Dict[str, ToolCost] = {
+    "in_process": ToolCost(intercept=0.2, per_atom=5e-5, per_residue=0.0),
+    "budeFF_results": ToolCost(intercept=0.1, per_atom=5e-5, per_residue=0.0),
+    "evoEF2_results": ToolCost(intercept=0.5, per_atom=2e-4, per_residue=0.0),
+    "dfire2_results": ToolCost(intercept=0.05, per_atom=1e-5, per_residue=0.0),
+    "rosetta_results": ToolCost(intercept=5.0, per_atom=0.0, per_residue=0.01),
+    "aggrescan3d_results": ToolCost(intercept=3.0, per_atom=0.0, per_residue=0.02),
+}
+
+
+class CostModel:
+    """Predicts the run time of a metrics job from the run time of each tool.
+
+    Parameters
+    ----------
+    tool_costs: Dict[str, ToolCost]
+        The model for each tool, keyed by the name of its output (e.g.
+        "rosetta_results"), and "in_process" for the in-process metrics.
+    """
+
+    def __init__(self, tool_costs: Dict[str, ToolCost]):
+        self.tool_costs = tool_costs
+
+    def predict_tools(self, num_atoms: int, num_residues: int) -> Dict[str, float]:
+        """The predicted run time of each tool in seconds."""
+        return {
+            tool: tool_cost.predict(num_atoms, num_residues)
+            for (tool, tool_cost) in self.tool_costs.items()
+        }
+
+    def predict(self, num_atoms: int, num_residues: int) -> float:
+        """The predicted run time of a job in seconds.
+
+        This assumes that the tools are run one after another, which is the
+        default (see `ANALYSIS_WORKERS`), so it overestimates the time when
+        they are run at the same time.
+        """
+        return sum(self.predict_tools(num_atoms, num_residues).values())
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {tool: asdict(tool_cost) for (tool, tool_cost) in self.tool_costs.items()},
+            indent=2,
+        )
+
+    @classmethod
+    def from_json(cls, json_string: str) -> "CostModel":
+        return cls(
+            {
+                tool: ToolCost(**coefficients)
+                for (tool, coefficients) in json.loads(json_string).items()
+            }
+        )
+
+
+def load_cost_model(cost_model_path: Optional[str] = None) -> CostModel:
+    """Loads a fitted cost model, or the default one if no path is given."""
+    if not cost_model_path:
+        return CostModel(dict(DEFAULT_TOOL_COSTS))
+    with open(cost_model_path) as inf:
+        return CostModel.from_json(inf.read())
+
+
+def fit_tool_cost(timings: Iterable[ToolTiming]) -> ToolCost:
+    """Fits a linear model to the timings of a single tool.
+
+    The number of atoms and residues of a design are strongly correlated, so an
+    ordinary least squares fit can give a negative coefficient for one of them,
+    which would predict negative times for some designs. The coefficients are
+    constrained to be non-negative, by fitting every subset of the terms and
+    taking the best fit that has no negative coefficients.
+
+    Parameters
+    ----------
+    timings: Iterable[ToolTiming]
+        The recorded timings of the tool.
+
+    Returns
+    -------
+    tool_cost: ToolCost
+        The fitted model.
+    """
+    timings = list(timings)
+    if not timings:
+        raise ValueError("Cannot fit a cost model without any timings.")
+    terms = np.array(
+        [(1.0, timing.num_atoms, timing.num_residues) for timing in timings]
+    )
+    seconds = np.array([timing.seconds for timing in timings])
+
+    best_coefficients = np.zeros(3)
+    best_residual = float(np.sum(seconds ** 2))
+    for number_of_terms in (1, 2, 3):
+        for columns in itertools.combinations(range(3), number_of_terms):
+            (subset_coefficients, *_) = np.linalg.lstsq(
+                terms[:, columns], seconds, rcond=None
+            )
+            if np.any(subset_coefficients < 0):
+                continue
+            residual = float(
+                np.sum((terms[:, columns] @ subset_coefficients - seconds) ** 2)
+            )
+            if residual < best_residual:
+                best_coefficients = np.zeros(3)
+                best_coefficients[list(columns)] = subset_coefficients
+                best_residual = residual
+    (intercept, per_atom, per_residue) = best_coefficients
+    return ToolCost(
+        intercept=float(intercept),
+        per_atom=float(per_atom),
+        per_residue=float(per_residue),
+    )
+
+
+def fit_cost_model(timings: Iterable[ToolTiming]) -> CostModel:
+    """Fits a model for each of the tools that have been timed."""
+    tool_timings: Dict[str, List[ToolTiming]] = {}
+    for timing in timings:
+        tool_timings.setdefault(timing.tool, []).append(timing)
+    return CostModel(
+        {tool: fit_tool_cost(timings) for (tool, timings) in tool_timings.items()}
+    )
+
+
+def design_size(pdb_string: str) -> Tuple[int, int]:
+    """Counts the atoms and residues in the first state of a PDB string.
+
+    This only reads the coordinate records, so it is cheap enough to use when a
+    job is submitted.
+
+    Returns
+    -------
+    num_atoms: int
+        The number of ATOM and HETATM records.
+    num_residues: int
+        The number of residues in the ATOM records.
+    """
+    num_atoms = 0
+    residues = set()
+    for line in pdb_string.splitlines():
+        if line.startswith("ENDMDL"):
+            break
+        if line.startswith(("ATOM  ", "HETATM")):
+            num_atoms += 1
+            if line.startswith("ATOM  "):
+                # The chain, residue number and insertion code
+                residues.add(line[21:27])
+    return num_atoms, len(residues)
+
+
+def route_job(predicted_seconds: float) -> JobRoute:
+    """Chooses the queue and time limit of a job from its predicted run time.
+
+    The time limit of a job is `JOB_TIMEOUT_FACTOR` times its prediction plus
+    `JOB_TIMEOUT_MARGIN`, so only jobs that are predicted to take at most
+    `SMALL_JOB_MAX_PREDICTED_SECONDS` (12.5 s), rather than `SMALL_JOB_TIMEOUT`,
+    go to the small queue.
+    """
+    if predicted_seconds <= SMALL_JOB_MAX_PREDICTED_SECONDS:
+        return JobRoute(
+            SMALL_QUEUE, SMALL_JOB_TIMEOUT, SMALL_JOB_TIMEOUT - JOB_TIMEOUT_MARGIN
+        )
+    timeout = math.ceil(predicted_seconds * JOB_TIMEOUT_FACTOR) + JOB_TIMEOUT_MARGIN
+    timeout = min(timeout, LARGE_JOB_TIMEOUT)
+    return JobRoute(LARGE_QUEUE, timeout, timeout - JOB_TIMEOUT_MARGIN)
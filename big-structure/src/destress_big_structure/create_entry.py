@@ -1,4 +1,5 @@
 import gzip as gz
+import itertools
 from pathlib import Path
 import typing as tp
 
@@ -20,6 +21,13 @@ from destress_big_structure.design_models import (
     DesignChainModel,
 )
 from destress_big_structure import analysis
+from destress_big_structure.elm_types import (
+    Aggrescan3DOutput,
+    BudeFFOutput,
+    DFIRE2Output,
+    EvoEF2Output,
+    RosettaOutput,
+)
 
 from .settings import (
     EVOEF2_BINARY_PATH,
@@ -29,16 +37,39 @@ from .settings import (
 )
 
 
+def load_biounit_states(pdb_path: Path) -> tp.List[ampal.Assembly]:
+    with gz.open(str(pdb_path)) as inf:
+        contents = inf.read().decode()
+    pdb_ampal = ampal.load_pdb(contents, pdb_id=pdb_path.name, path=False)
+    if isinstance(pdb_ampal, ampal.Assembly):
+        return [pdb_ampal]
+    return list(pdb_ampal)
+
+
+def run_rosetta_for_states(state_pdbs: tp.List[str]) -> tp.List[RosettaOutput]:
+    """Scores a set of states with Rosetta, using one run per chunk of states."""
+    assert (
+        ROSETTA_BINARY_PATH
+    ), "ROSETTA_BINARY_PATH is not defined, check you `.env` file"
+    return analysis.run_rosetta_batch(state_pdbs, ROSETTA_BINARY_PATH)
+
+
 def create_biounit_entry(
     pdb_path: Path,
     biounit_num: int,
     pdb_entry: PdbModel,
     is_deposited_pdb: bool,
     preferred_biol_unit: tp.Optional[int],
+    states: tp.Optional[tp.List[ampal.Assembly]] = None,
+    rosetta_results: tp.Optional[tp.List[RosettaOutput]] = None,
+    state_pdbs: tp.Optional[tp.List[str]] = None,
 ) -> BiolUnitModel:
-    with gz.open(str(pdb_path)) as inf:
-        contents = inf.read().decode()
-    pdb_ampal = ampal.load_pdb(contents, pdb_id=pdb_path.name, path=False)
+    if states is None:
+        states = load_biounit_states(pdb_path)
+    if rosetta_results is None:
+        rosetta_results = [None] * len(states)
+    if state_pdbs is None:
+        state_pdbs = [state.pdb for state in states]
     is_preferred_biol_unit = (
         False if preferred_biol_unit is None else biounit_num == preferred_biol_unit
     )
@@ -48,17 +79,21 @@ def create_biounit_entry(
         is_preferred_biol_unit=is_preferred_biol_unit,
         pdb=pdb_entry,
     )
-    if isinstance(pdb_ampal, ampal.Assembly):
-        states = [create_state_entry(pdb_ampal, 0, biounit_model)]
-    else:
-        states = []
-        for i, state in enumerate(pdb_ampal):
-            states.append(create_state_entry(state, i, biounit_model))
+    for i, (state, state_rosetta_results, state_pdb) in enumerate(
+        zip(states, rosetta_results, state_pdbs)
+    ):
+        create_state_entry(
+            state, i, biounit_model, state_rosetta_results, pdb_string=state_pdb
+        )
     return biounit_model
 
 
 def create_state_entry(
-    ampal_assembly: ampal.Assembly, state_number: int, biounit_entry: BiolUnitModel
+    ampal_assembly: ampal.Assembly,
+    state_number: int,
+    biounit_entry: BiolUnitModel,
+    rosetta_results: tp.Optional[RosettaOutput] = None,
+    pdb_string: tp.Optional[str] = None,
 ) -> StateModel:
     assert (
         EVOEF2_BINARY_PATH
@@ -73,7 +108,17 @@ def create_state_entry(
         AGGRESCAN3D_SCRIPT_PATH
     ), "AGGRESCAN3D_SCRIPT_PATH is not defined, check you `.env` file"
     # Generate raw metrics
-    state_analytics = analysis.analyse_design(ampal_assembly)
+    # The state is only converted to PDB text once, for all of the tools
+    if pdb_string is None:
+        pdb_string = ampal_assembly.pdb
+    # Rosetta might already have been run for a batch of states
+    state_analytics = analysis.analyse_design(
+        ampal_assembly,
+        precomputed_results=(
+            None if rosetta_results is None else {"rosetta_results": rosetta_results}
+        ),
+        pdb_string=pdb_string,
+    )
     # Convert the DesignMetrics into a StateModel
     state_model = StateModel(
         state_number=state_number,
@@ -81,10 +126,7 @@ def create_state_entry(
         composition=";".join(
             f"{k}:{v:.2f}" for (k, v) in state_analytics.composition.items()
         ),
-        torsion_angles="".join(
-            f"{id_string}({tas[0]:.0f},{tas[1]:.0f},{tas[2]:.0f})"
-            for id_string, tas in state_analytics.torsion_angles.items()
-        ),
+        torsion_angles=torsion_angles_string(state_analytics.torsion_angles),
         hydrophobic_fitness=state_analytics.hydrophobic_fitness,
         is_protein_only=all(
             [isinstance(chain, ampal.Polypeptide) for chain in ampal_assembly]
@@ -98,16 +140,32 @@ def create_state_entry(
         if isinstance(chain, ampal.Polypeptide):
             create_chain_entry(chain, state_model)
 
-    create_budeff_results_entry(ampal_assembly, state_model)
-    create_evoef2_results_entry(ampal_assembly, state_model, EVOEF2_BINARY_PATH)
-    create_dfire2_results_entry(ampal_assembly, state_model, DFIRE2_FOLDER_PATH)
-    create_rosetta_results_entry(ampal_assembly, state_model, ROSETTA_BINARY_PATH)
-    create_aggrescan3d_results_entry(
-        ampal_assembly, state_model, AGGRESCAN3D_SCRIPT_PATH
-    )
+    # The tools have all been run by `analyse_design`, so their outputs are
+    # used for the results tables rather than running them again
+    create_budeff_results_entry(state_analytics.budeFF_results, state_model)
+    create_evoef2_results_entry(state_analytics.evoEF2_results, state_model)
+    create_dfire2_results_entry(state_analytics.dfire2_results, state_model)
+    create_rosetta_results_entry(state_analytics.rosetta_results, state_model)
+    create_aggrescan3d_results_entry(state_analytics.aggrescan3d_results, state_model)
     return state_model
 
 
+def torsion_angles_string(
+    torsion_angles: tp.Dict[str, tp.Tuple[float, float, float]]
+) -> str:
+    """Formats torsion angles for the database, e.g. "A2(-178,-63,-41)A3(...".
+
+    The whole string is created by a single format operation, rather than
+    formatting the angles of each residue separately.
+    """
+    template = "%s(%.0f,%.0f,%.0f)" * len(torsion_angles)
+    return template % tuple(
+        itertools.chain.from_iterable(
+            (id_string, *tas) for (id_string, tas) in torsion_angles.items()
+        )
+    )
+
+
 def create_chain_entry(chain: ampal.Polypeptide, state_model: StateModel) -> ChainModel:
     chain_analytics = analysis.analyse_chain(chain)
     chain_model = ChainModel(chain_label=chain.id, state=state_model, **chain_analytics)
@@ -115,9 +173,8 @@ def create_chain_entry(chain: ampal.Polypeptide, state_model: StateModel) -> Cha
 
 
 def create_budeff_results_entry(
-    ampal_assembly: ampal.Assembly, state_model: StateModel
+    budeff_results: BudeFFOutput, state_model: StateModel
 ) -> BudeFFResultsModel:
-    budeff_results = analysis.run_bude_ff(ampal_assembly)
     budeff_results_model = BudeFFResultsModel(
         state=state_model, **budeff_results.__dict__
     )
@@ -125,20 +182,24 @@ def create_budeff_results_entry(
 
 
 def create_evoef2_results_entry(
-    ampal_assembly: ampal.Assembly, state_model: StateModel, evoef2_binary_path: str
+    evoef2_results: EvoEF2Output, state_model: StateModel
 ) -> EvoEF2ResultsModel:
-    evoef2_results = analysis.run_evoef2(ampal_assembly.pdb, evoef2_binary_path)
+    # The columns are the lower case names of the EvoEF2 output fields, e.g.
+    # `reference_ALA` is stored in `reference_ala`
     evoef2_results_model = EvoEF2ResultsModel(
-        state=state_model, **evoef2_results.__dict__
+        state=state_model,
+        **{
+            field_name.lower(): value
+            for (field_name, value) in evoef2_results.__dict__.items()
+        },
     )
 
     return evoef2_results_model
 
 
 def create_dfire2_results_entry(
-    ampal_assembly: ampal.Assembly, state_model: StateModel, dfire2_folder_path: str
+    dfire2_results: DFIRE2Output, state_model: StateModel
 ) -> DFIRE2ResultsModel:
-    dfire2_results = analysis.run_dfire2(ampal_assembly.pdb, dfire2_folder_path)
     dfire2_results_model = DFIRE2ResultsModel(
         state=state_model, **dfire2_results.__dict__
     )
@@ -147,9 +208,8 @@ def create_dfire2_results_entry(
 
 
 def create_rosetta_results_entry(
-    ampal_assembly: ampal.Assembly, state_model: StateModel, rosetta_binary_path: str
+    rosetta_results: RosettaOutput, state_model: StateModel
 ) -> RosettaResultsModel:
-    rosetta_results = analysis.run_rosetta(ampal_assembly.pdb, rosetta_binary_path)
     rosetta_results_model = RosettaResultsModel(
         state=state_model, **rosetta_results.__dict__
     )
@@ -158,15 +218,8 @@ def create_rosetta_results_entry(
 
 
 def create_aggrescan3d_results_entry(
-    ampal_assembly: ampal.Assembly,
-    state_model: StateModel,
-    aggrescan3d_script_path: str,
+    aggrescan3d_results: Aggrescan3DOutput, state_model: StateModel
 ) -> Aggrescan3DResultsModel:
-
-    aggrescan3d_results = analysis.run_aggrescan3d(
-        ampal_assembly.pdb, aggrescan3d_script_path
-    )
-
     aggrescan3d_results_model = Aggrescan3DResultsModel(
         state=state_model, **aggrescan3d_results.__dict__
     )
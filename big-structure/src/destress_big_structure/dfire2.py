@@ -0,0 +1,252 @@
+"""In-process implementation of the DFIRE2 pair energy function.
+
+This reproduces the energies calculated by the `calene` program that is
+distributed with DFIRE2, without starting a subprocess or writing a temporary
+file. The pair potential is loaded once per process and atom pairs within the
+15 Å cutoff are found with a cell list, so the cost grows linearly with the
+size of the assembly rather than quadratically.
+
+References:
+1. Specific interactions for ab initio folding of protein terminal regions with
+secondary structures. Proteins 72, 793-803 (2008)
+2. Ab initio folding of terminal segments with secondary structures reveals the
+fine difference between two closely-related all-atom statistical energy
+functions. Protein Science 17 1212-1219, (2008)
+"""
+import functools
+import itertools
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Dimensions of the pair potential used by `calene`
+MAX_ATOM_TYPES = 167
+NUMBER_OF_BINS = 30
+# Distances are binned every 0.5 Å, so the last bin ends at 15 Å
+BIN_WIDTH = 0.5
+CUTOFF = NUMBER_OF_BINS * BIN_WIDTH
+
+# Offsets to half of the neighbouring cells, every pair of neighbouring cells
+# is visited once when these are combined with the cell itself
+_HALF_NEIGHBOUR_OFFSETS: List[Tuple[int, int, int]] = [
+    offset
+    for offset in itertools.product((-1, 0, 1), repeat=3)
+    if offset > (0, 0, 0)
+]
+
+
+@functools.lru_cache(maxsize=None)
+def load_dfire2_library(
+    library_path: str,
+) -> Tuple[Dict[str, int], np.ndarray]:
+    """Loads the DFIRE2 pair potential, this is only done once per process.
+
+    Parameters
+    ----------
+    library_path: str
+        Path to `dfire_pair.lib`.
+
+    Returns
+    -------
+    atom_types: Dict[str, int]
+        The index of each atom type, keyed by "<residue name> <atom name>".
+    pair_energies: np.ndarray
+        Array of shape (167, 167, 30) containing the energy of each pair of
+        atom types in each distance bin.
+    """
+    atom_types: Dict[str, int] = {}
+    pair_energies = np.zeros((MAX_ATOM_TYPES, MAX_ATOM_TYPES, NUMBER_OF_BINS))
+    with open(library_path) as inf:
+        for line in inf:
+            if line.startswith("#") or not line.strip():
+                continue
+            fields = line.split()
+            atom_type_ids = []
+            for atom_type in (f"{fields[0]} {fields[1]}", f"{fields[2]} {fields[3]}"):
+                if atom_type not in atom_types:
+                    atom_types[atom_type] = len(atom_types)
+                atom_type_ids.append(atom_types[atom_type])
+            (id1, id2) = atom_type_ids
+            if id1 >= MAX_ATOM_TYPES or id2 >= MAX_ATOM_TYPES:
+                raise ValueError(
+                    f"Too many atom types in the DFIRE2 library `{library_path}`."
+                )
+            energies = [float(e) for e in fields[4 : 4 + NUMBER_OF_BINS]]
+            # The potential is symmetric
+            pair_energies[id1, id2] = energies
+            pair_energies[id2, id1] = energies
+    return atom_types, pair_energies
+
+
+def parse_dfire2_atoms(
+    pdb_string: str, atom_types: Dict[str, int]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Extracts the atoms that are scored by DFIRE2 from a PDB string.
+
+    The records are read in the same way as `calene`, a new residue starts
+    whenever columns 18-27 change and atoms that are not in the pair potential
+    are skipped, after they have been assigned to a residue.
+
+    Parameters
+    ----------
+    pdb_string: str
+        The PDB file as a string.
+    atom_types: Dict[str, int]
+        The atom types of the pair potential.
+
+    Returns
+    -------
+    atom_type_ids: np.ndarray
+        The atom type of each atom.
+    residue_ids: np.ndarray
+        The residue number of each atom.
+    coordinates: np.ndarray
+        Array of shape (N, 3) with the coordinates of the atoms.
+    """
+    atom_type_ids = []
+    residue_ids = []
+    coordinates = []
+    residue_id = -1
+    previous_residue_info = ""
+    for line in pdb_string.splitlines():
+        if not line.startswith("ATOM"):
+            continue
+        residue_info = line[17:27]
+        if residue_info != previous_residue_info:
+            previous_residue_info = residue_info
+            residue_id += 1
+        # `calene` reads up to 3 non-whitespace characters from columns 18
+        # and 14, which are the residue and atom names for standard records
+        residue_name = line[17:].split()
+        atom_name = line[13:].split()
+        if not (residue_name and atom_name):
+            continue
+        atom_type = f"{residue_name[0][:3]} {atom_name[0][:3]}"
+        if atom_type not in atom_types:
+            continue
+        atom_type_ids.append(atom_types[atom_type])
+        residue_ids.append(residue_id)
+        coordinates.append((line[30:38], line[38:46], line[46:54]))
+    return (
+        np.array(atom_type_ids, dtype=int),
+        np.array(residue_ids, dtype=int),
+        np.array(coordinates, dtype=float).reshape(-1, 3),
+    )
+
+
+def _pair_energy(
+    first: np.ndarray,
+    second: np.ndarray,
+    atom_type_ids: np.ndarray,
+    residue_ids: np.ndarray,
+    coordinates: np.ndarray,
+    pair_energies: np.ndarray,
+) -> float:
+    # The components are summed in the same order as `calene`, so that atoms
+    # that are on the edge of a bin are put into the same bin
+    deltas = coordinates[first] - coordinates[second]
+    distances = np.sqrt(
+        deltas[:, 0] * deltas[:, 0]
+        + deltas[:, 1] * deltas[:, 1]
+        + deltas[:, 2] * deltas[:, 2]
+    )
+    bins = (distances * 2).astype(int)
+    scored = (bins < NUMBER_OF_BINS) & (residue_ids[first] != residue_ids[second])
+    return pair_energies[
+        atom_type_ids[first[scored]], atom_type_ids[second[scored]], bins[scored]
+    ].sum()
+
+
+def dfire2_energy(
+    atom_type_ids: np.ndarray,
+    residue_ids: np.ndarray,
+    coordinates: np.ndarray,
+    pair_energies: np.ndarray,
+) -> float:
+    """Calculates the DFIRE2 energy of a set of atoms.
+
+    Atoms are sorted into cubic cells with sides equal to the cutoff, so only
+    atoms in the same or neighbouring cells need to be compared.
+
+    Parameters
+    ----------
+    atom_type_ids: np.ndarray
+        The atom type of each atom.
+    residue_ids: np.ndarray
+        The residue number of each atom, pairs in the same residue are ignored.
+    coordinates: np.ndarray
+        Array of shape (N, 3) with the coordinates of the atoms.
+    pair_energies: np.ndarray
+        The pair potential returned by `load_dfire2_library`.
+
+    Returns
+    -------
+    total: float
+        The DFIRE2 energy in the same units that are reported by `calene`,
+        without any rounding.
+    """
+    if len(coordinates) < 2:
+        return 0.0
+    cells = np.floor((coordinates - coordinates.min(axis=0)) / CUTOFF).astype(int)
+    # The grid is padded by one cell on every side so that the offsets to the
+    # neighbouring cells never wrap around
+    grid_shape = cells.max(axis=0) + 3
+    cell_ids = np.ravel_multi_index((cells + 1).T, grid_shape)
+    offset_ids = [
+        int(np.ravel_multi_index(np.array(offset) + 1, grid_shape))
+        - int(np.ravel_multi_index((1, 1, 1), grid_shape))
+        for offset in _HALF_NEIGHBOUR_OFFSETS
+    ]
+
+    atom_order = np.argsort(cell_ids, kind="stable")
+    (occupied_cells, cell_starts, cell_sizes) = np.unique(
+        cell_ids[atom_order], return_index=True, return_counts=True
+    )
+    cell_atoms = {
+        cell_id: atom_order[start : start + size]
+        for (cell_id, start, size) in zip(
+            occupied_cells.tolist(), cell_starts.tolist(), cell_sizes.tolist()
+        )
+    }
+
+    total = 0.0
+    for cell_id, atoms in cell_atoms.items():
+        # Pairs within the cell
+        (i, j) = np.triu_indices(len(atoms), k=1)
+        total += _pair_energy(
+            atoms[i], atoms[j], atom_type_ids, residue_ids, coordinates, pair_energies
+        )
+        # Pairs with the neighbouring cells
+        for offset_id in offset_ids:
+            neighbour_atoms = cell_atoms.get(cell_id + offset_id)
+            if neighbour_atoms is None:
+                continue
+            first = np.repeat(atoms, len(neighbour_atoms))
+            second = np.tile(neighbour_atoms, len(atoms))
+            total += _pair_energy(
+                first, second, atom_type_ids, residue_ids, coordinates, pair_energies
+            )
+    return total / 100
+
+
+def score_pdb_string(pdb_string: str, library_path: str) -> float:
+    """Calculates the DFIRE2 energy of a PDB string.
+
+    Parameters
+    ----------
+    pdb_string: str
+        The PDB file as a string.
+    library_path: str
+        Path to `dfire_pair.lib`.
+
+    Returns
+    -------
+    total: float
+        The DFIRE2 energy, rounded to 1 decimal place as reported by `calene`.
+    """
+    (atom_types, pair_energies) = load_dfire2_library(library_path)
+    (atom_type_ids, residue_ids, coordinates) = parse_dfire2_atoms(
+        pdb_string, atom_types
+    )
+    total = dfire2_energy(atom_type_ids, residue_ids, coordinates, pair_energies)
+    return float(f"{total:.1f}")
@@ -23,7 +23,7 @@ class RequestMetricsInput:
 @dataclass
 class SequenceInfo:
     sequence: str
-    dssp_assignment: str
+    dssp_assignment: Optional[str]
 
 
 @dataclass_json(letter_case=LetterCase.CAMEL)
@@ -128,7 +128,9 @@ class EvoEF2Output:
     # Calculating sub totals
     def __post_init__(self):
 
-        if list(self.__dict__.values()).count(None) == len(self.__dict__.values()) - 2:
+        # All of the energy values are None if EvoEF2 failed, only the log
+        # information and return code are set
+        if list(self.__dict__.values()).count(None) == len(self.__dict__.values()) - 3:
 
             self.ref_total = None
             self.intraR_total = None
@@ -273,22 +275,25 @@ class Aggrescan3DOutput:
 @dataclass_json(letter_case=LetterCase.CAMEL)
 @dataclass
 class DesignMetrics:
+    # Metrics that were not part of the metric plan are set to None
     sequence_info: Dict[str, SequenceInfo]
     full_sequence: str
-    dssp_assignment: str
+    dssp_assignment: Optional[str]
     composition: Dict[str, float]
-    torsion_angles: Dict[str, Tuple[float, float, float]]
+    torsion_angles: Optional[Dict[str, Tuple[float, float, float]]]
     hydrophobic_fitness: Optional[float]
     isoelectric_point: float
     charge: float
     mass: float
     num_of_residues: int
-    packing_density: float
-    budeFF_results: BudeFFOutput
-    evoEF2_results: EvoEF2Output
-    dfire2_results: DFIRE2Output
-    rosetta_results: RosettaOutput
-    aggrescan3d_results: Aggrescan3DOutput
+    packing_density: Optional[float]
+    budeFF_results: Optional[BudeFFOutput]
+    evoEF2_results: Optional[EvoEF2Output]
+    dfire2_results: Optional[DFIRE2Output]
+    rosetta_results: Optional[RosettaOutput]
+    aggrescan3d_results: Optional[Aggrescan3DOutput]
+    # Tools that ran out of time, all of the metrics in their outputs are None
+    timed_out_tools: List[str] = field(default_factory=list)
 
 
 @dataclass
@@ -365,6 +370,8 @@ class DesignMetricsOutputRow:
     aggrescan3d_avg_value: float
     aggrescan3d_min_value: float
     aggrescan3d_max_value: float
+    # Whether the design passed the triage thresholds, None without triage
+    triage_decision: Optional[str] = None
 
     # Defining the __eq__method to compare all the fields except the
     # file_name field
@@ -443,12 +450,14 @@ class ServerJobStatus(Generic[A, B]):
 class ServerJob(Generic[A, B]):
     uuid: str
     status: ServerJobStatus[A, B]
+    # Estimated UNIX time at which the job will be complete, set by the server
+    eta: Optional[float] = None
 
     def __repr__(self) -> str:
         return f"<ServerJob: uuid={self.uuid},status={self.status.__repr__()}>"
 
     def to_dict(self):
-        return {"uuid": self.uuid, "status": self.status.to_dict()}
+        return {"uuid": self.uuid, "status": self.status.to_dict(), "eta": self.eta}
 
     @classmethod
     def from_dict(cls, json_dict, constructor_a, constructor_b):
@@ -0,0 +1,144 @@
+"""Manifest of the source files that the big structure database is created from.
+
+`dbs_db_from_scratch` records the size and modification time (the stamps) and a
+hash of the source files of each PDB entry, along with the versions of the
+tools, in the `pdb_manifest` table. With `--incremental` this is used to only
+process the entries that are new or changed since the last run:
+
+* entries whose stamps and tool versions are unchanged are skipped without
+  reading their files,
+* entries whose stamps changed but whose files have the same hash only have
+  their stamps updated,
+* every other entry is processed again, replacing its rows.
+
+The manifest entries of a batch are written in the same transaction as its
+rows, so a run that is interrupted can be resumed without duplicating entries.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+import typing as tp
+
+from sqlalchemy.orm import Session  # type: ignore
+
+from destress_big_structure.analysis import TOOL_VERSION_LABELS, tool_files
+from destress_big_structure.big_structure_models import PdbManifestModel
+from destress_big_structure.pdbml import PDB_EXTRA_FIELDS
+from destress_big_structure.result_cache import walk_tool_path
+
+# Files are hashed in chunks, as the tool binaries can be hundreds of MB
+HASH_CHUNK_BYTES = 1 << 20
+
+
+class ManifestEntry(tp.NamedTuple):
+    pdb_code: str
+    source_stamps: str
+    source_hash: str
+    tool_versions: str
+
+
+def source_stamps(source_paths: tp.Iterable[Path]) -> str:
+    """Records the name, size and modification time of each source file."""
+    stamps = []
+    for path in source_paths:
+        if path.exists():
+            file_stats = os.stat(path)
+            stamps.append(f"{path.name}:{file_stats.st_size}:{file_stats.st_mtime_ns}")
+        else:
+            stamps.append(f"{path.name}:missing")
+    return ";".join(sorted(stamps))
+
+
+def source_hash(source_paths: tp.Iterable[Path]) -> str:
+    """Hashes the names and contents of the source files."""
+    files_hash = hashlib.sha256()
+    for path in sorted(source_paths):
+        files_hash.update(path.name.encode())
+        files_hash.update(b"\0")
+        files_hash.update(path.read_bytes())
+        files_hash.update(b"\0")
+    return files_hash.hexdigest()
+
+
+def tool_file_hash(path: tp.Optional[str]) -> str:
+    """Hashes the contents of a file or folder that makes up a tool.
+
+    The files in a folder are hashed with their paths relative to it. Unlike the
+    stamps of the source files, the modification time is not used, as it
+    changes whenever the Docker image is rebuilt, even if the tool doesn't.
+    """
+    if not path or not os.path.exists(path):
+        return f"{path}:missing"
+    files_hash = hashlib.sha256()
+    for file_path in walk_tool_path(path):
+        files_hash.update(os.path.relpath(file_path, path).encode())
+        files_hash.update(b"\0")
+        with open(file_path, "rb") as inf:
+            for chunk in iter(lambda: inf.read(HASH_CHUNK_BYTES), b""):
+                files_hash.update(chunk)
+        files_hash.update(b"\0")
+    return files_hash.hexdigest()
+
+
+def tool_versions() -> str:
+    """The versions of the tools that are used to create the entries.
+
+    Each tool has the hashes of the files and folders that make it up, which
+    are the same ones that the result cache fingerprints.
+    """
+    versions: tp.Dict[str, tp.Any] = {
+        name: [TOOL_VERSION_LABELS.get(name, "")]
+        + [tool_file_hash(path) for path in paths]
+        for (name, paths) in tool_files().items()
+    }
+    # Entries are also updated when fields are added to the `pdb` table
+    versions["pdbml_fields"] = list(PDB_EXTRA_FIELDS)
+    return json.dumps(versions, sort_keys=True)
+
+
+def is_up_to_date(
+    manifest_entry: tp.Optional[ManifestEntry], stamps: str, versions: str
+) -> bool:
+    """Checks if an entry has the same source stamps and tool versions."""
+    return (
+        manifest_entry is not None
+        and manifest_entry.source_stamps == stamps
+        and manifest_entry.tool_versions == versions
+    )
+
+
+def load_manifest(session: Session) -> tp.Dict[str, ManifestEntry]:
+    """Gets the manifest entry of every PDB entry in the database."""
+    return {
+        pdb_code: ManifestEntry(pdb_code, stamps, files_hash, versions)
+        for (pdb_code, stamps, files_hash, versions) in session.query(
+            PdbManifestModel.pdb_code,
+            PdbManifestModel.source_stamps,
+            PdbManifestModel.source_hash,
+            PdbManifestModel.tool_versions,
+        )
+    }
+
+
+def delete_manifest_entries(session: Session, pdb_codes: tp.Iterable[str]) -> None:
+    """Deletes the manifest entries of PDB entries, in the session transaction."""
+    pdb_codes = list(pdb_codes)
+    if pdb_codes:
+        session.query(PdbManifestModel).filter(
+            PdbManifestModel.pdb_code.in_(pdb_codes)
+        ).delete(synchronize_session=False)
+
+
+def save_manifest_entries(
+    session: Session, manifest_entries: tp.List[ManifestEntry]
+) -> None:
+    """Writes manifest entries, replacing any with the same PDB code."""
+    delete_manifest_entries(
+        session, [manifest_entry.pdb_code for manifest_entry in manifest_entries]
+    )
+    if manifest_entries:
+        session.execute(
+            PdbManifestModel.__table__.insert(),
+            [manifest_entry._asdict() for manifest_entry in manifest_entries],
+        )
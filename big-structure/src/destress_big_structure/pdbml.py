@@ -0,0 +1,118 @@
+"""Streaming extraction of metadata from the PDBML files of PDB entries.
+
+The `*-noatom.xml.gz` files can be tens of MB, so rather than parsing the whole
+file into a tree, the elements are read one at a time with `lxml.iterparse`
+and discarded once they have been checked. Parsing stops as soon as all of the
+requested fields have been found.
+"""
+import gzip as gz
+from pathlib import Path
+import typing as tp
+
+from lxml import etree  # type: ignore
+
+
+class PdbmlField(tp.NamedTuple):
+    """Where a field is found in a PDBML file.
+
+    The value is the text of the `item` child element of a row of a category,
+    e.g. `<PDBx:refine><PDBx:ls_d_res_high>1.54</...>`, or the `item` attribute
+    of the row if `is_attribute` is true, e.g. `<PDBx:exptl method="...">`.
+    """
+
+    row: str
+    item: str
+    is_attribute: bool = False
+
+
+# The places each field can be found in, the first one in the file is used
+PDBML_FIELDS: tp.Dict[str, tp.Tuple[PdbmlField, ...]] = {
+    "deposition_date": (
+        PdbmlField("pdbx_database_status", "recvd_initial_deposition_date"),
+    ),
+    "method": (PdbmlField("exptl", "method", is_attribute=True),),
+    "resolution": (
+        PdbmlField("refine", "ls_d_res_high"),
+        PdbmlField("em_3d_reconstruction", "resolution"),
+    ),
+    "r_work": (PdbmlField("refine", "ls_R_factor_R_work"),),
+    "organism": (
+        PdbmlField("entity_src_gen", "pdbx_gene_src_scientific_name"),
+        PdbmlField("entity_src_nat", "pdbx_organism_scientific"),
+        PdbmlField("pdbx_entity_src_syn", "organism_scientific"),
+    ),
+}
+REQUIRED_FIELDS = ("deposition_date", "method")
+# A row, item and whether the item is an attribute, as in `PdbmlField`
+Location = tp.Tuple[str, str, bool]
+# The optional fields that are stored in the `pdb` table
+PDB_EXTRA_FIELDS = ("resolution", "r_work", "organism")
+
+
+def get_pdb_information(
+    xml_path: Path, extra_fields: tp.Iterable[str] = PDB_EXTRA_FIELDS
+) -> tp.Dict[str, tp.Optional[str]]:
+    """Reads the deposition date, method and any extra fields from a PDBML file.
+
+    Parameters
+    ----------
+    xml_path: Path
+        The path to a gzipped PDBML file.
+    extra_fields: Iterable[str]
+        Names of the fields in `PDBML_FIELDS` to read, as well as the required
+        fields.
+
+    Returns
+    -------
+    pdb_information: Dict[str, Optional[str]]
+        The text of each field, None for extra fields that are not in the file.
+
+    Raises
+    ------
+    ValueError
+        If the deposition date or method are not in the file.
+    """
+    field_names = list(REQUIRED_FIELDS) + [
+        name for name in extra_fields if name not in REQUIRED_FIELDS
+    ]
+    # The field that is found at each location
+    wanted_items: tp.Dict[Location, str] = {
+        (pdbml_field.row, pdbml_field.item, pdbml_field.is_attribute): name
+        for name in field_names
+        for pdbml_field in PDBML_FIELDS[name]
+    }
+    wanted_rows = {row for (row, _, _) in wanted_items}
+    pdb_information: tp.Dict[str, tp.Optional[str]] = {}
+    with gz.open(str(xml_path)) as inf:
+        for (_, element) in etree.iterparse(inf, events=("end",)):
+            tag = etree.QName(element).localname
+            parent = element.getparent()
+            parent_tag = None if parent is None else etree.QName(parent).localname
+            # The values in this element, with where they are found
+            values: tp.List[tp.Tuple[Location, tp.Optional[str]]] = []
+            if parent_tag in wanted_rows:
+                values.append(((parent_tag, tag, False), element.text))
+            if tag in wanted_rows:
+                values.extend(
+                    ((tag, attribute, True), value)
+                    for (attribute, value) in element.attrib.items()
+                )
+            for (location, value) in values:
+                name = wanted_items.get(location)
+                # Empty values, e.g. `xsi:nil="true"` elements, are skipped
+                if name is None or not value or name in pdb_information:
+                    continue
+                pdb_information[name] = value.strip()
+            if len(pdb_information) == len(field_names):
+                break
+            # Elements that have been checked are removed from the tree
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+    missing_fields = [name for name in REQUIRED_FIELDS if name not in pdb_information]
+    if missing_fields:
+        raise ValueError(
+            f"Could not find {', '.join(missing_fields)} in the PDBML file "
+            f"`{xml_path}`."
+        )
+    return {name: pdb_information.get(name) for name in field_names}
@@ -0,0 +1,335 @@
+"""Content-addressed cache for the outputs of the analysis tools.
+
+Results are stored per tool, keyed by a hash of the normalised PDB text (the
+relabelled ATOM records) and a fingerprint of the tool that produced them. This
+means a resubmitted design can skip any tool that has already been run on it,
+even if some of the other tools need to be rerun. Two backends are available, a
+local on-disk cache for headless mode and a Redis cache for the web workers,
+both of which evict the least recently used entries once they grow larger than
+a maximum number of bytes.
+"""
+from collections import Counter
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from destress_big_structure.settings import (
+    RESULT_CACHE_BACKEND,
+    RESULT_CACHE_PATH,
+    RESULT_CACHE_MAX_BYTES,
+    RESULT_CACHE_REDIS_URL,
+)
+
+# 1 GB unless otherwise specified
+DEFAULT_MAX_BYTES = 1_000_000_000
+
+
+def normalise_pdb_string(pdb_string: str) -> str:
+    """Keeps only the ATOM records of a PDB string, with trailing spaces removed."""
+    return "\n".join(
+        line.rstrip() for line in pdb_string.splitlines() if line.startswith("ATOM")
+    )
+
+
+def walk_tool_path(path: str) -> List[str]:
+    """Lists a tool file, or the files in a tool folder, in a stable order.
+
+    Compiled Python files are skipped, as they are rewritten by whichever
+    interpreter imports the sources first and aren't part of the tool itself.
+    """
+    if not os.path.isdir(path):
+        return [path]
+    file_paths: List[str] = []
+    for (folder, subfolders, file_names) in os.walk(path):
+        subfolders[:] = sorted(
+            subfolder for subfolder in subfolders if subfolder != "__pycache__"
+        )
+        file_paths.extend(
+            os.path.join(folder, file_name)
+            for file_name in sorted(file_names)
+            if not file_name.endswith((".pyc", ".pyo"))
+        )
+    return file_paths
+
+
+def file_fingerprint(paths: Iterable[Optional[str]]) -> str:
+    """Creates a fingerprint for a tool from the files that make it up.
+
+    The path, size and modification time of each file, including every file in
+    a folder, is hashed, so rebuilding or updating a tool invalidates the
+    results that it produced.
+    """
+    fingerprint_hash = hashlib.sha256()
+    for path in paths:
+        if path and os.path.exists(path):
+            for file_path in walk_tool_path(path):
+                file_stats = os.stat(file_path)
+                file_stamp = (file_path, file_stats.st_size, file_stats.st_mtime_ns)
+                fingerprint_hash.update(":".join(map(str, file_stamp)).encode())
+                fingerprint_hash.update(b"\n")
+        else:
+            fingerprint_hash.update(f"{path}:missing".encode())
+            fingerprint_hash.update(b"\n")
+    return fingerprint_hash.hexdigest()
+
+
+def cache_key(normalised_pdb: str, tool_name: str, tool_fingerprint: str) -> str:
+    """Creates the content-address for the output of a tool on a design."""
+    key_hash = hashlib.sha256()
+    for part in (tool_name, tool_fingerprint, normalised_pdb):
+        key_hash.update(part.encode())
+        key_hash.update(b"\0")
+    return f"{tool_name}-{key_hash.hexdigest()}"
+
+
+class ResultCache:
+    """Base class for the result cache backends.
+
+    Subclasses implement `_get`, `_set` and `_evict`, this class handles the
+    hit/miss counters and the conversion between `str` and `bytes`.
+
+    Parameters
+    ----------
+    max_bytes: int
+        The maximum size of the cache in bytes, once this is exceeded the least
+        recently used entries are evicted.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+        self._counter_lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def _set(self, key: str, value: bytes) -> None:
+        raise NotImplementedError
+
+    def _evict(self) -> None:
+        raise NotImplementedError
+
+    def _record(self, tool_name: str, hit: bool) -> None:
+        with self._counter_lock:
+            if hit:
+                self.hits[tool_name] += 1
+            else:
+                self.misses[tool_name] += 1
+
+    def get(self, tool_name: str, key: str) -> Optional[str]:
+        """Gets a cached value, recording whether it was a hit or a miss."""
+        value = self._get(key)
+        self._record(tool_name, value is not None)
+        return None if value is None else value.decode()
+
+    def set(self, key: str, value: str) -> None:
+        """Stores a value, evicting old entries if the cache is too large."""
+        self._set(key, value.encode())
+        self._evict()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """The number of hits and misses for each tool."""
+        with self._counter_lock:
+            tool_names = set(self.hits) | set(self.misses)
+            return {
+                tool_name: {
+                    "hits": self.hits[tool_name],
+                    "misses": self.misses[tool_name],
+                }
+                for tool_name in sorted(tool_names)
+            }
+
+
+class DiskResultCache(ResultCache):
+    """Stores cached results as files in a local directory.
+
+    The modification time of a file is updated every time it is read, so it
+    can be used to find the least recently used entries. Files are written
+    atomically so the cache can be shared between processes, such as the
+    workers of headless DE-STRESS.
+
+    Parameters
+    ----------
+    directory: str
+        The folder where the cached results are stored.
+    max_bytes: int
+        The maximum size of the cache in bytes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        super().__init__(max_bytes)
+        self.directory = os.path.abspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self._total_bytes: Optional[int] = None
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        with os.scandir(self.directory) as dir_entries:
+            for entry in dir_entries:
+                if entry.is_file() and not entry.name.startswith("."):
+                    try:
+                        file_stats = entry.stat()
+                    except FileNotFoundError:
+                        # Evicted by another process
+                        continue
+                    entries.append(
+                        (file_stats.st_mtime, file_stats.st_size, entry.path)
+                    )
+        return entries
+
+    def _get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as inf:
+                value = inf.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return value
+
+    def _set(self, key: str, value: bytes) -> None:
+        file_descriptor, tmp_path = tempfile.mkstemp(
+            dir=self.directory, prefix=".tmp-"
+        )
+        with os.fdopen(file_descriptor, "wb") as outf:
+            outf.write(value)
+        os.replace(tmp_path, self._path(key))
+        if self._total_bytes is not None:
+            self._total_bytes += len(value)
+
+    def _evict(self) -> None:
+        # The running total is only an estimate when several processes share
+        # the folder, so the folder is rescanned before anything is removed
+        if (self._total_bytes is not None) and (self._total_bytes <= self.max_bytes):
+            return
+        entries = sorted(self._entries())
+        total_bytes = sum(size for (_, size, _) in entries)
+        for (_, size, path) in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+        self._total_bytes = total_bytes
+
+
+class RedisResultCache(ResultCache):
+    """Stores cached results in Redis so they can be shared by the RQ workers.
+
+    A sorted set records the last time each entry was used and a counter
+    tracks the total size of the cached values, which are used to evict the
+    least recently used entries. The hit/miss counters are also stored in
+    Redis, so they cover all of the workers.
+
+    Parameters
+    ----------
+    redis_connection: redis.Redis
+        Connection to the Redis server.
+    max_bytes: int
+        The maximum size of the cache in bytes.
+    prefix: str
+        Prefix used for all of the keys created by the cache.
+    """
+
+    def __init__(
+        self,
+        redis_connection,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        prefix: str = "destress:result-cache",
+    ):
+        super().__init__(max_bytes)
+        self.redis = redis_connection
+        self.prefix = prefix
+        self._lru_key = f"{prefix}:lru"
+        self._bytes_key = f"{prefix}:bytes"
+        self._stats_key = f"{prefix}:stats"
+
+    def _value_key(self, key: str) -> str:
+        return f"{self.prefix}:value:{key}"
+
+    def _record(self, tool_name: str, hit: bool) -> None:
+        super()._record(tool_name, hit)
+        counter_name = "hits" if hit else "misses"
+        self.redis.hincrby(self._stats_key, f"{tool_name}:{counter_name}")
+
+    def _get(self, key: str) -> Optional[bytes]:
+        value = self.redis.get(self._value_key(key))
+        if value is not None:
+            self.redis.zadd(self._lru_key, {key: time.time()})
+        return value
+
+    def _set(self, key: str, value: bytes) -> None:
+        previous_size = self.redis.strlen(self._value_key(key))
+        pipeline = self.redis.pipeline()
+        pipeline.set(self._value_key(key), value)
+        pipeline.zadd(self._lru_key, {key: time.time()})
+        pipeline.incrby(self._bytes_key, len(value) - previous_size)
+        pipeline.execute()
+
+    def _evict(self) -> None:
+        while int(self.redis.get(self._bytes_key) or 0) > self.max_bytes:
+            oldest = self.redis.zpopmin(self._lru_key)
+            if not oldest:
+                break
+            ((key, _),) = oldest
+            key = key.decode() if isinstance(key, bytes) else key
+            size = self.redis.strlen(self._value_key(key))
+            pipeline = self.redis.pipeline()
+            pipeline.delete(self._value_key(key))
+            pipeline.decrby(self._bytes_key, size)
+            pipeline.execute()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """The number of hits and misses for each tool, across all workers."""
+        tool_stats: Dict[str, Dict[str, int]] = {}
+        for field, count in self.redis.hgetall(self._stats_key).items():
+            field = field.decode() if isinstance(field, bytes) else field
+            tool_name, _, counter_name = field.rpartition(":")
+            tool_stats.setdefault(tool_name, {"hits": 0, "misses": 0})
+            tool_stats[tool_name][counter_name] = int(count)
+        return tool_stats
+
+
+_CONFIGURED_CACHE: Optional[ResultCache] = None
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Creates the result cache defined by the settings, None if it's disabled.
+
+    Set `RESULT_CACHE_BACKEND` to `disk` (which uses `RESULT_CACHE_PATH`) or
+    `redis` (which uses `RESULT_CACHE_REDIS_URL`) to enable the cache, and
+    `RESULT_CACHE_MAX_BYTES` to limit its size.
+    """
+    global _CONFIGURED_CACHE
+    if _CONFIGURED_CACHE is not None or not RESULT_CACHE_BACKEND:
+        return _CONFIGURED_CACHE
+    max_bytes = (
+        int(RESULT_CACHE_MAX_BYTES) if RESULT_CACHE_MAX_BYTES else DEFAULT_MAX_BYTES
+    )
+    if RESULT_CACHE_BACKEND == "disk":
+        assert (
+            RESULT_CACHE_PATH
+        ), "RESULT_CACHE_PATH is not defined, check you `.env` file"
+        _CONFIGURED_CACHE = DiskResultCache(RESULT_CACHE_PATH, max_bytes=max_bytes)
+    elif RESULT_CACHE_BACKEND == "redis":
+        import redis
+
+        _CONFIGURED_CACHE = RedisResultCache(
+            redis.Redis.from_url(RESULT_CACHE_REDIS_URL or "redis://redis:6379"),
+            max_bytes=max_bytes,
+        )
+    else:
+        raise ValueError(
+            f"Unknown RESULT_CACHE_BACKEND `{RESULT_CACHE_BACKEND}`, "
+            "expected `disk` or `redis`."
+        )
+    return _CONFIGURED_CACHE
@@ -8,3 +8,16 @@ AGGRESCAN3D_SCRIPT_PATH = os.getenv("AGGRESCAN3D_SCRIPT_PATH")
 MAX_RUN_TIME = os.getenv("MAX_RUN_TIME")
 HEADLESS_DESTRESS_WORKERS = os.getenv("HEADLESS_DESTRESS_WORKERS")
 HEADLESS_DESTRESS_BATCH_SIZE = os.getenv("HEADLESS_DESTRESS_BATCH_SIZE")
+ANALYSIS_WORKERS = os.getenv("ANALYSIS_WORKERS")
+EVOEF2_COPROCESS = os.getenv("EVOEF2_COPROCESS")
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND")
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH")
+RESULT_CACHE_MAX_BYTES = os.getenv("RESULT_CACHE_MAX_BYTES")
+RESULT_CACHE_REDIS_URL = os.getenv("RESULT_CACHE_REDIS_URL")
+ROSETTA_BATCH_SIZE = os.getenv("ROSETTA_BATCH_SIZE")
+AGGRESCAN3D_COPROCESS = os.getenv("AGGRESCAN3D_COPROCESS")
+DSSP_IN_PROCESS = os.getenv("DSSP_IN_PROCESS")
+COST_MODEL_PATH = os.getenv("COST_MODEL_PATH")
+SCRATCH_DIR = os.getenv("SCRATCH_DIR")
+LOG_POLICY = os.getenv("LOG_POLICY")
+LOG_MAX_BYTES = os.getenv("LOG_MAX_BYTES")
@@ -0,0 +1,895 @@
+"""Structure-of-arrays view of an assembly for the in-process metrics.
+
+Walking the ampal object graph means a Python attribute lookup for every atom
+or monomer, and each metric used to walk it again. Here the assembly is walked
+once and the atoms and monomers are stored in NumPy arrays, which the metrics
+in this module then work on without touching the ampal objects. Nothing is
+written to the tags of the assembly.
+"""
+from dataclasses import dataclass
+import itertools
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import ampal
+from ampal.amino_acids import standard_amino_acids
+import numpy as np
+
+# Offsets to half of the neighbouring cells, every pair of neighbouring cells
+# is visited once when these are combined with the cell itself
+_HALF_NEIGHBOUR_OFFSETS: List[Tuple[int, int, int]] = [
+    offset
+    for offset in itertools.product((-1, 0, 1), repeat=3)
+    if offset > (0, 0, 0)
+]
+
+
+@dataclass(eq=False)
+class AssemblyArrays:
+    """The atoms and monomers of an assembly as NumPy arrays.
+
+    The atoms are stored in the order of `assembly.get_atoms()` and the
+    monomers in the order of `assembly.get_monomers()`, so ligands are
+    included but alternate states are not.
+
+    Attributes
+    ----------
+    coordinates: np.ndarray
+        Array of shape (N, 3) with the coordinates of the atoms.
+    elements: np.ndarray
+        The element of each atom.
+    atom_names: np.ndarray
+        The name of each atom, e.g. "CA".
+    residue_index: np.ndarray
+        The index of the monomer that each atom belongs to.
+    chain_index: np.ndarray
+        The index of the chain that each atom belongs to.
+    chain_ids: List[str]
+        The ID of each chain.
+    monomer_ids: np.ndarray
+        The ID of each monomer, i.e. the residue number and insertion code.
+    monomer_chain_index: np.ndarray
+        The index of the chain that each monomer belongs to.
+    mol_codes: np.ndarray
+        The three letter code of each monomer.
+    mol_letters: np.ndarray
+        The one letter code of each monomer.
+    is_hetero: np.ndarray
+        Whether each monomer was read from HETATM records.
+    is_residue: np.ndarray
+        Whether each monomer is an `ampal.Residue`, rather than a ligand.
+    """
+
+    coordinates: np.ndarray
+    elements: np.ndarray
+    atom_names: np.ndarray
+    residue_index: np.ndarray
+    chain_index: np.ndarray
+    chain_ids: List[str]
+    monomer_ids: np.ndarray
+    monomer_chain_index: np.ndarray
+    mol_codes: np.ndarray
+    mol_letters: np.ndarray
+    is_hetero: np.ndarray
+    is_residue: np.ndarray
+
+    @classmethod
+    def from_assembly(cls, assembly: ampal.Assembly) -> "AssemblyArrays":
+        """Walks the assembly once to create the arrays."""
+        chain_numbers: Dict[str, int] = {}
+        coordinates = []
+        elements = []
+        atom_names = []
+        residue_index = []
+        monomer_ids = []
+        monomer_chain_index = []
+        mol_codes = []
+        mol_letters = []
+        is_hetero = []
+        is_residue = []
+        for (monomer_number, monomer) in enumerate(assembly.get_monomers()):
+            chain_number = chain_numbers.setdefault(
+                monomer.parent.id, len(chain_numbers)
+            )
+            atoms = list(monomer.get_atoms())
+            coordinates.extend(atom._vector for atom in atoms)
+            elements.extend(atom.element for atom in atoms)
+            atom_names.extend(atom.res_label for atom in atoms)
+            residue_index.extend([monomer_number] * len(atoms))
+            monomer_ids.append(monomer.id)
+            monomer_chain_index.append(chain_number)
+            mol_codes.append(monomer.mol_code)
+            mol_letters.append(getattr(monomer, "mol_letter", "X"))
+            is_hetero.append(monomer.is_hetero)
+            is_residue.append(isinstance(monomer, ampal.Residue))
+        residue_index_array = np.array(residue_index, dtype=int)
+        monomer_chain_index_array = np.array(monomer_chain_index, dtype=int)
+        return cls(
+            coordinates=np.array(coordinates, dtype=float).reshape(-1, 3),
+            elements=np.array(elements, dtype=str),
+            atom_names=np.array(atom_names, dtype=str),
+            residue_index=residue_index_array,
+            chain_index=monomer_chain_index_array[residue_index_array],
+            chain_ids=list(chain_numbers),
+            monomer_ids=np.array(monomer_ids, dtype=str),
+            monomer_chain_index=monomer_chain_index_array,
+            mol_codes=np.array(mol_codes, dtype=str),
+            mol_letters=np.array(mol_letters, dtype=str),
+            is_hetero=np.array(is_hetero, dtype=bool),
+            is_residue=np.array(is_residue, dtype=bool),
+        )
+
+    def monomer_atom_coordinates(self, atom_name: str) -> np.ndarray:
+        """Gets the coordinates of an atom in every monomer.
+
+        Parameters
+        ----------
+        atom_name: str
+            The name of the atom, e.g. "CA".
+
+        Returns
+        -------
+        coordinates: np.ndarray
+            Array of shape (M, 3) with the coordinates of the atom in each
+            monomer, which are NaN for monomers that do not contain it.
+        """
+        monomer_coordinates = np.full((len(self.monomer_ids), 3), np.nan)
+        atom_mask = self.atom_names == atom_name
+        monomer_coordinates[self.residue_index[atom_mask]] = self.coordinates[
+            atom_mask
+        ]
+        return monomer_coordinates
+
+    def monomer_labels(self) -> np.ndarray:
+        """Labels each monomer in the same way as `design_torsion_angles`.
+
+        The label is made from the `unique_id` of the monomer, the chain ID
+        followed by the monomer ID and the hetero flag, e.g. "A12" for a
+        standard residue or "A12H_MSE" for a selenomethionine.
+        """
+        hetero_flags = np.where(
+            self.is_hetero,
+            np.where(self.mol_codes == "HOH", "W", np.char.add("H_", self.mol_codes)),
+            " ",
+        )
+        chain_ids = np.array(self.chain_ids, dtype=str)[self.monomer_chain_index]
+        return np.char.strip(
+            np.char.add(np.char.add(chain_ids, self.monomer_ids), hetero_flags)
+        )
+
+
+def iter_close_pairs(
+    coordinates: np.ndarray, cutoff: float, block_size: int = 2 ** 20
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Finds every pair of points that are within a cutoff of each other.
+
+    Points are sorted into cubic cells with sides equal to the cutoff, so only
+    points in the same or neighbouring cells need to be compared. Rather than
+    looping over the cells, the candidate pairs for each of the neighbouring
+    cell offsets are created for all of the cells at once. The pairs are
+    yielded in blocks so that they never all need to be held in memory.
+
+    Parameters
+    ----------
+    coordinates: np.ndarray
+        Array of shape (N, 3) with the coordinates of the points.
+    cutoff: float
+        Points that are this distance apart or closer are paired.
+    block_size: int
+        Approximate number of candidate pairs that are compared at once.
+
+    Yields
+    ------
+    first: np.ndarray
+        The index of the first point in each pair.
+    second: np.ndarray
+        The index of the second point in each pair, every pair is only
+        yielded once.
+    distances: np.ndarray
+        The distance between the points of each pair.
+    """
+    if len(coordinates) < 2:
+        return
+    cells = np.floor((coordinates - coordinates.min(axis=0)) / cutoff).astype(int)
+    # The grid is padded by one cell on every side so that the offsets to the
+    # neighbouring cells never wrap around
+    grid_shape = cells.max(axis=0) + 3
+    cell_ids = np.ravel_multi_index((cells + 1).T, grid_shape)
+    # The cell itself is included with an offset of 0
+    offset_ids = [0] + [
+        int(np.ravel_multi_index(np.array(offset) + 1, grid_shape))
+        - int(np.ravel_multi_index((1, 1, 1), grid_shape))
+        for offset in _HALF_NEIGHBOUR_OFFSETS
+    ]
+
+    point_order = np.argsort(cell_ids, kind="stable")
+    sorted_cell_ids = cell_ids[point_order]
+    (occupied_cells, cell_starts, cell_sizes) = np.unique(
+        sorted_cell_ids, return_index=True, return_counts=True
+    )
+    chunk_size = max(1, block_size // int(cell_sizes.max()))
+    for chunk_start in range(0, len(point_order), chunk_size):
+        positions = np.arange(
+            chunk_start, min(chunk_start + chunk_size, len(point_order))
+        )
+        for offset_id in offset_ids:
+            neighbour_cells = sorted_cell_ids[positions] + offset_id
+            cell_numbers = np.minimum(
+                np.searchsorted(occupied_cells, neighbour_cells),
+                len(occupied_cells) - 1,
+            )
+            found = occupied_cells[cell_numbers] == neighbour_cells
+            first_positions = positions[found]
+            second_starts = cell_starts[cell_numbers[found]]
+            second_ends = second_starts + cell_sizes[cell_numbers[found]]
+            if offset_id == 0:
+                # Pairs within a cell are only made with the points after
+                # the first point, so that each pair is made once
+                second_starts = first_positions + 1
+            pair_counts = second_ends - second_starts
+            first = np.repeat(first_positions, pair_counts)
+            second = (
+                np.arange(pair_counts.sum())
+                - np.repeat(np.cumsum(pair_counts) - pair_counts, pair_counts)
+                + np.repeat(second_starts, pair_counts)
+            )
+            (first, second) = (point_order[first], point_order[second])
+            deltas = coordinates[first] - coordinates[second]
+            distances = np.sqrt((deltas * deltas).sum(axis=1))
+            close = distances <= cutoff
+            yield first[close], second[close], distances[close]
+
+
+# {{{ Hydrophobic Fitness
+
+HYDROPHOBIC = ["C", "F", "I", "L", "M", "V", "W"]
+
+
+def calculate_hydrophobic_fitness(arrays: AssemblyArrays) -> Optional[float]:
+    """Calculates the hydrophobic fitness of a protein.
+
+    This is a vectorised version of
+    `isambard.evaluation.calculate_hydrophobic_fitness`, see its documentation
+    for a description of the method. Side chain centroids are placed 3 Å from
+    the CA along the CA-CB vector, or on the CA if there is no CB. Residues
+    without a CA are ignored.
+
+    Parameters
+    ----------
+    arrays: AssemblyArrays
+        The assembly to be scored.
+
+    Returns
+    -------
+    hydrophobic_fitness: Optional[float]
+        The hydrophobic fitness score, or None if the assembly doesn't contain
+        any hydrophobic residues.
+    """
+    is_hydrophobic = np.isin(arrays.mol_letters, HYDROPHOBIC)
+    is_tyrosine = arrays.mol_letters == "Y"
+    is_standard = np.isin(arrays.mol_letters, list(standard_amino_acids))
+    ca_coordinates = arrays.monomer_atom_coordinates("CA")
+    scored = arrays.is_residue & is_standard & ~np.isnan(ca_coordinates[:, 0])
+
+    cb_coordinates = arrays.monomer_atom_coordinates("CB")[scored]
+    ca_coordinates = ca_coordinates[scored]
+    has_cb = ~np.isnan(cb_coordinates[:, 0])
+    cb_vectors = cb_coordinates[has_cb] - ca_coordinates[has_cb]
+    centroids = ca_coordinates.copy()
+    centroids[has_cb] += (
+        3.0 * cb_vectors / np.linalg.norm(cb_vectors, axis=1)[:, np.newaxis]
+    )
+    is_hydrophobic = is_hydrophobic[scored]
+    # Tyrosine counts as a hydrophobic contact, but is not a reference residue
+    is_apolar = is_hydrophobic | is_tyrosine[scored]
+    number_of_apolar = int(is_apolar.sum())
+    if number_of_apolar == 0:
+        return None
+
+    # Residues that are adjacent in the sequence are not counted as contacts.
+    # The residue numbers are offset so that keys from different chains are
+    # never adjacent.
+    residue_numbers = np.array([int(i) for i in arrays.monomer_ids[scored]])
+    residue_numbers -= residue_numbers.min() - 1
+    residue_keys = (
+        arrays.monomer_chain_index[scored] * (residue_numbers.max() + 2)
+        + residue_numbers
+    )
+    (unique_keys, key_counts) = np.unique(residue_keys, return_counts=True)
+    (unique_apolar_keys, apolar_key_counts) = np.unique(
+        residue_keys[is_apolar], return_counts=True
+    )
+    all_neighbours = np.zeros(len(residue_keys), dtype=int)
+    apolar_neighbours = np.zeros(len(residue_keys), dtype=int)
+    for adjacent_keys in (residue_keys - 1, residue_keys + 1):
+        all_neighbours += _count_keys(adjacent_keys, unique_keys, key_counts)
+        apolar_neighbours += _count_keys(
+            adjacent_keys, unique_apolar_keys, apolar_key_counts
+        )
+
+    number_of_centroids = len(centroids)
+    close_pairs = list(iter_close_pairs(centroids, 10.0))
+    # Each pair is counted for both of its residues
+    pairs = np.concatenate([p[0] for p in close_pairs] + [p[1] for p in close_pairs])
+    partners = np.concatenate(
+        [p[1] for p in close_pairs] + [p[0] for p in close_pairs]
+    )
+    in_7_3 = np.concatenate([p[2] for p in close_pairs] * 2) <= 7.3
+    centroids_in_10 = np.bincount(pairs, minlength=number_of_centroids)
+    centroids_in_7_3 = np.bincount(pairs[in_7_3], minlength=number_of_centroids)
+    apolar_in_7_3 = np.bincount(
+        pairs[in_7_3 & is_apolar[partners]], minlength=number_of_centroids
+    )
+
+    contacts = (centroids_in_7_3 - all_neighbours)[is_hydrophobic]
+    apolar_contacts = (apolar_in_7_3 - apolar_neighbours)[is_hydrophobic]
+    available_apolar = (number_of_apolar - apolar_neighbours)[is_hydrophobic]
+    available = (number_of_centroids - all_neighbours)[is_hydrophobic]
+    expected_apolar_contacts = contacts * (available_apolar / available)
+    hydrophobic_term = (apolar_contacts - expected_apolar_contacts).sum()
+    burial_term = centroids_in_10[is_hydrophobic].sum()
+    return float(-1 * (burial_term * hydrophobic_term) / (number_of_apolar ** 2))
+
+
+def _count_keys(
+    keys: np.ndarray, unique_keys: np.ndarray, key_counts: np.ndarray
+) -> np.ndarray:
+    positions = np.minimum(np.searchsorted(unique_keys, keys), len(unique_keys) - 1)
+    return np.where(unique_keys[positions] == keys, key_counts[positions], 0)
+
+
+# }}}
+# {{{ Packing Density
+
+
+def calculate_packing_density(
+    arrays: AssemblyArrays, radius: float = 7.0
+) -> np.ndarray:
+    """Calculates the packing density of each non-hydrogen atom.
+
+    This gives the same values as `isambard.evaluation.tag_packing_density`,
+    the atomic contact number of each atom, which is the number of other
+    non-hydrogen atoms that are closer than `radius`. The neighbours are found
+    with a cell list rather than by comparing every pair of atoms, and the
+    values are returned rather than being written to the atom tags.
+
+    Parameters
+    ----------
+    arrays: AssemblyArrays
+        The assembly to be analysed.
+    radius: float
+        Atoms that are closer than this distance are counted as contacts.
+
+    Returns
+    -------
+    packing_density: np.ndarray
+        The packing density of each atom, in the order of `arrays.coordinates`.
+        This is NaN for hydrogen atoms.
+    """
+    heavy_atoms = np.flatnonzero(arrays.elements != "H")
+    contact_numbers = np.zeros(len(heavy_atoms), dtype=int)
+    for (first, second, distances) in iter_close_pairs(
+        arrays.coordinates[heavy_atoms], radius
+    ):
+        in_contact = distances < radius
+        contact_numbers += np.bincount(
+            first[in_contact], minlength=len(heavy_atoms)
+        ) + np.bincount(second[in_contact], minlength=len(heavy_atoms))
+    packing_density = np.full(len(arrays.coordinates), np.nan)
+    packing_density[heavy_atoms] = contact_numbers
+    return packing_density
+
+
+def residue_packing_density(
+    arrays: AssemblyArrays, packing_density: np.ndarray
+) -> np.ndarray:
+    """Averages the packing density of the atoms in each monomer.
+
+    Parameters
+    ----------
+    arrays: AssemblyArrays
+        The assembly that was analysed.
+    packing_density: np.ndarray
+        The packing density of each atom from `calculate_packing_density`.
+
+    Returns
+    -------
+    residue_packing_density: np.ndarray
+        The mean packing density of the non-hydrogen atoms in each monomer,
+        in the order of `arrays.monomer_ids`. This is NaN for monomers that
+        only contain hydrogen atoms.
+    """
+    heavy_atoms = ~np.isnan(packing_density)
+    number_of_monomers = len(arrays.monomer_ids)
+    density_sums = np.bincount(
+        arrays.residue_index[heavy_atoms],
+        weights=packing_density[heavy_atoms],
+        minlength=number_of_monomers,
+    )
+    atom_counts = np.bincount(
+        arrays.residue_index[heavy_atoms], minlength=number_of_monomers
+    )
+    with np.errstate(invalid="ignore"):
+        return density_sums / atom_counts
+
+
+# }}}
+# {{{ Torsion Angles
+
+# The tolerance that is used by `ampal.geometry`
+SMALL_NUMBER = 1e-7
+
+
+def _dot(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return a[:, 0] * b[:, 0] + a[:, 1] * b[:, 1] + a[:, 2] * b[:, 2]
+
+
+def _cos_angle(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cos_angle = _dot(a, b) / (np.sqrt(_dot(a, a)) * np.sqrt(_dot(b, b)))
+    return np.clip(cos_angle, -1.0, 1.0)
+
+
+def dihedrals(
+    a: np.ndarray, b: np.ndarray, c: np.ndarray, d: np.ndarray
+) -> np.ndarray:
+    """Calculates the dihedral angles defined by arrays of four points.
+
+    This gives the same values as `ampal.geometry.dihedral`, including 0 for
+    collinear points, for every row of the arrays at once.
+
+    Parameters
+    ----------
+    a, b, c, d: np.ndarray
+        Arrays of shape (K, 3) with the coordinates of the points.
+
+    Returns
+    -------
+    dihedrals: np.ndarray
+        The dihedral angles in degrees, which are NaN if any of the points is
+        NaN.
+    """
+    p = b - a
+    q = c - b
+    r = d - c
+    n1 = np.cross(p, q)
+    n2 = np.cross(q, r)
+    n3 = np.cross(n1, n2)
+    angles = (np.arccos(_cos_angle(n1, n2)) / np.pi) * 180.0
+    # The sign is negative if n1 x n2 points against the central bond
+    negative = (
+        (np.sqrt(_dot(q, q)) >= SMALL_NUMBER)
+        & (np.sqrt(_dot(n3, n3)) >= SMALL_NUMBER)
+        & (np.arccos(_cos_angle(q, n3)) > SMALL_NUMBER)
+    )
+    angles[negative] *= -1
+    collinear = (np.sqrt(_dot(n1, n1)) < SMALL_NUMBER) | (
+        np.sqrt(_dot(n2, n2)) < SMALL_NUMBER
+    )
+    angles[collinear] = 0.0
+    return angles
+
+
+def calculate_torsion_angles(arrays: AssemblyArrays) -> np.ndarray:
+    """Calculates the backbone torsion angles of every residue.
+
+    The angles are the same as those from `ampal.Assembly.tag_torsion_angles`,
+    but are calculated for all of the residues at once and are not written to
+    the tags. Only consecutive residues in the same chain are joined, so the
+    first residue of each chain has no omega or phi and the last has no psi.
+
+    Parameters
+    ----------
+    arrays: AssemblyArrays
+        The assembly to be analysed.
+
+    Returns
+    -------
+    torsion_angles: np.ndarray
+        Array of shape (M, 3) with the omega, phi and psi angles of each
+        monomer in degrees. Angles are NaN if they are not defined, a backbone
+        atom is missing or the monomer is not a residue.
+    """
+    torsion_angles = np.full((len(arrays.monomer_ids), 3), np.nan)
+    residues = np.flatnonzero(arrays.is_residue)
+    if len(residues) < 2:
+        return torsion_angles
+    (n, ca, c) = (
+        arrays.monomer_atom_coordinates(atom_name)[residues]
+        for atom_name in ("N", "CA", "C")
+    )
+    # Bonds between each residue and the next one
+    chain_index = arrays.monomer_chain_index[residues]
+    joined = chain_index[:-1] == chain_index[1:]
+    (previous, following) = (residues[:-1][joined], residues[1:][joined])
+    (first, second) = (np.flatnonzero(joined), np.flatnonzero(joined) + 1)
+    torsion_angles[following, 0] = dihedrals(
+        ca[first], c[first], n[second], ca[second]
+    )
+    torsion_angles[following, 1] = dihedrals(
+        c[first], n[second], ca[second], c[second]
+    )
+    torsion_angles[previous, 2] = dihedrals(n[first], ca[first], c[first], n[second])
+    return torsion_angles
+
+
+def torsion_angle_dict(
+    arrays: AssemblyArrays, torsion_angles: np.ndarray
+) -> Dict[str, Tuple[float, float, float]]:
+    """Converts the torsion angles into the form used by `DesignMetrics`.
+
+    Parameters
+    ----------
+    arrays: AssemblyArrays
+        The assembly that was analysed.
+    torsion_angles: np.ndarray
+        The angles from `calculate_torsion_angles`.
+
+    Returns
+    -------
+    torsion_angles: Dict[str, Tuple[float, float, float]]
+        The omega, phi and psi angles keyed by the label of the residue, see
+        `AssemblyArrays.monomer_labels`. As before, residues are left out if
+        any of their angles are undefined or exactly 0.
+    """
+    complete = np.all(~np.isnan(torsion_angles) & (torsion_angles != 0), axis=1)
+    return dict(
+        zip(
+            arrays.monomer_labels()[complete].tolist(),
+            map(tuple, torsion_angles[complete].tolist()),
+        )
+    )
+
+
+# }}}
+# {{{ Secondary Structure
+
+# Constants of the DSSP hydrogen bond energy model, which are the same as those
+# used by `mkdssp`
+DSSP_COUPLING_CONSTANT = -27.888
+DSSP_MIN_HBOND_ENERGY = -9.9
+DSSP_MAX_HBOND_ENERGY = -0.5
+DSSP_MIN_DISTANCE = 0.5
+DSSP_MIN_CA_DISTANCE = 9.0
+DSSP_MAX_PEPTIDE_BOND_LENGTH = 2.5
+
+
+@dataclass
+class _Ladder:
+    parallel: bool
+    i: List[int]
+    j: List[int]
+
+
+def assign_secondary_structure(arrays: AssemblyArrays) -> np.ndarray:
+    """Assigns the DSSP secondary structure of every residue.
+
+    This follows the method used by `mkdssp` (Kabsch and Sander, 1983), which
+    `isambard.evaluation.tag_dssp_data` runs on a PDB file. The hydrogen bond
+    energies are calculated for every residue pair with CAs closer than 9 Å at
+    once, and the bridges, ladders, helices, turns and bends are then found
+    from the hydrogen bonds in the same way as `mkdssp`. Residues that don't
+    have all of N, CA, C and O are skipped, as they are by `mkdssp`.
+
+    Parameters
+    ----------
+    arrays: AssemblyArrays
+        The assembly to be analysed.
+
+    Returns
+    -------
+    secondary_structure: np.ndarray
+        The 8-state DSSP code of each monomer, one of "H", "B", "E", "G", "I",
+        "T", "S" or " " for a loop, in the order of `arrays.monomer_ids`. This
+        is " " for monomers that are not residues or have an incomplete
+        backbone.
+    """
+    secondary_structure = np.full(len(arrays.monomer_ids), " ")
+    backbone = [
+        arrays.monomer_atom_coordinates(atom_name)
+        for atom_name in ("N", "CA", "C", "O")
+    ]
+    complete = arrays.is_residue & np.all(
+        [~np.isnan(coordinates[:, 0]) for coordinates in backbone], axis=0
+    )
+    residues = np.flatnonzero(complete)
+    if len(residues) == 0:
+        return secondary_structure
+    (n, ca, c, o) = (coordinates[residues] for coordinates in backbone)
+    is_proline = arrays.mol_codes[residues] == "PRO"
+
+    # Residues are in the same segment if there is no chain break between
+    # them, either a new chain or a peptide bond that is too long
+    chain_index = arrays.monomer_chain_index[residues]
+    same_chain = chain_index[:-1] == chain_index[1:]
+    peptide_bonds = n[1:] - c[:-1]
+    bonded = np.sqrt(_dot(peptide_bonds, peptide_bonds)) <= (
+        DSSP_MAX_PEPTIDE_BOND_LENGTH
+    )
+    segments = np.concatenate([[0], np.cumsum(~(same_chain & bonded))])
+
+    # The amide hydrogen is placed 1 Å from the N, opposite the carbonyl of the
+    # previous residue in the chain
+    hydrogens = n.copy()
+    has_previous = same_chain & ~is_proline[1:]
+    carbonyls = c[:-1][has_previous] - o[:-1][has_previous]
+    hydrogens[1:][has_previous] += (
+        carbonyls / np.sqrt(_dot(carbonyls, carbonyls))[:, np.newaxis]
+    )
+
+    acceptors = _dssp_hydrogen_bonds(n, ca, c, o, hydrogens, is_proline)
+    codes = np.full(len(residues), " ")
+    _assign_strands(acceptors, segments, arrays, residues, codes)
+    _assign_helices(acceptors, segments, ca, codes)
+    secondary_structure[residues] = codes
+    return secondary_structure
+
+
+def _dssp_hydrogen_bonds(
+    n: np.ndarray,
+    ca: np.ndarray,
+    c: np.ndarray,
+    o: np.ndarray,
+    hydrogens: np.ndarray,
+    is_proline: np.ndarray,
+) -> np.ndarray:
+    """Finds the two strongest hydrogen bonds made by the NH of each residue.
+
+    Returns an array of shape (R, 2) with the acceptor of each bond, which is
+    -1 if there is no bond.
+    """
+    # `mkdssp` only tests residues with CAs that are closer than the cutoff
+    cutoff = DSSP_MIN_CA_DISTANCE
+    close_pairs = [
+        (first[distances < cutoff], second[distances < cutoff])
+        for (first, second, distances) in iter_close_pairs(ca, cutoff)
+    ]
+    first = np.concatenate([np.empty(0, dtype=int)] + [p[0] for p in close_pairs])
+    second = np.concatenate([np.empty(0, dtype=int)] + [p[1] for p in close_pairs])
+    (first, second) = (np.minimum(first, second), np.maximum(first, second))
+    # Like `mkdssp`, a residue is not tested as a donor to the residue before it
+    not_adjacent = second != first + 1
+    donors = np.concatenate([first, second[not_adjacent]])
+    acceptors = np.concatenate([second, first[not_adjacent]])
+    tested = ~is_proline[donors]
+    (donors, acceptors) = (donors[tested], acceptors[tested])
+
+    distances = [
+        np.sqrt(_dot(delta, delta))
+        for delta in (
+            hydrogens[donors] - o[acceptors],
+            hydrogens[donors] - c[acceptors],
+            n[donors] - c[acceptors],
+            n[donors] - o[acceptors],
+        )
+    ]
+    (distance_ho, distance_hc, distance_nc, distance_no) = distances
+    with np.errstate(divide="ignore"):
+        energies = (
+            DSSP_COUPLING_CONSTANT / distance_ho
+            - DSSP_COUPLING_CONSTANT / distance_hc
+            + DSSP_COUPLING_CONSTANT / distance_nc
+            - DSSP_COUPLING_CONSTANT / distance_no
+        )
+    energies[np.min(distances, axis=0) < DSSP_MIN_DISTANCE] = DSSP_MIN_HBOND_ENERGY
+    # `mkdssp` rounds the energies to 3 decimal places, half away from zero
+    energies = np.sign(energies) * np.floor(np.abs(energies) * 1000 + 0.5) / 1000
+    energies = np.maximum(energies, DSSP_MIN_HBOND_ENERGY)
+
+    bonded = energies < DSSP_MAX_HBOND_ENERGY
+    (donors, acceptors, energies) = (
+        donors[bonded],
+        acceptors[bonded],
+        energies[bonded],
+    )
+    # Ties are won by the acceptor that comes first, as `mkdssp` tests them in
+    # that order
+    order = np.lexsort((acceptors, energies, donors))
+    (donors, acceptors) = (donors[order], acceptors[order])
+    ranks = np.arange(len(donors)) - np.searchsorted(donors, donors)
+    strongest = ranks < 2
+    acceptor_table = np.full((len(n), 2), -1)
+    acceptor_table[donors[strongest], ranks[strongest]] = acceptors[strongest]
+    return acceptor_table
+
+
+def _test_bonds(
+    acceptors: np.ndarray, donors: np.ndarray, acceptor: np.ndarray
+) -> np.ndarray:
+    return (acceptors[donors, 0] == acceptor) | (acceptors[donors, 1] == acceptor)
+
+
+def _assign_strands(
+    acceptors: np.ndarray,
+    segments: np.ndarray,
+    arrays: AssemblyArrays,
+    residues: np.ndarray,
+    codes: np.ndarray,
+) -> None:
+    """Finds the bridges and ladders and marks them as "B" or "E" in `codes`."""
+    number_of_residues = len(codes)
+    (donors, ranks) = np.nonzero(acceptors >= 0)
+    bonded = acceptors[donors, ranks]
+    # Every bridge contains a hydrogen bond between one of these pairs of
+    # residues, so only these pairs need to be tested
+    candidates = np.concatenate(
+        [
+            np.sort([donors + d, bonded + b], axis=0)
+            for (d, b) in ((-1, 0), (0, 1), (-1, 1), (0, 0))
+        ],
+        axis=1,
+    )
+    (i, j) = candidates[
+        :,
+        (candidates[0] >= 1)
+        & (candidates[0] + 4 < number_of_residues)
+        & (candidates[1] >= candidates[0] + 3)
+        & (candidates[1] + 1 < number_of_residues),
+    ]
+    pair_keys = np.unique(i * number_of_residues + j)
+    (i, j) = (pair_keys // number_of_residues, pair_keys % number_of_residues)
+
+    (a, b, c, d, e, f) = (i - 1, i, i + 1, j - 1, j, j + 1)
+    unbroken = (segments[a] == segments[c]) & (segments[d] == segments[f])
+    parallel = (_test_bonds(acceptors, c, e) & _test_bonds(acceptors, e, a)) | (
+        _test_bonds(acceptors, f, b) & _test_bonds(acceptors, b, d)
+    )
+    antiparallel = (_test_bonds(acceptors, c, d) & _test_bonds(acceptors, f, a)) | (
+        _test_bonds(acceptors, e, b) & _test_bonds(acceptors, b, e)
+    )
+    is_bridge = unbroken & (parallel | antiparallel)
+
+    # Consecutive bridges are joined into ladders
+    ladders: List[_Ladder] = []
+    ladder_ends: Dict[Tuple[bool, int, int], _Ladder] = {}
+    for (bridge_i, bridge_j, bridge_parallel) in zip(
+        i[is_bridge].tolist(),
+        j[is_bridge].tolist(),
+        parallel[is_bridge].tolist(),
+    ):
+        previous_j = bridge_j - 1 if bridge_parallel else bridge_j + 1
+        ladder = ladder_ends.pop((bridge_parallel, bridge_i - 1, previous_j), None)
+        if ladder is None:
+            ladder = _Ladder(bridge_parallel, [bridge_i], [bridge_j])
+            ladders.append(ladder)
+        else:
+            ladder.i.append(bridge_i)
+            if bridge_parallel:
+                ladder.j.append(bridge_j)
+            else:
+                ladder.j.insert(0, bridge_j)
+        ladder_ends[(bridge_parallel, bridge_i, bridge_j)] = ladder
+
+    # Ladders that are separated by a bulge are joined, the differences are
+    # unsigned in `mkdssp` so negative differences are never small
+    def _below(difference: int, limit: int) -> bool:
+        return 0 <= difference < limit
+
+    chain_ids = [arrays.chain_ids[k] for k in arrays.monomer_chain_index[residues]]
+    ladders.sort(key=lambda ladder: (chain_ids[ladder.i[0]], ladder.i[0]))
+    ladder_number = 0
+    while ladder_number < len(ladders):
+        first = ladders[ladder_number]
+        other_number = ladder_number + 1
+        while other_number < len(ladders):
+            other = ladders[other_number]
+            (ibi, iei, jbi, jei) = (first.i[0], first.i[-1], first.j[0], first.j[-1])
+            (ibj, iej, jbj, jej) = (other.i[0], other.i[-1], other.j[0], other.j[-1])
+            if (
+                first.parallel != other.parallel
+                or segments[min(ibi, ibj)] != segments[max(iei, iej)]
+                or segments[min(jbi, jbj)] != segments[max(jei, jej)]
+                or not _below(ibj - iei, 6)
+                or (iei >= ibj and ibi <= iej)
+            ):
+                other_number += 1
+                continue
+            if first.parallel:
+                bulge = (
+                    _below(jbj - jei, 6) and _below(ibj - iei, 3)
+                ) or _below(jbj - jei, 3)
+            else:
+                bulge = (
+                    _below(jbi - jej, 6) and _below(ibj - iei, 3)
+                ) or _below(jbi - jej, 3)
+            if not bulge:
+                other_number += 1
+                continue
+            first.i.extend(other.i)
+            if first.parallel:
+                first.j.extend(other.j)
+            else:
+                first.j[:0] = other.j
+            del ladders[other_number]
+        ladder_number += 1
+
+    for ladder in ladders:
+        code = "E" if len(ladder.i) > 1 else "B"
+        for (start, end) in ((ladder.i[0], ladder.i[-1]), (ladder.j[0], ladder.j[-1])):
+            ladder_codes = codes[start : end + 1]
+            ladder_codes[ladder_codes != "E"] = code
+
+
+def _assign_helices(
+    acceptors: np.ndarray, segments: np.ndarray, ca: np.ndarray, codes: np.ndarray
+) -> None:
+    """Finds the helices, turns and bends and marks them in `codes`."""
+    number_of_residues = len(codes)
+    # A residue starts a turn of a given stride if the residue that stride
+    # along the chain donates a hydrogen bond to it
+    turn_starts = {}
+    for stride in (3, 4, 5):
+        starts = np.zeros(number_of_residues, dtype=bool)
+        start = np.arange(max(number_of_residues - stride, 0))
+        starts[start] = (segments[start] == segments[start + stride]) & _test_bonds(
+            acceptors, start + stride, start
+        )
+        turn_starts[stride] = starts
+
+    # Helices are made by two consecutive turns, alpha helices are assigned
+    # first, then 3-10 helices that don't overlap them and finally pi helices,
+    # which are preferred over alpha helices
+    for (stride, code, replaceable) in (
+        (4, "H", None),
+        (3, "G", (" ", "G")),
+        (5, "I", (" ", "I", "H")),
+    ):
+        starts = turn_starts[stride]
+        end = max(number_of_residues - stride, 1)
+        helix_starts = np.flatnonzero(starts[1:end] & starts[: end - 1]) + 1
+        helix_residues = helix_starts[:, np.newaxis] + np.arange(stride)
+        if replaceable is not None:
+            empty = np.all(np.isin(codes[helix_residues], replaceable), axis=1)
+            helix_residues = helix_residues[empty]
+        codes[helix_residues.ravel()] = code
+
+    in_turn = np.zeros(number_of_residues, dtype=bool)
+    for (stride, starts) in turn_starts.items():
+        for k in range(1, stride):
+            in_turn[k:] |= starts[: max(number_of_residues - k, 0)]
+    is_bend = np.zeros(number_of_residues, dtype=bool)
+    if number_of_residues > 4:
+        middle = np.arange(2, number_of_residues - 2)
+        kappa = np.degrees(
+            np.arccos(
+                _cos_angle(ca[middle] - ca[middle - 2], ca[middle + 2] - ca[middle])
+            )
+        )
+        is_bend[middle] = (segments[middle - 2] == segments[middle + 2]) & (
+            kappa > 70.0
+        )
+    is_loop = codes == " "
+    # The first and last residues are never turns or bends
+    is_loop[[0, -1]] = False
+    codes[is_loop & in_turn] = "T"
+    codes[is_loop & ~in_turn & is_bend] = "S"
+
+
+def chain_secondary_structure(
+    arrays: AssemblyArrays, secondary_structure: np.ndarray
+) -> Dict[str, str]:
+    """Joins the secondary structure of the residues in each chain.
+
+    Parameters
+    ----------
+    arrays: AssemblyArrays
+        The assembly that was analysed.
+    secondary_structure: np.ndarray
+        The codes from `assign_secondary_structure`.
+
+    Returns
+    -------
+    chain_secondary_structure: Dict[str, str]
+        The DSSP assignment of the residues in each chain, in the same form as
+        `SequenceInfo.dssp_assignment`, keyed by the chain ID.
+    """
+    return {
+        chain_id: "".join(
+            secondary_structure[
+                arrays.is_residue & (arrays.monomer_chain_index == chain_number)
+            ].tolist()
+        )
+        for (chain_number, chain_id) in enumerate(arrays.chain_ids)
+    }
+
+
+# }}}
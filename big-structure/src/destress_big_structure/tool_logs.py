@@ -0,0 +1,117 @@
+"""Log policy for the stdout and stderr of the analysis tools.
+
+The `log_info` and `error_info` of the EvoEF2, DFIRE2, Rosetta and Aggrescan3D
+outputs are most of the size of their database tables, and of the metrics that
+are sent back through RQ and the websocket. `apply_log_policy` is used by the
+tool wrappers to shrink these logs according to the settings:
+
+* `LOG_POLICY` is `full` (the default) to keep every log, or `on_error` to only
+  keep the logs of runs that have a non-zero return code.
+* `LOG_MAX_BYTES` limits the size of each log that is kept, the end of the log
+  is kept as that is where errors are reported.
+
+When a log is truncated, the full logs are stored in the result cache (if it is
+enabled) and a note with the address of the `/logs/<log_key>` endpoint, which
+returns them, is added to the log. The logs of successful runs that are removed
+by the `on_error` policy are not stored.
+"""
+import json
+import re
+from typing import Any, Dict, Optional
+
+from destress_big_structure.result_cache import cache_key, get_result_cache
+from destress_big_structure.settings import LOG_MAX_BYTES, LOG_POLICY
+
+LOG_POLICIES = ("full", "on_error")
+LOG_POLICY = (LOG_POLICY or "full").lower()
+if LOG_POLICY not in LOG_POLICIES:
+    raise ValueError(
+        f"Unknown LOG_POLICY `{LOG_POLICY}`, expected one of: "
+        f"{', '.join(LOG_POLICIES)}."
+    )
+LOG_MAX_BYTES = int(LOG_MAX_BYTES) if LOG_MAX_BYTES else None
+LOG_FIELDS = ("log_info", "error_info")
+# The name the full logs are stored under in the result cache
+LOG_CACHE_NAME = "logs"
+LOG_KEY_PATTERN = re.compile(r"logs-[0-9a-f]{64}")
+
+
+def truncate_log(log: str, max_bytes: Optional[int]) -> str:
+    """Keeps the last `max_bytes` bytes of a log."""
+    log_bytes = log.encode()
+    if max_bytes is None or len(log_bytes) <= max_bytes:
+        return log
+    # A character that is cut in half is dropped
+    return log_bytes[len(log_bytes) - max_bytes :].decode(errors="ignore")
+
+
+def compact_logs(
+    logs: Dict[str, str], return_code: int, log_policy: str, max_bytes: Optional[int]
+) -> Dict[str, str]:
+    """Applies a log policy to the logs of a tool run."""
+    if log_policy == "on_error" and return_code == 0:
+        return {name: "" for name in logs}
+    return {name: truncate_log(log, max_bytes) for (name, log) in logs.items()}
+
+
+def apply_log_policy(tool_output: Any) -> Any:
+    """Shrinks the logs of a tool output in place according to the log policy.
+
+    Parameters
+    ----------
+    tool_output: Any
+        The output of a tool, which has `log_info`, `error_info` and
+        `return_code` fields.
+
+    Returns
+    -------
+    tool_output: Any
+        The same output, with the logs that were kept.
+    """
+    logs = {name: getattr(tool_output, name) for name in LOG_FIELDS}
+    kept_logs = compact_logs(logs, tool_output.return_code, LOG_POLICY, LOG_MAX_BYTES)
+    if kept_logs == logs:
+        return tool_output
+    if LOG_POLICY == "on_error" and tool_output.return_code == 0:
+        # The logs of successful runs are dropped rather than stored
+        for (name, log) in kept_logs.items():
+            setattr(tool_output, name, log)
+        return tool_output
+    log_key = store_full_logs(logs)
+    for (name, log) in logs.items():
+        if kept_logs[name] == log:
+            continue
+        removed_bytes = len(log.encode()) - len(kept_logs[name].encode())
+        if log_key is not None:
+            note = f"the full log is available from /logs/{log_key}"
+        else:
+            note = "the full log was not kept as the result cache is disabled"
+        kept_log = kept_logs[name]
+        if kept_log and not kept_log.endswith("\n"):
+            kept_log += "\n"
+        setattr(
+            tool_output,
+            name,
+            f"{kept_log}[{removed_bytes} bytes of this log were removed, {note}]",
+        )
+    return tool_output
+
+
+def store_full_logs(logs: Dict[str, str]) -> Optional[str]:
+    """Stores logs in the result cache and returns their key, if it's enabled."""
+    result_cache = get_result_cache()
+    if result_cache is None:
+        return None
+    logs_json = json.dumps(logs, sort_keys=True)
+    log_key = cache_key(logs_json, LOG_CACHE_NAME, "")
+    result_cache.set(log_key, logs_json)
+    return log_key
+
+
+def fetch_full_logs(log_key: str) -> Optional[Dict[str, str]]:
+    """Gets the full logs stored under a key, None if they are not available."""
+    result_cache = get_result_cache()
+    if result_cache is None or not LOG_KEY_PATTERN.fullmatch(log_key):
+        return None
+    logs_json = result_cache.get(LOG_CACHE_NAME, log_key)
+    return None if logs_json is None else json.loads(logs_json)
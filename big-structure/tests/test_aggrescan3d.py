@@ -6,7 +6,9 @@ import typing as t
 import graphene
 import re
 
+from destress_big_structure import analysis
 from destress_big_structure.analysis import run_aggrescan3d
+from destress_big_structure.coprocess import CoProcessPool
 from destress_big_structure.settings import AGGRESCAN3D_SCRIPT_PATH
 from destress_big_structure.elm_types import Aggrescan3DOutput
 from destress_big_structure.schema import Query
@@ -291,3 +293,68 @@ def test_check_run_aggrescan3D_executes():
     # are the same as the fields in the Aggrescan3DResults table
     # in the data base
     assert set(aggrescan3d_results.__dict__.keys()) & set(db_column_list)
+
+
+def test_aggrescan3d_coprocess_matches_subprocess(monkeypatch):
+    test_paths = [
+        pathlib.Path("tests/testing_files/1aac.pdb"),
+        pathlib.Path("tests/testing_files/1ubq.pdb"),
+    ]
+    pdb_strings = [test_path.read_text() for test_path in test_paths]
+    # Aggrescan3D fails on this, which shouldn't stop the co-process
+    pdb_strings.append("This is not a PDB file.\n")
+
+    monkeypatch.setattr(analysis, "AGGRESCAN3D_COPROCESS", False)
+    subprocess_results = [
+        run_aggrescan3d(
+            pdb_string=pdb_string, aggrescan3d_script_path=AGGRESCAN3D_SCRIPT_PATH
+        )
+        for pdb_string in pdb_strings
+    ]
+
+    # Each PDB file is analysed twice to check that the co-process is reused
+    monkeypatch.setattr(analysis, "AGGRESCAN3D_COPROCESS", True)
+    coprocess_results = [
+        run_aggrescan3d(
+            pdb_string=pdb_string, aggrescan3d_script_path=AGGRESCAN3D_SCRIPT_PATH
+        )
+        for pdb_string in pdb_strings * 2
+    ]
+
+    assert coprocess_results == subprocess_results * 2
+    assert coprocess_results[2].total_value is None
+
+
+class MalformedReplyCoProcess:
+    """Replies with the output of a co-process that died part way through."""
+
+    alive = False
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+
+    def request(self, line, timeout=None):
+        return (self.stdout, "Aggrescan3D log\n")
+
+
+@pytest.mark.parametrize(
+    "stdout",
+    [
+        'Scoring 1abc\n{"return_code": 0, "summ\n',
+        'Scoring 1abc\n{"return_code": 0}\n',
+        "",
+    ],
+)
+def test_aggrescan3d_coprocess_handles_malformed_replies(monkeypatch, stdout):
+    monkeypatch.setattr(
+        analysis,
+        "get_coprocess_pool",
+        lambda key, factory: CoProcessPool(lambda: MalformedReplyCoProcess(stdout)),
+    )
+
+    (_, stderr, return_code, summary, rows) = analysis.run_aggrescan3d_coprocess(
+        "1abc.pdb", "work", "/Aggrescan3D/aggrescan3D_cli_run.py"
+    )
+
+    assert stderr.startswith("Aggrescan3D log\nInvalid reply")
+    assert (return_code, summary, rows) == (1, None, None)
@@ -0,0 +1,228 @@
+import concurrent.futures
+import os
+import pathlib
+import subprocess
+import time
+
+import pytest
+
+from destress_big_structure import analysis
+from destress_big_structure.analysis import (
+    ALL_METRICS,
+    TIMED_OUT_ERROR_INFO,
+    ToolRunner,
+    TriageThreshold,
+    _run_and_cache_tool,
+    load_design,
+    parse_metric_plan,
+    parse_triage_thresholds,
+    run_dfire2,
+    timed_out_output,
+    triage_metric_groups,
+)
+from destress_big_structure.result_cache import DiskResultCache
+from destress_big_structure.settings import DFIRE2_FOLDER_PATH
+
+
+def test_tool_runner_concurrent_matches_sequential():
+    tool_calls = {
+        "power": (pow, (2, 10)),
+        "sorted": (sorted, ([3, 1, 2],)),
+        "max": (max, (4, 8, 6)),
+    }
+
+    with ToolRunner(1) as tool_runner:
+        tool_runner.submit_all(tool_calls)
+        sequential_results = tool_runner.results()
+
+    with ToolRunner(3) as tool_runner:
+        tool_runner.submit_all(tool_calls)
+        concurrent_results = tool_runner.results()
+
+    assert sequential_results == {"power": 1024, "sorted": [1, 2, 3], "max": 8}
+    assert concurrent_results == sequential_results
+
+
+def test_tool_wrappers_are_thread_safe():
+    test_paths = [
+        pathlib.Path("tests/testing_files/1aac.pdb"),
+        pathlib.Path("tests/testing_files/1ubq.pdb"),
+    ]
+    pdb_strings = [test_path.read_text() for test_path in test_paths]
+    starting_directory = os.getcwd()
+
+    sequential_totals = [
+        run_dfire2(pdb_string, DFIRE2_FOLDER_PATH).total for pdb_string in pdb_strings
+    ]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        concurrent_totals = list(
+            executor.map(
+                lambda pdb_string: run_dfire2(pdb_string, DFIRE2_FOLDER_PATH).total,
+                pdb_strings * 2,
+            )
+        )
+
+    assert concurrent_totals == sequential_totals * 2
+    # The wrappers should never change the working directory of the process
+    assert os.getcwd() == starting_directory
+
+
+def test_parse_metric_plan():
+    assert parse_metric_plan("all") == ALL_METRICS
+    assert parse_metric_plan(" BudeFF, dfire2 ") == frozenset({"budeff", "dfire2"})
+    with pytest.raises(ValueError):
+        parse_metric_plan("budeff,not_a_metric")
+
+
+def test_parse_triage_thresholds():
+    triage_thresholds = parse_triage_thresholds(
+        "charge<=5, packing_density >= 55,dfire2_total<-100"
+    )
+    assert triage_thresholds == (
+        TriageThreshold("charge", "<=", 5.0),
+        TriageThreshold("packing_density", ">=", 55.0),
+        TriageThreshold("dfire2_total", "<", -100.0),
+    )
+    assert triage_metric_groups(triage_thresholds) == frozenset(
+        {"packing_density", "dfire2"}
+    )
+    assert parse_triage_thresholds("") == ()
+    for thresholds_string in ("not_a_metric<5", "charge=5", "charge<five"):
+        with pytest.raises(ValueError):
+            parse_triage_thresholds(thresholds_string)
+
+
+def test_triage_skips_slow_tools(monkeypatch):
+    design = load_design(pathlib.Path("tests/testing_files/1aac.pdb").read_text())
+    rosetta_calls = []
+    monkeypatch.setattr(
+        analysis,
+        "run_rosetta",
+        lambda *args: rosetta_calls.append(args) or "rosetta output",
+    )
+
+    rejected_metrics = analysis.analyse_design(
+        design,
+        metrics=frozenset({"rosetta"}),
+        triage_thresholds=parse_triage_thresholds("num_residues<100"),
+    )
+    assert rejected_metrics.rosetta_results is None
+    assert rosetta_calls == []
+
+    passed_metrics = analysis.analyse_design(
+        design,
+        metrics=frozenset({"rosetta"}),
+        triage_thresholds=parse_triage_thresholds("num_residues>=100"),
+    )
+    assert passed_metrics.rosetta_results == "rosetta output"
+    assert len(rosetta_calls) == 1
+
+
+def test_deadline_marks_timed_out_tools(monkeypatch):
+    design = load_design(pathlib.Path("tests/testing_files/1aac.pdb").read_text())
+    tool_timeouts = {}
+
+    def run_evoef2(*args, timeout=None):
+        tool_timeouts["evoEF2_results"] = timeout
+        return "evoef2 output"
+
+    def run_rosetta(*args, timeout=None):
+        tool_timeouts["rosetta_results"] = timeout
+        raise subprocess.TimeoutExpired("rosetta", timeout)
+
+    monkeypatch.setattr(analysis, "run_evoef2", run_evoef2)
+    monkeypatch.setattr(analysis, "run_rosetta", run_rosetta)
+
+    design_metrics = analysis.analyse_design(
+        design,
+        metrics=frozenset({"evoef2", "rosetta"}),
+        deadline=time.monotonic() + 10,
+    )
+    assert design_metrics.evoEF2_results == "evoef2 output"
+    assert design_metrics.rosetta_results.total_score is None
+    assert design_metrics.rosetta_results.error_info == TIMED_OUT_ERROR_INFO
+    assert design_metrics.timed_out_tools == ["rosetta_results"]
+    assert all(0 < timeout <= 10 for timeout in tool_timeouts.values())
+
+    # Nothing is run once the deadline has passed
+    tool_timeouts.clear()
+    expired_metrics = analysis.analyse_design(
+        design,
+        metrics=frozenset({"evoef2", "rosetta"}),
+        deadline=time.monotonic() - 1,
+    )
+    assert tool_timeouts == {}
+    assert expired_metrics.timed_out_tools == ["evoEF2_results", "rosetta_results"]
+    assert expired_metrics.full_sequence == design_metrics.full_sequence
+
+
+def test_scratch_directory_uses_scratch_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(analysis, "SCRATCH_DIR", str(tmp_path))
+
+    with analysis.scratch_directory() as scratch_dir:
+        pdb_path = analysis.write_scratch_pdb("END\n", scratch_dir)
+        assert pathlib.Path(pdb_path).parent.parent == tmp_path
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_failed_tool_runs_are_not_cached(tmp_path):
+    result_cache = DiskResultCache(str(tmp_path))
+    failed_output = timed_out_output("dfire2_results")
+    failed_output.return_code = 1
+    finished_output = timed_out_output("dfire2_results")
+    finished_output.return_code = 0
+
+    _run_and_cache_tool(
+        result_cache, "dfire2_results-failed", lambda: failed_output, ()
+    )
+    _run_and_cache_tool(
+        result_cache, "dfire2_results-finished", lambda: finished_output, ()
+    )
+
+    assert result_cache.get("dfire2_results", "dfire2_results-failed") is None
+    assert result_cache.get("dfire2_results", "dfire2_results-finished") is not None
+
+
+def test_tool_files_include_the_data_of_each_tool(monkeypatch):
+    monkeypatch.setattr(analysis, "EVOEF2_BINARY_PATH", "/deps/EvoEF2/EvoEF2")
+    # The folder doesn't need a trailing slash
+    monkeypatch.setattr(analysis, "DFIRE2_FOLDER_PATH", "/deps/DFIRE2-pair")
+    monkeypatch.setattr(
+        analysis,
+        "ROSETTA_BINARY_PATH",
+        "/deps/rosetta/main/source/bin/score_jd2.linuxgccrelease",
+    )
+    monkeypatch.setattr(analysis, "aggrescan3d_package_path", lambda: None)
+
+    tool_files = analysis.tool_files()
+
+    assert tool_files["evoEF2_results"] == [
+        "/deps/EvoEF2/EvoEF2",
+        "/deps/EvoEF2/library",
+        "/deps/EvoEF2/wread",
+    ]
+    assert tool_files["dfire2_results"] == ["/deps/DFIRE2-pair/dfire_pair.lib"]
+    assert tool_files["rosetta_results"][1] == "/deps/rosetta/main/database"
+    assert set(tool_files) == set(analysis.TOOL_OUTPUT_TYPES)
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_tool_runner_only_reports_budget_timeouts(max_workers):
+    def run_rosetta(timeout=analysis.MAX_RUN_TIME):
+        raise subprocess.TimeoutExpired("rosetta", timeout)
+
+    tool_calls = {"rosetta_results": (run_rosetta, ())}
+
+    # Running over `MAX_RUN_TIME` is a failure of the tool
+    for deadline in (None, time.monotonic() + analysis.MAX_RUN_TIME + 60):
+        with ToolRunner(max_workers, deadline=deadline) as tool_runner:
+            tool_runner.submit_all(tool_calls)
+            with pytest.raises(subprocess.TimeoutExpired):
+                tool_runner.results()
+        assert tool_runner.timed_out_tools == []
+
+    with ToolRunner(max_workers, deadline=time.monotonic() + 1) as tool_runner:
+        tool_runner.submit_all(tool_calls)
+        assert tool_runner.results() == {}
+    assert tool_runner.timed_out_tools == ["rosetta_results"]
@@ -0,0 +1,174 @@
+from datetime import date
+import pickle
+
+import pytest
+from sqlalchemy import create_engine, inspect, text  # type: ignore
+from sqlalchemy.orm import sessionmaker  # type: ignore
+
+from destress_big_structure.big_structure_models import (
+    BigStructureBase,
+    BiolUnitModel,
+    ChainModel,
+    DFIRE2ResultsModel,
+    PdbModel,
+    StateModel,
+)
+from destress_big_structure.bulk_load import (
+    RECORD_VERSION,
+    add_missing_columns,
+    copy_value,
+    delete_pdb_entries,
+    load_pdb_models,
+    load_table_rows,
+    merge_records,
+    model_rows,
+    pdb_record,
+)
+
+
+def make_pdb_model(pdb_code: str, num_states: int) -> PdbModel:
+    states = [
+        StateModel(
+            state_number=state_number,
+            composition="A:1.00",
+            torsion_angles="",
+            hydrophobic_fitness=None,
+            is_protein_only=True,
+            isoelectric_point=7.0,
+            num_of_residues=10,
+            mass=1000.0,
+            mean_packing_density=50.0,
+            chains=[ChainModel(chain_label="A", sequence="AAAAAAAAAA")],
+            dfire2_results=DFIRE2ResultsModel(
+                log_info="", error_info="", return_code=0, total=-10.0 * state_number
+            ),
+        )
+        for state_number in range(num_states)
+    ]
+    return PdbModel(
+        pdb_code=pdb_code,
+        deposition_date=date(2000, 1, 1),
+        method="X-RAY DIFFRACTION",
+        biol_units=[
+            BiolUnitModel(
+                biol_unit_number=0,
+                is_deposited_pdb=True,
+                is_preferred_biol_unit=False,
+                states=states,
+            )
+        ],
+    )
+
+
+def test_model_rows_links_children_to_parents():
+    table_rows = model_rows([make_pdb_model("1abc", 2), make_pdb_model("2abc", 3)])
+
+    assert {
+        table_name: len(rows) for (table_name, rows) in table_rows.items()
+    } == {"pdb": 2, "biol_unit": 2, "state": 5, "chain": 5, "dfire2_results": 5}
+    # Every foreign key refers to a row of the parent table
+    state_ids = {row[0] for row in table_rows["state"]}
+    assert {row[-1] for row in table_rows["chain"]} == state_ids
+    assert {row[-1] for row in table_rows["dfire2_results"]} == state_ids
+
+
+def test_load_pdb_models():
+    engine = create_engine("sqlite://")
+    BigStructureBase.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    # The second batch has to be given ids after those of the first
+    load_pdb_models(session, [make_pdb_model("1abc", 2)])
+    load_pdb_models(session, [make_pdb_model("2abc", 3), make_pdb_model("3abc", 1)])
+    session.commit()
+
+    pdb_models = session.query(PdbModel).order_by(PdbModel.pdb_code).all()
+    assert [pdb_model.pdb_code for pdb_model in pdb_models] == ["1abc", "2abc", "3abc"]
+    for (pdb_model, num_states) in zip(pdb_models, [2, 3, 1]):
+        (biol_unit,) = pdb_model.biol_units
+        assert sorted(state.state_number for state in biol_unit.states) == list(
+            range(num_states)
+        )
+        for state in biol_unit.states:
+            assert [chain.chain_label for chain in state.chains] == ["A"]
+            assert state.dfire2_results.total == -10.0 * state.state_number
+    assert session.query(StateModel).count() == 6
+
+
+def test_delete_pdb_entries():
+    engine = create_engine("sqlite://")
+    BigStructureBase.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    load_pdb_models(session, [make_pdb_model("1abc", 2), make_pdb_model("2abc", 3)])
+    session.commit()
+
+    delete_pdb_entries(session, ["1abc"])
+    session.commit()
+
+    assert [pdb_model.pdb_code for pdb_model in session.query(PdbModel)] == ["2abc"]
+    assert session.query(BiolUnitModel).count() == 1
+    assert session.query(StateModel).count() == 3
+    assert session.query(ChainModel).count() == 3
+    assert session.query(DFIRE2ResultsModel).count() == 3
+
+
+def test_merge_records():
+    records = [
+        pdb_record(make_pdb_model("1abc", 2)),
+        pdb_record(make_pdb_model("2abc", 3)),
+    ]
+    engine = create_engine("sqlite://")
+    BigStructureBase.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    load_table_rows(session, merge_records(records))
+    session.commit()
+
+    assert [
+        len(pdb_model.biol_units[0].states)
+        for pdb_model in session.query(PdbModel).order_by(PdbModel.pdb_code)
+    ] == [2, 3]
+    assert session.query(ChainModel).count() == 5
+
+
+def test_merge_records_checks_version():
+    (_, table_rows) = pdb_record(make_pdb_model("1abc", 1))
+
+    with pytest.raises(ValueError):
+        merge_records([(RECORD_VERSION + 1, table_rows)])
+
+
+def test_pdb_record_is_smaller_than_model():
+    pdb_model = make_pdb_model("1abc", 10)
+
+    assert len(pickle.dumps(pdb_record(pdb_model))) < len(pickle.dumps(pdb_model))
+
+
+def test_copy_value():
+    assert copy_value(None) == "\\N"
+    assert copy_value(True) == "t"
+    assert copy_value(3) == "3"
+    assert copy_value(-0.1) == "-0.1"
+    assert copy_value(float("nan")) == "NaN"
+    assert copy_value(date(2000, 1, 2)) == "2000-01-02"
+    assert copy_value("a\tb\nc\\d") == "a\\tb\\nc\\\\d"
+
+
+def test_add_missing_columns():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        # A `pdb` table from before the optional columns were added
+        connection.execute(
+            text(
+                "CREATE TABLE pdb (id INTEGER PRIMARY KEY, pdb_code VARCHAR NOT NULL, "
+                "deposition_date DATE NOT NULL, method VARCHAR NOT NULL)"
+            )
+        )
+        added_columns = add_missing_columns(connection)
+
+        assert added_columns == ["pdb.resolution", "pdb.r_work", "pdb.organism"]
+        pdb_columns = inspect(connection).get_columns("pdb")
+        assert {column["name"] for column in pdb_columns} == {
+            column.name for column in PdbModel.__table__.columns
+        }
+        assert add_missing_columns(connection) == []
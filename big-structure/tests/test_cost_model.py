@@ -0,0 +1,108 @@
+import pathlib
+
+import pytest
+
+from destress_big_structure.cost_model import (
+    JOB_TIMEOUT_MARGIN,
+    LARGE_JOB_TIMEOUT,
+    LARGE_QUEUE,
+    SMALL_JOB_MAX_PREDICTED_SECONDS,
+    SMALL_JOB_TIMEOUT,
+    SMALL_QUEUE,
+    CostModel,
+    ToolCost,
+    ToolTiming,
+    design_size,
+    fit_cost_model,
+    load_cost_model,
+    route_job,
+)
+
+
+def test_fit_cost_model_recovers_tool_costs():
+    sizes = [(500, 60), (1200, 150), (2500, 310), (4000, 520), (9000, 1100)]
+    expected_costs = {
+        "rosetta_results": ToolCost(intercept=4.0, per_atom=0.0, per_residue=0.01),
+        "evoEF2_results": ToolCost(intercept=0.5, per_atom=2e-4, per_residue=0.0),
+    }
+    timings = [
+        ToolTiming(tool, num_atoms, num_residues, cost.predict(num_atoms, num_residues))
+        for (tool, cost) in expected_costs.items()
+        for (num_atoms, num_residues) in sizes
+    ]
+
+    cost_model = fit_cost_model(timings)
+
+    assert set(cost_model.tool_costs) == set(expected_costs)
+    for (tool, expected_cost) in expected_costs.items():
+        for (num_atoms, num_residues) in sizes:
+            assert cost_model.tool_costs[tool].predict(
+                num_atoms, num_residues
+            ) == pytest.approx(expected_cost.predict(num_atoms, num_residues))
+
+
+def test_fit_cost_model_has_no_negative_coefficients():
+    # A noisy tool whose timings fall slightly with the number of residues
+    timings = [
+        ToolTiming("aggrescan3d_results", 1000, 120, 3.2),
+        ToolTiming("aggrescan3d_results", 2000, 260, 5.1),
+        ToolTiming("aggrescan3d_results", 3000, 370, 7.4),
+        ToolTiming("aggrescan3d_results", 4000, 470, 9.0),
+    ]
+
+    tool_cost = fit_cost_model(timings).tool_costs["aggrescan3d_results"]
+
+    assert min(tool_cost.intercept, tool_cost.per_atom, tool_cost.per_residue) >= 0
+
+
+def test_cost_model_json_round_trip(tmp_path):
+    cost_model = load_cost_model()
+    cost_model_path = tmp_path / "cost_model.json"
+    cost_model_path.write_text(cost_model.to_json())
+
+    loaded_cost_model = load_cost_model(str(cost_model_path))
+
+    assert loaded_cost_model.tool_costs == cost_model.tool_costs
+
+
+def test_design_size():
+    pdb_string = pathlib.Path("tests/testing_files/1ubq.pdb").read_text()
+
+    assert design_size(pdb_string) == (660, 76)
+
+
+def test_route_job():
+    small_route = route_job(1.0)
+    assert small_route.queue_name == SMALL_QUEUE
+    assert small_route.timeout == SMALL_JOB_TIMEOUT
+    assert small_route.time_budget == SMALL_JOB_TIMEOUT - JOB_TIMEOUT_MARGIN
+
+    large_route = route_job(60.0)
+    assert large_route.queue_name == LARGE_QUEUE
+    assert SMALL_JOB_TIMEOUT < large_route.timeout <= LARGE_JOB_TIMEOUT
+    assert large_route.time_budget >= 60.0
+
+    assert route_job(1e6).timeout == LARGE_JOB_TIMEOUT
+
+
+def test_route_job_small_queue_boundary():
+    # The time limit of the longest small job, 2 * 12.5 + 5 s, fits exactly
+    assert SMALL_JOB_MAX_PREDICTED_SECONDS == 12.5
+    assert route_job(12.5).queue_name == SMALL_QUEUE
+    longer_route = route_job(12.51)
+    assert longer_route.queue_name == LARGE_QUEUE
+    assert longer_route.timeout == SMALL_JOB_TIMEOUT + 1
+    # Jobs that are predicted to take up to `SMALL_JOB_TIMEOUT` are still large
+    assert route_job(SMALL_JOB_TIMEOUT).queue_name == LARGE_QUEUE
+
+
+def test_cost_model_predicts_larger_designs_take_longer():
+    cost_model = CostModel(
+        {
+            "rosetta_results": ToolCost(intercept=4.0, per_atom=0.0, per_residue=0.01),
+            "dfire2_results": ToolCost(intercept=0.1, per_atom=1e-5, per_residue=0.0),
+        }
+    )
+
+    assert cost_model.predict(500, 60) < cost_model.predict(5000, 600)
+    assert cost_model.predict(0, 0) == pytest.approx(4.1)
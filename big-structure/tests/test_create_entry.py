@@ -0,0 +1,124 @@
+from collections import Counter
+import dataclasses
+import pathlib
+
+from destress_big_structure import analysis, create_entry
+from destress_big_structure.big_structure_models import BiolUnitModel
+
+# The tool wrappers that are run for a state, and the name of their output
+TOOL_WRAPPERS = {
+    "run_bude_ff": "budeFF_results",
+    "run_evoef2": "evoEF2_results",
+    "run_dfire2": "dfire2_results",
+    "run_rosetta": "rosetta_results",
+    "run_aggrescan3d": "aggrescan3d_results",
+}
+
+
+# The model that the output of each tool is stored in
+TOOL_RESULTS_MODELS = {
+    "budeFF_results": "budeff_results",
+    "evoEF2_results": "evoef2_results",
+    "dfire2_results": "dfire2_results",
+    "rosetta_results": "rosetta_results",
+    "aggrescan3d_results": "aggrescan3d_results",
+}
+
+
+def tool_output(name):
+    """An output of a tool that has a different value in each field."""
+    output_type = analysis.TOOL_OUTPUT_TYPES[name]
+    field_values = {}
+    for (i, output_field) in enumerate(dataclasses.fields(output_type)):
+        if not output_field.init:
+            continue
+        if output_field.name == "return_code":
+            field_values[output_field.name] = 0
+        elif output_field.name.endswith(("_info", "_list")):
+            field_values[output_field.name] = f"{name}.{output_field.name}"
+        else:
+            field_values[output_field.name] = i + 0.5
+    return output_type(**field_values)
+
+
+def create_state_model(monkeypatch, make_output):
+    """Creates a state entry for 1aac, with the tools replaced by `make_output`.
+
+    Returns
+    -------
+    state_model: StateModel
+        The state entry.
+    tool_calls: Counter
+        The number of times that each tool wrapper was called.
+    """
+    design = analysis.load_design(
+        pathlib.Path("tests/testing_files/1aac.pdb").read_text()
+    )
+    tool_calls: Counter = Counter()
+
+    def fake_tool(wrapper_name):
+        def run_tool(*args, **kwargs):
+            tool_calls[wrapper_name] += 1
+            return make_output(TOOL_WRAPPERS[wrapper_name])
+
+        return run_tool
+
+    for wrapper_name in TOOL_WRAPPERS:
+        monkeypatch.setattr(analysis, wrapper_name, fake_tool(wrapper_name))
+    # The tools are not run, but their paths have to be set
+    for path_setting in (
+        "EVOEF2_BINARY_PATH",
+        "DFIRE2_FOLDER_PATH",
+        "ROSETTA_BINARY_PATH",
+        "AGGRESCAN3D_SCRIPT_PATH",
+    ):
+        monkeypatch.setattr(analysis, path_setting, path_setting.lower())
+        monkeypatch.setattr(create_entry, path_setting, path_setting.lower())
+    monkeypatch.setattr(analysis, "get_result_cache", lambda: None)
+
+    state_model = create_entry.create_state_entry(
+        design,
+        0,
+        BiolUnitModel(
+            biol_unit_number=1, is_deposited_pdb=True, is_preferred_biol_unit=True
+        ),
+    )
+    return state_model, tool_calls
+
+
+def test_create_state_entry_runs_each_tool_once(monkeypatch):
+    (state_model, tool_calls) = create_state_model(
+        monkeypatch, analysis.timed_out_output
+    )
+
+    assert tool_calls == {wrapper_name: 1 for wrapper_name in TOOL_WRAPPERS}
+    assert state_model.budeff_results is not None
+    assert state_model.evoef2_results.error_info == analysis.TIMED_OUT_ERROR_INFO
+    assert state_model.dfire2_results.error_info == analysis.TIMED_OUT_ERROR_INFO
+    assert state_model.rosetta_results.error_info == analysis.TIMED_OUT_ERROR_INFO
+    assert (
+        state_model.aggrescan3d_results.error_info == analysis.TIMED_OUT_ERROR_INFO
+    )
+
+
+def test_create_state_entry_stores_each_tool_output(monkeypatch):
+    (state_model, _) = create_state_model(monkeypatch, tool_output)
+
+    for (name, model_name) in TOOL_RESULTS_MODELS.items():
+        results_model = getattr(state_model, model_name)
+        # Each value is stored in the column with the lower case name of its field
+        for (field_name, value) in tool_output(name).__dict__.items():
+            assert getattr(results_model, field_name.lower()) == value, field_name
+    evoef2_output = tool_output("evoEF2_results")
+    assert state_model.evoef2_results.reference_ala == evoef2_output.reference_ALA
+    assert state_model.evoef2_results.ref_total == evoef2_output.ref_total
+    assert state_model.evoef2_results.intrar_total == evoef2_output.intraR_total
+    assert state_model.evoef2_results.interd_total == evoef2_output.interD_total
+    rosetta_output = tool_output("rosetta_results")
+    assert state_model.rosetta_results.fa_atr == rosetta_output.fa_atr
+    assert state_model.rosetta_results.total_score == rosetta_output.total_score
+    assert state_model.dfire2_results.total == tool_output("dfire2_results").total
+    assert (
+        state_model.aggrescan3d_results.residue_score_list
+        == "aggrescan3d_results.residue_score_list"
+    )
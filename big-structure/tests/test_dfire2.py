@@ -5,7 +5,7 @@ import typing as t
 import graphene
 import re
 
-from destress_big_structure.analysis import run_dfire2
+from destress_big_structure.analysis import run_dfire2, run_dfire2_calene
 from destress_big_structure.settings import DFIRE2_FOLDER_PATH
 from destress_big_structure.elm_types import DFIRE2Output
 from destress_big_structure.schema import Query
@@ -67,4 +67,30 @@ def test_check_run_dfire2_executes():
     # Checking that the fields from the dfire2_results object
     # are the same as the fields in the DFIRE2Results table
     # in the data base
-    assert set(dfire2_results.__dict__.keys()) == set(db_column_list)
\ No newline at end of file
+    assert set(dfire2_results.__dict__.keys()) == set(db_column_list)
+
+
+def test_run_dfire2_matches_calene():
+    # calene can only read 5000 atoms, so the larger test files are not used
+    test_paths = [
+        pathlib.Path("tests/testing_files/1aac.pdb"),
+        pathlib.Path("tests/testing_files/1ctf.pdb"),
+        pathlib.Path("tests/testing_files/1r69.pdb"),
+        pathlib.Path("tests/testing_files/1ubq.pdb"),
+        pathlib.Path("tests/testing_files/2ht0.pdb"),
+        pathlib.Path("tests/testing_files/3qy1.pdb"),
+        pathlib.Path("tests/testing_files/4icb.pdb"),
+    ]
+
+    for test_path in test_paths:
+        pdb_string = test_path.read_text()
+
+        dfire2_results = run_dfire2(
+            pdb_string=pdb_string, dfire2_folder_path=DFIRE2_FOLDER_PATH
+        )
+        calene_results = run_dfire2_calene(
+            pdb_string=pdb_string, dfire2_folder_path=DFIRE2_FOLDER_PATH
+        )
+
+        assert dfire2_results.return_code == 0
+        assert dfire2_results.total == calene_results.total
@@ -5,6 +5,7 @@ import typing as t
 import graphene
 import re
 
+from destress_big_structure import analysis
 from destress_big_structure.analysis import run_evoef2
 from destress_big_structure.settings import EVOEF2_BINARY_PATH
 from destress_big_structure.elm_types import EvoEF2Output
@@ -238,3 +239,31 @@ def test_check_run_evoef_executes():
     # are the same as the fields in the EvoEF2Results table
     # in the data base
     assert set(evoef_results.__dict__.keys()) & set(db_column_list)
+
+
+def test_evoef2_coprocess_matches_subprocess(monkeypatch):
+    test_paths = [
+        pathlib.Path("tests/testing_files/1aac.pdb"),
+        pathlib.Path("tests/testing_files/1ubq.pdb"),
+    ]
+    pdb_strings = [test_path.read_text() for test_path in test_paths]
+
+    monkeypatch.setattr(analysis, "EVOEF2_COPROCESS", False)
+    subprocess_results = [
+        run_evoef2(pdb_string=pdb_string, evoef2_binary_path=EVOEF2_BINARY_PATH)
+        for pdb_string in pdb_strings
+    ]
+
+    # Each PDB file is scored twice to check that the co-process is reused
+    monkeypatch.setattr(analysis, "EVOEF2_COPROCESS", True)
+    coprocess_results = [
+        run_evoef2(pdb_string=pdb_string, evoef2_binary_path=EVOEF2_BINARY_PATH)
+        for pdb_string in pdb_strings * 2
+    ]
+
+    for subprocess_result, coprocess_result in zip(
+        subprocess_results * 2, coprocess_results
+    ):
+        # The time spent is the only field that is expected to change
+        coprocess_result.time_spent = subprocess_result.time_spent
+        assert coprocess_result == subprocess_result
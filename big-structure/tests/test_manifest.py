@@ -0,0 +1,97 @@
+import os
+
+from sqlalchemy import create_engine  # type: ignore
+from sqlalchemy.orm import sessionmaker  # type: ignore
+
+from destress_big_structure import analysis, manifest
+from destress_big_structure.big_structure_models import BigStructureBase
+
+
+def write_source_files(folder, contents):
+    source_paths = []
+    for (file_name, content) in contents.items():
+        source_path = folder / file_name
+        source_path.write_text(content)
+        source_paths.append(source_path)
+    return source_paths
+
+
+def test_source_hash_only_changes_with_content(tmp_path):
+    source_paths = write_source_files(
+        tmp_path, {"pdb1abc.ent.gz": "pdb", "1abc-noatom.xml.gz": "xml"}
+    )
+    files_hash = manifest.source_hash(source_paths)
+
+    # Rewriting a file with the same content changes its stamp but not the hash
+    source_paths[0].write_text("pdb")
+    assert manifest.source_hash(source_paths) == files_hash
+    assert manifest.source_hash(reversed(source_paths)) == files_hash
+
+    source_paths[0].write_text("new pdb")
+    assert manifest.source_hash(source_paths) != files_hash
+
+
+def test_is_up_to_date(tmp_path):
+    source_paths = write_source_files(tmp_path, {"pdb1abc.ent.gz": "pdb"})
+    stamps = manifest.source_stamps(source_paths)
+    manifest_entry = manifest.ManifestEntry(
+        "1abc", stamps, manifest.source_hash(source_paths), "tools-1"
+    )
+
+    assert manifest.is_up_to_date(manifest_entry, stamps, "tools-1")
+    assert not manifest.is_up_to_date(None, stamps, "tools-1")
+    assert not manifest.is_up_to_date(manifest_entry, stamps, "tools-2")
+    source_paths[0].write_text("new pdb")
+    assert not manifest.is_up_to_date(
+        manifest_entry, manifest.source_stamps(source_paths), "tools-1"
+    )
+    # A missing file has a stamp, rather than failing
+    assert "missing" in manifest.source_stamps([tmp_path / "pdb2abc.ent.gz"])
+
+
+def test_save_manifest_entries_replaces_entries():
+    engine = create_engine("sqlite://")
+    BigStructureBase.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    manifest.save_manifest_entries(
+        session,
+        [
+            manifest.ManifestEntry("1abc", "a:1:1", "hash-1", "tools-1"),
+            manifest.ManifestEntry("2abc", "b:1:1", "hash-2", "tools-1"),
+        ],
+    )
+    session.commit()
+    manifest.save_manifest_entries(
+        session, [manifest.ManifestEntry("1abc", "a:2:2", "hash-3", "tools-1")]
+    )
+    manifest.delete_manifest_entries(session, ["2abc"])
+    session.commit()
+
+    assert manifest.load_manifest(session) == {
+        "1abc": manifest.ManifestEntry("1abc", "a:2:2", "hash-3", "tools-1")
+    }
+
+
+def test_tool_versions_only_change_with_tool_content(tmp_path, monkeypatch):
+    (evoef2_path,) = write_source_files(tmp_path, {"EvoEF2": "binary"})
+    (tmp_path / "library").mkdir()
+    (param_path,) = write_source_files(tmp_path / "library", {"param.prm": "1.0"})
+    monkeypatch.setattr(analysis, "EVOEF2_BINARY_PATH", str(evoef2_path))
+    monkeypatch.setattr(analysis, "aggrescan3d_package_path", lambda: None)
+    versions = manifest.tool_versions()
+
+    # Rebuilding the image changes the modification time but not the content
+    for path in (evoef2_path, param_path):
+        file_stats = os.stat(path)
+        os.utime(path, ns=(file_stats.st_atime_ns, file_stats.st_mtime_ns + 10**9))
+    assert manifest.tool_versions() == versions
+
+    # The data that a tool loads is part of its version
+    param_path.write_text("2.0")
+    param_versions = manifest.tool_versions()
+    assert param_versions != versions
+
+    evoef2_path.write_text("new binary")
+    assert manifest.tool_versions() != param_versions
+    assert "missing" in manifest.tool_file_hash(str(tmp_path / "Rosetta"))
@@ -0,0 +1,47 @@
+import gzip as gz
+from pathlib import Path
+
+import pytest
+
+from destress_big_structure.pdbml import get_pdb_information
+
+XML_FOLDER = Path("tests/testing_files/db_generation/XML/qy")
+
+
+def test_get_pdb_information():
+    pdb_information = get_pdb_information(XML_FOLDER / "3qy1-noatom.xml.gz")
+
+    assert pdb_information == {
+        "deposition_date": "2011-03-02",
+        "method": "X-RAY DIFFRACTION",
+        "resolution": "1.54",
+        "r_work": "0.1564",
+        "organism": "Salmonella enterica subsp. enterica serovar Typhimurium",
+    }
+
+
+def test_get_pdb_information_natural_source():
+    pdb_information = get_pdb_information(
+        XML_FOLDER / "3qy4-noatom.xml.gz", extra_fields=["organism"]
+    )
+
+    assert pdb_information == {
+        "deposition_date": "2011-03-02",
+        "method": "X-RAY DIFFRACTION",
+        "organism": "Gallus gallus",
+    }
+
+
+def test_get_pdb_information_missing_fields(tmp_path):
+    xml_path = tmp_path / "1abc-noatom.xml.gz"
+    with gz.open(xml_path, "wt") as outf:
+        outf.write(
+            '<PDBx:datablock xmlns:PDBx="http://pdbml.pdb.org/schema/pdbx-v50.xsd">'
+            "<PDBx:exptlCategory>"
+            '<PDBx:exptl entry_id="1ABC" method="SOLUTION NMR"></PDBx:exptl>'
+            "</PDBx:exptlCategory>"
+            "</PDBx:datablock>"
+        )
+
+    with pytest.raises(ValueError, match="deposition_date"):
+        get_pdb_information(xml_path)
@@ -0,0 +1,57 @@
+import os
+
+from destress_big_structure.result_cache import (
+    DiskResultCache,
+    cache_key,
+    file_fingerprint,
+    normalise_pdb_string,
+)
+
+
+def test_cache_key_uses_normalised_pdb():
+    pdb_string = "HEADER    TEST\nATOM      1  N   ALA A   1  \nHETATM    2  O   HOH\n"
+    other_pdb_string = "ATOM      1  N   ALA A   1\nEND\n"
+
+    assert normalise_pdb_string(pdb_string) == normalise_pdb_string(other_pdb_string)
+    assert cache_key(
+        normalise_pdb_string(pdb_string), "dfire2_results", "calene:1"
+    ) == cache_key(normalise_pdb_string(other_pdb_string), "dfire2_results", "calene:1")
+    # Changing the tool invalidates the key
+    assert cache_key(
+        normalise_pdb_string(pdb_string), "dfire2_results", "calene:1"
+    ) != cache_key(normalise_pdb_string(pdb_string), "dfire2_results", "calene:2")
+
+
+def test_disk_result_cache_hits_misses_and_eviction(tmp_path):
+    result_cache = DiskResultCache(str(tmp_path), max_bytes=25)
+
+    assert result_cache.get("evoEF2_results", "a") is None
+    result_cache.set("a", "x" * 10)
+    result_cache.set("b", "y" * 10)
+    assert result_cache.get("evoEF2_results", "a") == "x" * 10
+
+    # Make sure that "b" is the least recently used entry
+    os.utime(tmp_path / "b", (0, 0))
+    result_cache.set("c", "z" * 10)
+
+    assert result_cache.get("evoEF2_results", "b") is None
+    assert result_cache.get("evoEF2_results", "a") == "x" * 10
+    assert result_cache.get("evoEF2_results", "c") == "z" * 10
+    assert result_cache.stats() == {"evoEF2_results": {"hits": 3, "misses": 2}}
+    assert sum(path.stat().st_size for path in tmp_path.iterdir()) <= 25
+
+
+def test_file_fingerprint_includes_the_files_in_folders(tmp_path):
+    (tmp_path / "library").mkdir()
+    (tmp_path / "library" / "param.prm").write_text("1.0")
+    (tmp_path / "library" / "__pycache__").mkdir()
+    tool_paths = [str(tmp_path / "library"), str(tmp_path / "EvoEF2")]
+    fingerprint = file_fingerprint(tool_paths)
+
+    # Compiled Python files aren't part of the tool
+    (tmp_path / "library" / "__pycache__" / "param.cpython-38.pyc").write_text("")
+    (tmp_path / "library" / "module.pyc").write_text("")
+    assert file_fingerprint(tool_paths) == fingerprint
+
+    (tmp_path / "library" / "param.prm").write_text("2.00")
+    assert file_fingerprint(tool_paths) != fingerprint
@@ -6,7 +6,7 @@ import typing as t
 import graphene
 import re
 
-from destress_big_structure.analysis import run_rosetta
+from destress_big_structure.analysis import run_rosetta, run_rosetta_batch
 from destress_big_structure.settings import ROSETTA_BINARY_PATH
 from destress_big_structure.elm_types import RosettaOutput
 from destress_big_structure.schema import Query
@@ -89,3 +89,34 @@ def test_check_run_rosetta_executes():
     # are the same as the fields in the RosettaResults table
     # in the data base
     assert set(rosetta_results.__dict__.keys()) & set(db_column_list)
+
+
+@pytest.mark.rosetta
+def test_run_rosetta_batch_matches_run_rosetta():
+
+    test_paths = [
+        pathlib.Path("tests/testing_files/1aac.pdb"),
+        pathlib.Path("tests/testing_files/1ubq.pdb"),
+        pathlib.Path("tests/testing_files/1ctf.pdb"),
+    ]
+    pdb_strings = [test_path.read_text() for test_path in test_paths]
+    # A file that Rosetta can't read should only fail on its own
+    pdb_strings.insert(1, "This is not a PDB file.\n")
+
+    batch_results = run_rosetta_batch(
+        pdb_strings, rosetta_binary_path=ROSETTA_BINARY_PATH, chunk_size=3
+    )
+    single_results = [
+        run_rosetta(pdb_string=pdb_string, rosetta_binary_path=ROSETTA_BINARY_PATH)
+        for pdb_string in pdb_strings
+    ]
+
+    assert len(batch_results) == len(pdb_strings)
+    assert batch_results == single_results
+    assert batch_results[1].total_score is None
+    assert batch_results[1].return_code != 0
+    assert all(
+        rosetta_results.return_code == 0
+        for (i, rosetta_results) in enumerate(batch_results)
+        if i != 1
+    )
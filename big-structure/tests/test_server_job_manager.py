@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+
+import destress_big_structure
+from destress_big_structure import predicted_seconds_ahead
+
+
+def make_queue(monkeypatch, predicted_seconds):
+    """Makes a queue of jobs with the given predicted run times."""
+    jobs = {
+        f"job-{job_number}": SimpleNamespace(meta={"predicted_seconds": seconds})
+        for (job_number, seconds) in enumerate(predicted_seconds)
+    }
+    fetched_ids = []
+
+    def fetch_many(job_ids, connection):
+        fetched_ids.append(list(job_ids))
+        return [jobs.get(job_id) for job_id in job_ids]
+
+    monkeypatch.setattr(destress_big_structure.Job, "fetch_many", fetch_many)
+    return (SimpleNamespace(job_ids=list(jobs), connection=None), fetched_ids)
+
+
+def test_predicted_seconds_ahead_of_first_job(monkeypatch):
+    (queue, fetched_ids) = make_queue(monkeypatch, [3.0, 5.0, 7.0])
+
+    assert predicted_seconds_ahead(queue, "job-0") == 0.0
+    assert fetched_ids == []
+
+
+def test_predicted_seconds_ahead_of_middle_job(monkeypatch):
+    (queue, fetched_ids) = make_queue(monkeypatch, [3.0, 5.0, 7.0, 11.0])
+
+    assert predicted_seconds_ahead(queue, "job-2") == 8.0
+    assert fetched_ids == [["job-0", "job-1"]]
+
+
+def test_predicted_seconds_ahead_of_missing_job(monkeypatch):
+    (queue, _) = make_queue(monkeypatch, [3.0, 5.0])
+
+    assert predicted_seconds_ahead(queue, "job-9") == 0.0
@@ -0,0 +1,152 @@
+import pathlib
+
+import ampal
+import isambard.evaluation as ev
+import numpy as np
+import pytest
+
+from destress_big_structure.analysis import load_design
+from destress_big_structure.structure_arrays import (
+    AssemblyArrays,
+    assign_secondary_structure,
+    calculate_hydrophobic_fitness,
+    calculate_packing_density,
+    calculate_torsion_angles,
+    chain_secondary_structure,
+    iter_close_pairs,
+    residue_packing_density,
+    torsion_angle_dict,
+)
+
+TEST_PATHS = [
+    pathlib.Path("tests/testing_files/1aac.pdb"),
+    pathlib.Path("tests/testing_files/1ctf.pdb"),
+    pathlib.Path("tests/testing_files/1ek9.pdb"),
+    pathlib.Path("tests/testing_files/1r69.pdb"),
+    pathlib.Path("tests/testing_files/1ubq.pdb"),
+    pathlib.Path("tests/testing_files/2ht0.pdb"),
+    pathlib.Path("tests/testing_files/3qy1.pdb"),
+    pathlib.Path("tests/testing_files/4icb.pdb"),
+]
+
+
+def test_assembly_arrays_match_ampal():
+    design = load_design(pathlib.Path("tests/testing_files/1aac.pdb").read_text())
+    atoms = list(design.get_atoms())
+    monomers = list(design.get_monomers())
+
+    design_arrays = AssemblyArrays.from_assembly(design)
+
+    assert np.array_equal(design_arrays.coordinates, [a.array for a in atoms])
+    assert list(design_arrays.elements) == [a.element for a in atoms]
+    assert list(design_arrays.atom_names) == [a.res_label for a in atoms]
+    assert [monomers[i] for i in design_arrays.residue_index] == [
+        a.parent for a in atoms
+    ]
+    assert [design_arrays.chain_ids[i] for i in design_arrays.chain_index] == [
+        a.parent.parent.id for a in atoms
+    ]
+    assert list(design_arrays.mol_codes) == [m.mol_code for m in monomers]
+    assert list(design_arrays.is_residue) == [
+        isinstance(m, ampal.Residue) for m in monomers
+    ]
+
+
+def test_iter_close_pairs_matches_all_pairs():
+    coordinates = np.random.default_rng(0).uniform(0, 40, (1000, 3))
+    distances = np.linalg.norm(coordinates[:, None] - coordinates[None], axis=2)
+    expected_pairs = set(zip(*np.nonzero(np.triu(distances <= 7.0, k=1))))
+
+    # A small block size makes sure that the points are split into chunks
+    close_pairs = [
+        tuple(sorted(pair))
+        for (first, second, _) in iter_close_pairs(coordinates, 7.0, block_size=64)
+        for pair in zip(first, second)
+    ]
+
+    assert len(close_pairs) == len(expected_pairs)
+    assert set(close_pairs) == expected_pairs
+
+
+def test_calculate_hydrophobic_fitness_matches_isambard():
+    for test_path in TEST_PATHS:
+        design = load_design(test_path.read_text())
+
+        hydrophobic_fitness = calculate_hydrophobic_fitness(
+            AssemblyArrays.from_assembly(design)
+        )
+
+        assert hydrophobic_fitness == pytest.approx(
+            ev.calculate_hydrophobic_fitness(design)
+        )
+
+
+def test_calculate_packing_density_matches_isambard():
+    for test_path in TEST_PATHS:
+        design = load_design(test_path.read_text())
+        design_arrays = AssemblyArrays.from_assembly(design)
+
+        packing_density = calculate_packing_density(design_arrays)
+
+        ev.tag_packing_density(design)
+        expected_packing_density = [
+            a.tags["packing density"] if a.element != "H" else np.nan
+            for a in design.get_atoms()
+        ]
+        assert np.array_equal(
+            packing_density, expected_packing_density, equal_nan=True
+        )
+
+        monomer_packing_density = residue_packing_density(
+            design_arrays, packing_density
+        )
+        for (monomer, density) in zip(
+            design.get_monomers(), monomer_packing_density
+        ):
+            heavy_atom_densities = [
+                a.tags["packing density"]
+                for a in monomer.get_atoms()
+                if a.element != "H"
+            ]
+            if heavy_atom_densities:
+                assert density == pytest.approx(np.mean(heavy_atom_densities))
+            else:
+                assert np.isnan(density)
+
+
+def test_calculate_torsion_angles_matches_ampal():
+    for test_path in TEST_PATHS:
+        design = load_design(test_path.read_text())
+        design_arrays = AssemblyArrays.from_assembly(design)
+
+        torsion_angles = torsion_angle_dict(
+            design_arrays, calculate_torsion_angles(design_arrays)
+        )
+
+        design.tag_torsion_angles()
+        expected_torsion_angles = {}
+        for residue in design.get_monomers():
+            if all(residue.tags.get("tas", [None])):
+                (ch, (ic, rn, _)) = residue.unique_id
+                expected_torsion_angles[f"{ch}{rn}{ic}".strip()] = residue.tags["tas"]
+        assert list(torsion_angles) == list(expected_torsion_angles)
+        for (id_string, tas) in expected_torsion_angles.items():
+            assert torsion_angles[id_string] == pytest.approx(tas)
+
+
+def test_assign_secondary_structure_matches_mkdssp():
+    for test_path in TEST_PATHS:
+        design = load_design(test_path.read_text())
+        design_arrays = AssemblyArrays.from_assembly(design)
+
+        dssp_assignments = chain_secondary_structure(
+            design_arrays, assign_secondary_structure(design_arrays)
+        )
+
+        ev.tag_dssp_data(design)
+        for chain in design:
+            if isinstance(chain, ampal.Polypeptide):
+                expected_dssp_assignment = "".join(
+                    m.tags["dssp_data"]["ss_definition"] for m in chain
+                )
+                assert dssp_assignments[chain.id] == expected_dssp_assignment
@@ -0,0 +1,81 @@
+from dataclasses import dataclass
+
+from destress_big_structure import tool_logs
+from destress_big_structure.result_cache import DiskResultCache
+from destress_big_structure.tool_logs import (
+    apply_log_policy,
+    compact_logs,
+    fetch_full_logs,
+    truncate_log,
+)
+
+
+@dataclass
+class ToolOutput:
+    log_info: str
+    error_info: str
+    return_code: int
+
+
+def test_compact_logs():
+    logs = {"log_info": "line 1\nline 2\n", "error_info": "error\n"}
+
+    assert compact_logs(logs, 0, "full", None) == logs
+    assert compact_logs(logs, 0, "on_error", None) == {
+        "log_info": "",
+        "error_info": "",
+    }
+    assert compact_logs(logs, 1, "on_error", None) == logs
+    assert compact_logs(logs, 1, "full", 7) == {
+        "log_info": "line 2\n",
+        "error_info": "error\n",
+    }
+
+
+def test_truncate_log_keeps_whole_characters():
+    assert truncate_log("abcé", 2) == "é"
+    assert truncate_log("abcé", 1) == ""
+    assert truncate_log("abc", None) == "abc"
+
+
+def test_apply_log_policy_stores_full_logs(monkeypatch, tmp_path):
+    result_cache = DiskResultCache(str(tmp_path))
+    monkeypatch.setattr(tool_logs, "get_result_cache", lambda: result_cache)
+    monkeypatch.setattr(tool_logs, "LOG_POLICY", "full")
+    monkeypatch.setattr(tool_logs, "LOG_MAX_BYTES", 10)
+    full_logs = {"log_info": "x" * 100 + "the end\n", "error_info": ""}
+
+    tool_output = apply_log_policy(ToolOutput(return_code=0, **full_logs))
+
+    assert tool_output.log_info.startswith("xxthe end\n[98 bytes")
+    assert tool_output.error_info == ""
+    log_key = tool_output.log_info.rpartition("/logs/")[2].rstrip("]")
+    assert fetch_full_logs(log_key) == full_logs
+    assert fetch_full_logs("../" + log_key) is None
+
+
+def test_apply_log_policy_without_result_cache(monkeypatch):
+    monkeypatch.setattr(tool_logs, "get_result_cache", lambda: None)
+    monkeypatch.setattr(tool_logs, "LOG_POLICY", "on_error")
+    monkeypatch.setattr(tool_logs, "LOG_MAX_BYTES", None)
+
+    passed_output = apply_log_policy(ToolOutput("log", "", 0))
+    failed_output = apply_log_policy(ToolOutput("log", "error", 1))
+
+    assert passed_output == ToolOutput("", "", 0)
+    assert failed_output == ToolOutput("log", "error", 1)
+
+
+def test_apply_log_policy_does_not_store_successful_logs(monkeypatch, tmp_path):
+    result_cache = DiskResultCache(str(tmp_path))
+    monkeypatch.setattr(tool_logs, "get_result_cache", lambda: result_cache)
+    monkeypatch.setattr(tool_logs, "LOG_POLICY", "on_error")
+    monkeypatch.setattr(tool_logs, "LOG_MAX_BYTES", 10)
+
+    passed_output = apply_log_policy(ToolOutput("x" * 100, "", 0))
+    failed_output = apply_log_policy(ToolOutput("x" * 100, "error", 1))
+
+    assert passed_output == ToolOutput("", "", 0)
+    # Only the truncated logs of the failed run are stored
+    assert "/logs/" in failed_output.log_info
+    assert len(list(tmp_path.iterdir())) == 1
@@ -0,0 +1,82 @@
+"""Long-lived Aggrescan3D process used by DE-STRESS.
+
+Aggrescan3D is imported once and then every line written to stdin is treated
+as a request, a JSON object with the path of a PDB file to analyse
+(`pdb_path`) and the folder to run the analysis in (`work_dir`). The analysis
+is run with the same options as `aggrescan3D_cli_run.py`. For each PDB file a
+single JSON line is written to stdout, containing the summary statistics from
+`folded_stats` and the rows of `A3D.csv`, followed by the end marker. The log
+of Aggrescan3D is written to stderr.
+"""
+import csv
+import json
+import os
+import sys
+import traceback
+
+from aggrescan import logger
+from aggrescan import optparser
+from aggrescan import postProcessing
+from aggrescan.newRunJob import Job
+
+SERVER_READY = "AGGRESCAN3D_SERVER_READY"
+RESULT_END = "AGGRESCAN3D_RESULT_END"
+
+
+def _skip_plots(data=None, work_dir="", get_figure=False):
+    # The plots aren't used by DE-STRESS, and matplotlib never closes the
+    # figures that Aggrescan3D creates, so they would build up in this process
+    return None
+
+
+def analyse(pdb_file_path, work_dir):
+    os.chdir(work_dir)
+    options = optparser.parse(
+        options=["-i", pdb_file_path, "-w", "output", "-v", "4"]
+    )
+    logger.setup(
+        log_level=options["verbose"],
+        remote=options["remote"],
+        work_dir=options["work_dir"],
+    )
+    Job(config=options).run_job()
+
+    with open(os.path.join(options["tmp_dir"], "folded_stats")) as json_file:
+        summary = json.load(json_file)["All"]
+    with open(os.path.join(options["work_dir"], "A3D.csv")) as csv_file:
+        rows = list(csv.reader(csv_file, delimiter=","))
+    return {"return_code": 0, "summary": summary, "rows": rows}
+
+
+def main():
+    # Anything that Aggrescan3D or its subprocesses print is sent to stderr,
+    # so that stdout only contains the replies
+    replies = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    home_dir = os.getcwd()
+    postProcessing.make_plots = _skip_plots
+
+    replies.write(SERVER_READY + "\n")
+    replies.flush()
+    for line in iter(sys.stdin.readline, ""):
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            reply = analyse(request["pdb_path"], request["work_dir"])
+        except (Exception, SystemExit):
+            # Aggrescan3D calls sys.exit when it fails
+            sys.stderr.write(traceback.format_exc())
+            reply = {"return_code": 1, "summary": None, "rows": None}
+        finally:
+            # The scratch folder is deleted once the reply has been read
+            os.chdir(home_dir)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        replies.write(json.dumps(reply) + "\n")
+        replies.write(RESULT_END + "\n")
+        replies.flush()
+
+
+if __name__ == "__main__":
+    main()
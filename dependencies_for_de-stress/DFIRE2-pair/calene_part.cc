@@ -8,6 +8,7 @@
 #include <cstdlib>
 #include <cstring>
 #include <map>
+#include <vector>
 using namespace std;
 
 const int matype=167, mbin=30;
@@ -16,6 +17,7 @@ map<string, int> atomtype;
 double edfire[matype][matype][mbin];
 void rdlib(string fn){
 	FILE *fp = fopen(fn.c_str(), "r");
+	if(fp == NULL) {fprintf(stderr, "cannot open %s\n", fn.c_str()); exit(1);}
 	char str[501]; double dat[50];
 	string ss[4];
 	int na = 0;
@@ -44,11 +46,11 @@ void rdlib(string fn){
 	fclose(fp);
 }
 double calENE(string fn){
-	const int ma=5000;
 	FILE *fp = fopen(fn.c_str(), "r");
+	if(fp == NULL) {fprintf(stderr, "cannot open %s\n", fn.c_str()); exit(1);}
 	char str[201], rn[4], an[4];
-	int na=0, nr=-1;
-	int atomid[ma], resid[ma]; double x[ma][3];
+	int nr=-1;
+	vector<int> atomid, resid; vector<double> x;	// x holds 3 coordinates per atom
 	string rinfo0 = "";
 	while(fgets(str, 200, fp) != NULL){
 		if(strstr(str, "ATOM") != str) continue;
@@ -69,27 +71,57 @@ double calENE(string fn){
 //
 		string an1 = string(rn) + ' ' + an;
 		if(atomtype.count(an1) < 1) continue;
-		atomid[na] = atomtype[an1];
-		sscanf(str+30, "%lf%lf%lf", x[na], x[na]+1, x[na]+2);
-		resid[na] = nr;
-		na ++;
-		if(na > ma) {fprintf(stderr, "increase ma\n"); exit(0);}
+		double xyz[3] = {0., 0., 0.};
+		sscanf(str+30, "%lf%lf%lf", xyz, xyz+1, xyz+2);
+		atomid.push_back(atomtype[an1]);
+		resid.push_back(nr);
+		x.insert(x.end(), xyz, xyz+3);
 	}
 	fclose(fp);
+//	sort the atoms into cubic cells with the width of the cutoff (15 A), so
+//	only atoms in the same or neighbouring cells need to be compared
+	int na = atomid.size();
+	const double rcut = mbin * 0.5;
+	double xmin[3] = {0., 0., 0.};
+	int nc[3] = {1, 1, 1};
+	for(int i=0; i<na; i++)
+	for(int m=0; m<3; m++){
+		if(i == 0 || x[3*i+m] < xmin[m]) xmin[m] = x[3*i+m];
+	}
+	vector<int> cell(3*na);
+	for(int i=0; i<na; i++)
+	for(int m=0; m<3; m++){
+		cell[3*i+m] = int((x[3*i+m] - xmin[m]) / rcut);
+		if(cell[3*i+m] >= nc[m]) nc[m] = cell[3*i+m] + 1;
+	}
+	vector<int> cstart(nc[0]*nc[1]*nc[2] + 1, 0), catom(na);	// atoms of each cell
+	for(int i=0; i<na; i++) cstart[(cell[3*i]*nc[1] + cell[3*i+1])*nc[2] + cell[3*i+2] + 1] ++;
+	for(int c=1; c<(int)cstart.size(); c++) cstart[c] += cstart[c-1];
+	vector<int> cfill(cstart.begin(), cstart.end()-1);
+	for(int i=0; i<na; i++) catom[cfill[(cell[3*i]*nc[1] + cell[3*i+1])*nc[2] + cell[3*i+2]] ++] = i;
 //
 	double eall = 0.;
 	for(int i=0; i<na; i++)
-	for(int j=i+1; j<na; j++){
-		if(resid[i] == resid[j]) continue;		// ignore interaction with same residue
-		double r = 0.;
-		for(int m=0; m<3; m++){
-			double xd = x[i][m] - x[j][m];
-			r += xd*xd;
+	for(int d0=-1; d0<=1; d0++)
+	for(int d1=-1; d1<=1; d1++)
+	for(int d2=-1; d2<=1; d2++){
+		int c0 = cell[3*i]+d0, c1 = cell[3*i+1]+d1, c2 = cell[3*i+2]+d2;
+		if(c0 < 0 || c1 < 0 || c2 < 0 || c0 >= nc[0] || c1 >= nc[1] || c2 >= nc[2]) continue;
+		int c = (c0*nc[1] + c1)*nc[2] + c2;
+		for(int k=cstart[c]; k<cstart[c+1]; k++){
+			int j = catom[k];
+			if(j <= i) continue;			// each pair is counted once
+			if(resid[i] == resid[j]) continue;		// ignore interaction with same residue
+			double r = 0.;
+			for(int m=0; m<3; m++){
+				double xd = x[3*i+m] - x[3*j+m];
+				r += xd*xd;
+			}
+			r = sqrt(r);
+			int b = int(r*2);				// distance to bin
+			if(b >= 30) continue;
+			eall += edfire[atomid[i]][atomid[j]][b];
 		}
-		r = sqrt(r);
-		int b = int(r*2);				// distance to bin
-		if(b >= 30) continue;
-		eall += edfire[atomid[i]][atomid[j]][b];
 	}
 	printf("%s %.1f\n", fn.c_str(), eall/100.);
 	return eall;
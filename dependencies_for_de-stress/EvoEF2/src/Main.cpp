@@ -144,6 +144,7 @@ BOOL CheckCommandName(char* queryname){
   char *supportedcmd[] = {
     "RepairStructure", 
     "ComputeStability", 
+    "ComputeStabilityServer",
     "ComputeBinding", 
     "BuildMutant",
     "ComputeResiEnergy",
@@ -234,6 +235,75 @@ int GenerateSingleSequenceFeatures(char* programpath,char* pdb){
 }
 
 
+//markers written by the ComputeStabilityServer command
+#define SERVER_READY "EVOEF2_SERVER_READY"
+#define SERVER_RESULT_END "EVOEF2_RESULT_END"
+
+//read the parameters once and then compute the stability of each PDB file
+//whose path is given on a line of stdin, the output for each file is the same
+//as the ComputeStability command and is followed by a SERVER_RESULT_END line
+int ComputeStabilityServer(){
+  AtomParamsSet atomParam;
+  ResiTopoSet resiTopo;
+  AtomParamsSetCreate(&atomParam);
+  ResiTopoSetCreate(&resiTopo);
+  AtomParameterRead(&atomParam, FILE_AMINOATOMPAR);
+  ResiTopoSetRead(&resiTopo, FILE_AMINOTOP);
+  EnergyWeightRead(FILE_WEIGHT_READ);
+  AAppTable aapptable;
+  RamaTable ramatable;
+  AApropensityTableReadFromFile(&aapptable,FILE_AAPROPENSITY);
+  RamaTableReadFromFile(&ramatable,FILE_RAMACHANDRAN);
+  BBdepRotamerLib bbrotlib;
+  if(FLAG_BBDEP_ROTLIB==TRUE){
+    BBdepRotamerLibCreate(&bbrotlib,FILE_ROTLIB);
+  }
+  printf("%s\n", SERVER_READY);
+
+  char line[MAX_LENGTH_ONE_LINE_IN_FILE+1];
+  while(fgets(line, MAX_LENGTH_ONE_LINE_IN_FILE, stdin) != NULL){
+    line[strcspn(line, "\r\n")] = '\0';
+    if(strlen(line) == 0) continue;
+    clock_t timestart = clock();
+    strcpy(PDB, line);
+    EVOEF_interface();
+    printf("command ComputeStability works\n");
+
+    Structure structure;
+    StructureCreate(&structure);
+    StructureConfig(&structure, PDB, &atomParam, &resiTopo);
+    //set whole sequence length for energy normalization
+    int resiCount=0;
+    for(int i=0;i<StructureGetChainCount(&structure);i++){
+      if(ChainGetType(StructureGetChain(&structure,i))==Type_Chain_Protein)
+        resiCount+=ChainGetResidueCount(StructureGetChain(&structure,i));
+    }
+    TOT_SEQ_LEN=resiCount>0 ? resiCount:100;
+    StructureCalcPhiPsi(&structure);
+    StructureCalcProteinResidueSidechainTorsion(&structure,&resiTopo);
+
+    double energyTerms[MAX_EVOEF_ENERGY_TERM_NUM]={0};
+    if(FLAG_BBDEP_ROTLIB==TRUE){
+      EVOEF_ComputeStabilityWithBBdepRotLib(&structure,&aapptable,&ramatable,&bbrotlib,energyTerms);
+    }
+    else{
+      EVOEF_ComputeStability(&structure,&aapptable,&ramatable,energyTerms);
+    }
+    StructureDestroy(&structure);
+
+    clock_t timeend = clock();
+    SpentTimeShow(timestart,timeend);
+    printf("%s\n", SERVER_RESULT_END);
+  }
+
+  if(FLAG_BBDEP_ROTLIB==TRUE){
+    BBdepRotamerLibDestroy(&bbrotlib);
+  }
+  ResiTopoSetDestroy(&resiTopo);
+  AtomParamsSetDestroy(&atomParam);
+  return Success;
+}
+
 int main(int argc, char* argv[]){
   clock_t timestart = clock();
   setvbuf(stdout, NULL, _IONBF, 0);
@@ -405,6 +475,11 @@ int main(int argc, char* argv[]){
     }
   }
 
+  //the server reads the PDB paths from stdin
+  if(!strcmp(cmdname, "ComputeStabilityServer")){
+    return ComputeStabilityServer();
+  }
+
   // deal with pdbid and filenames
   ExtractPathAndName(PDB, PDBPATH, PDBNAME);
   GetPDBID(PDBNAME, PDBID);
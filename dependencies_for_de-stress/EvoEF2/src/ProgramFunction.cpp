@@ -21,6 +21,8 @@ IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 #include "RotamerOptimizer.h"
 #include <string.h>
 #include <ctype.h>
+#include <stdlib.h>
+#include <math.h>
 
 extern BOOL FLAG_MONOMER;
 extern BOOL FLAG_PPI;
@@ -165,12 +167,211 @@ int EVOEF_ComputeChainStability(Structure *pStructure, int chainIndex, double *e
 
 
 
+//residue neighbour lists used by EVOEF_ComputeStability, a residue pair is
+//only evaluated if the bounding spheres of the two residues are within
+//ENERGY_DISTANCE_CUTOFF. The pairwise energy functions skip every atom pair
+//that is further apart than this (and the SSBOND cutoff is shorter), so the
+//skipped pairs would not have changed the energy terms
+#define NEIGHBOR_SPHERE_MARGIN 1e-3
+
+typedef struct _ResidueNeighbors{
+  int resiCount;
+  int* chainIndex;    //chain of each residue
+  int* resiIndex;     //position of each residue in its chain
+  int* firstResi;     //global index of the first residue of each chain
+  int* neighborStart; //neighbours of residue g are neighbors[neighborStart[g]...neighborStart[g+1]-1]
+  int* neighbors;     //global indices of the neighbours after each residue, in ascending order
+} ResidueNeighbors;
+
+typedef struct _ResidueCell{
+  long long key;
+  int resi;
+} ResidueCell;
+
+static int ResidueCellCompare(const void* a, const void* b){
+  const ResidueCell* pA=(const ResidueCell*)a;
+  const ResidueCell* pB=(const ResidueCell*)b;
+  if(pA->key < pB->key) return -1;
+  if(pA->key > pB->key) return 1;
+  return pA->resi - pB->resi;
+}
+
+static int IntCompare(const void* a, const void* b){
+  return *(const int*)a - *(const int*)b;
+}
+
+//atoms with valid coordinates are used by the pairwise energy terms, and the
+//SG atom is used for disulfide bonds even if its coordinates are not valid
+static BOOL AtomInNeighborSphere(Atom* pAtom){
+  return pAtom->isXyzValid==TRUE || strcmp(AtomGetName(pAtom),"SG")==0;
+}
+
+int ResidueNeighborsCreate(ResidueNeighbors* pThis, Structure* pStructure){
+  int chainCount=StructureGetChainCount(pStructure);
+  pThis->resiCount=0;
+  pThis->firstResi=(int*)malloc(sizeof(int)*(chainCount+1));
+  for(int i=0; i<chainCount; i++){
+    pThis->firstResi[i]=pThis->resiCount;
+    pThis->resiCount+=ChainGetResidueCount(StructureGetChain(pStructure,i));
+  }
+  pThis->firstResi[chainCount]=pThis->resiCount;
+  int resiCount=pThis->resiCount;
+  pThis->chainIndex=(int*)malloc(sizeof(int)*(resiCount+1));
+  pThis->resiIndex=(int*)malloc(sizeof(int)*(resiCount+1));
+  pThis->neighborStart=(int*)malloc(sizeof(int)*(resiCount+1));
+  pThis->neighbors=NULL;
+
+  //bounding sphere of each residue, residues without any atoms never interact
+  XYZ* centers=(XYZ*)malloc(sizeof(XYZ)*(resiCount+1));
+  double* radii=(double*)malloc(sizeof(double)*(resiCount+1));
+  double maxRadius=0.0;
+  for(int i=0; i<chainCount; i++){
+    Chain* pChain=StructureGetChain(pStructure,i);
+    for(int ir=0; ir<ChainGetResidueCount(pChain); ir++){
+      int g=pThis->firstResi[i]+ir;
+      Residue* pResi=ChainGetResidue(pChain,ir);
+      pThis->chainIndex[g]=i;
+      pThis->resiIndex[g]=ir;
+      int atomCount=0;
+      XYZ center={0.0,0.0,0.0};
+      for(int j=0; j<ResidueGetAtomCount(pResi); j++){
+        Atom* pAtom=ResidueGetAtom(pResi,j);
+        if(!AtomInNeighborSphere(pAtom)) continue;
+        center.X+=pAtom->xyz.X; center.Y+=pAtom->xyz.Y; center.Z+=pAtom->xyz.Z;
+        atomCount++;
+      }
+      radii[g]=-1.0;
+      if(atomCount==0) continue;
+      center.X/=atomCount; center.Y/=atomCount; center.Z/=atomCount;
+      radii[g]=0.0;
+      for(int j=0; j<ResidueGetAtomCount(pResi); j++){
+        Atom* pAtom=ResidueGetAtom(pResi,j);
+        if(!AtomInNeighborSphere(pAtom)) continue;
+        double distance=XYZDistance(&center,&pAtom->xyz);
+        if(distance>radii[g]) radii[g]=distance;
+      }
+      centers[g]=center;
+      if(radii[g]>maxRadius) maxRadius=radii[g];
+    }
+  }
+
+  //sort the residues into cubic cells, any two residues that can interact are
+  //in the same or neighbouring cells
+  double cellSize=2*maxRadius+ENERGY_DISTANCE_CUTOFF+NEIGHBOR_SPHERE_MARGIN;
+  XYZ minXyz={0.0,0.0,0.0};
+  BOOL first=TRUE;
+  for(int g=0; g<resiCount; g++){
+    if(radii[g]<0) continue;
+    if(first || centers[g].X<minXyz.X) minXyz.X=centers[g].X;
+    if(first || centers[g].Y<minXyz.Y) minXyz.Y=centers[g].Y;
+    if(first || centers[g].Z<minXyz.Z) minXyz.Z=centers[g].Z;
+    first=FALSE;
+  }
+  long long cellDim=1;
+  int* cellXyz=(int*)malloc(sizeof(int)*3*(resiCount+1));
+  for(int g=0; g<resiCount; g++){
+    if(radii[g]<0) continue;
+    cellXyz[3*g]=(int)floor((centers[g].X-minXyz.X)/cellSize);
+    cellXyz[3*g+1]=(int)floor((centers[g].Y-minXyz.Y)/cellSize);
+    cellXyz[3*g+2]=(int)floor((centers[g].Z-minXyz.Z)/cellSize);
+    for(int m=0; m<3; m++){
+      if(cellXyz[3*g+m]+2>cellDim) cellDim=cellXyz[3*g+m]+2;
+    }
+  }
+  ResidueCell* cells=(ResidueCell*)malloc(sizeof(ResidueCell)*(resiCount+1));
+  int cellCount=0;
+  for(int g=0; g<resiCount; g++){
+    if(radii[g]<0) continue;
+    cells[cellCount].key=((long long)cellXyz[3*g]*cellDim+cellXyz[3*g+1])*cellDim+cellXyz[3*g+2];
+    cells[cellCount].resi=g;
+    cellCount++;
+  }
+  qsort(cells,cellCount,sizeof(ResidueCell),ResidueCellCompare);
+
+  int capacity=resiCount+1;
+  int neighborCount=0;
+  pThis->neighbors=(int*)malloc(sizeof(int)*capacity);
+  for(int g=0; g<resiCount; g++){
+    pThis->neighborStart[g]=neighborCount;
+    if(radii[g]<0) continue;
+    for(int d0=-1; d0<=1; d0++)
+    for(int d1=-1; d1<=1; d1++)
+    for(int d2=-1; d2<=1; d2++){
+      long long c0=cellXyz[3*g]+d0, c1=cellXyz[3*g+1]+d1, c2=cellXyz[3*g+2]+d2;
+      if(c0<0 || c1<0 || c2<0) continue;
+      long long key=(c0*cellDim+c1)*cellDim+c2;
+      //find the first residue in the cell
+      int lo=0, hi=cellCount;
+      while(lo<hi){
+        int mid=(lo+hi)/2;
+        if(cells[mid].key<key) lo=mid+1;
+        else hi=mid;
+      }
+      for(int k=lo; k<cellCount && cells[k].key==key; k++){
+        int h=cells[k].resi;
+        if(h<=g) continue;
+        if(XYZDistance(&centers[g],&centers[h])>radii[g]+radii[h]+ENERGY_DISTANCE_CUTOFF+NEIGHBOR_SPHERE_MARGIN) continue;
+        if(neighborCount==capacity){
+          capacity*=2;
+          pThis->neighbors=(int*)realloc(pThis->neighbors,sizeof(int)*capacity);
+        }
+        pThis->neighbors[neighborCount++]=h;
+      }
+    }
+    //the residue pairs are evaluated in the same order as the full double loop
+    qsort(pThis->neighbors+pThis->neighborStart[g],neighborCount-pThis->neighborStart[g],sizeof(int),IntCompare);
+  }
+  pThis->neighborStart[resiCount]=neighborCount;
+
+  free(cells);
+  free(cellXyz);
+  free(radii);
+  free(centers);
+  return Success;
+}
+
+void ResidueNeighborsDestroy(ResidueNeighbors* pThis){
+  free(pThis->chainIndex);
+  free(pThis->resiIndex);
+  free(pThis->firstResi);
+  free(pThis->neighborStart);
+  free(pThis->neighbors);
+}
+
+//pairwise energies between a residue and the residues after it, the next
+//residue in the chain is always evaluated as in the full double loop
+static int EVOEF_EnergyResidueAndNeighbors(Structure* pStructure,ResidueNeighbors* pNeighbors,int chainIndex,int resiIndex,double energyTerms[MAX_EVOEF_ENERGY_TERM_NUM]){
+  Chain* pChainI=StructureGetChain(pStructure,chainIndex);
+  Residue* pResIR=ChainGetResidue(pChainI,resiIndex);
+  int g=pNeighbors->firstResi[chainIndex]+resiIndex;
+  if(resiIndex+1<ChainGetResidueCount(pChainI)){
+    EVOEF_EnergyResidueAndNextResidue(pResIR,ChainGetResidue(pChainI,resiIndex+1),energyTerms);
+  }
+  for(int n=pNeighbors->neighborStart[g]; n<pNeighbors->neighborStart[g+1]; n++){
+    int h=pNeighbors->neighbors[n];
+    int k=pNeighbors->chainIndex[h];
+    int ks=pNeighbors->resiIndex[h];
+    Residue* pResKS=ChainGetResidue(StructureGetChain(pStructure,k),ks);
+    if(k==chainIndex){
+      if(ks==resiIndex+1) continue;
+      EVOEF_EnergyResidueAndOtherResidueSameChain(pResIR,pResKS,energyTerms);
+    }
+    else{
+      EVOEF_EnergyResidueAndOtherResidueDifferentChain(pResIR,pResKS,energyTerms);
+    }
+  }
+  return Success;
+}
+
+
 int EVOEF_ComputeStability(Structure *pStructure,AAppTable* pAAppTable,RamaTable* pRama,double energyTerms[MAX_EVOEF_ENERGY_TERM_NUM]){
   //EnergyTermInitialize(energyTerms);
   int aas[20]={0}; //ACDEFGHIKLMNPQRSTVWY, only for regular amino acid
   //StructureGetAminoAcidComposition(pStructure, aas);
   // if the structure is composed of several chains, the residue position could be different in the whole structure from that in the separate chain
   //StructureComputeResiduePosition(pStructure);
+  ResidueNeighbors neighbors;
+  ResidueNeighborsCreate(&neighbors,pStructure);
   for(int i = 0; i < StructureGetChainCount(pStructure); i++){
     Chain *pChainI = StructureGetChain(pStructure,i);
     for(int ir = 0; ir < ChainGetResidueCount(pChainI); ir++){
@@ -181,20 +382,11 @@ int EVOEF_ComputeStability(Structure *pStructure,AAppTable* pAAppTable,RamaTable
       //amino acid propensity and ramachandran energy
       //backbone independent, no dunbrack energy
       AminoAcidPropensityAndRamachandranEnergy(pResIR,pAAppTable,pRama,energyTerms);
-      for(int is = ir+1; is < ChainGetResidueCount(pChainI); is++){
-        Residue *pResIS = ChainGetResidue(pChainI,is);
-        if(is==ir+1) EVOEF_EnergyResidueAndNextResidue(pResIR,pResIS,energyTerms);
-        else EVOEF_EnergyResidueAndOtherResidueSameChain(pResIR,pResIS,energyTerms);
-      }
-      for(int k = i+1; k < StructureGetChainCount(pStructure); k++){
-        Chain *pChainK = StructureGetChain(pStructure,k);
-        for(int ks = 0; ks < ChainGetResidueCount(pChainK); ks++){
-          Residue *pResKS = ChainGetResidue(pChainK,ks);
-          EVOEF_EnergyResidueAndOtherResidueDifferentChain(pResIR,pResKS,energyTerms);
-        }
-      }
+      //only the residues whose bounding spheres are within the cutoff
+      EVOEF_EnergyResidueAndNeighbors(pStructure,&neighbors,i,ir,energyTerms);
     }
   }
+  ResidueNeighborsDestroy(&neighbors);
 
   EnergyTermWeighting(energyTerms);
   printf("\nStructure energy details:\n");
@@ -274,6 +466,8 @@ int EVOEF_ComputeStabilityWithBBdepRotLib(Structure *pStructure,AAppTable* pAApp
   //StructureGetAminoAcidComposition(pStructure, aas);
   // if the structure is composed of several chains, the residue position could be different in the whole structure from that in the separate chain
   //StructureComputeResiduePosition(pStructure);
+  ResidueNeighbors neighbors;
+  ResidueNeighborsCreate(&neighbors,pStructure);
   for(int i = 0; i < StructureGetChainCount(pStructure); i++){
     Chain *pChainI = StructureGetChain(pStructure,i);
     for(int ir = 0; ir < ChainGetResidueCount(pChainI); ir++){
@@ -285,20 +479,11 @@ int EVOEF_ComputeStabilityWithBBdepRotLib(Structure *pStructure,AAppTable* pAApp
       AminoAcidPropensityAndRamachandranEnergy(pResIR,pAAppTable,pRama,energyTerms);
       //dunbrack energy
       AminoAcidDunbrackEnergy(pResIR,pRotLib,energyTerms);
-      for(int is = ir+1; is < ChainGetResidueCount(pChainI); is++){
-        Residue *pResIS = ChainGetResidue(pChainI,is);
-        if(is==ir+1) EVOEF_EnergyResidueAndNextResidue(pResIR,pResIS,energyTerms);
-        else EVOEF_EnergyResidueAndOtherResidueSameChain(pResIR,pResIS,energyTerms);
-      }
-      for(int k = i+1; k < StructureGetChainCount(pStructure); k++){
-        Chain *pChainK = StructureGetChain(pStructure,k);
-        for(int ks = 0; ks < ChainGetResidueCount(pChainK); ks++){
-          Residue *pResKS = ChainGetResidue(pChainK,ks);
-          EVOEF_EnergyResidueAndOtherResidueDifferentChain(pResIR,pResKS,energyTerms);
-        }
-      }
+      //only the residues whose bounding spheres are within the cutoff
+      EVOEF_EnergyResidueAndNeighbors(pStructure,&neighbors,i,ir,energyTerms);
     }
   }
+  ResidueNeighborsDestroy(&neighbors);
 
   EnergyTermWeighting(energyTerms);
   printf("\nStructure energy details:\n");